@@ -1,17 +1,17 @@
 from __future__ import annotations
 
 import csv
+import hashlib
 import json
 import logging
 import math
 import os
 import re
-import statistics
-import tempfile
+import time
 from bisect import bisect_right
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from airflow import DAG
 from airflow.models import Variable
@@ -20,29 +20,19 @@ from airflow.operators.python import BranchPythonOperator, PythonOperator
 from airflow.providers.cncf.kubernetes.operators.pod import KubernetesPodOperator
 from airflow.kubernetes.secret import Secret
 
+# общий с подом обучения слой S3 (лежит рядом, папка DAG в sys.path)
+from s3_data import S3Cache, parse_s3_uri
 
 TARGET_COL = "default.payment.next.month"
 DRIFT_THRESHOLD_DEFAULT = 0.1
 
-NUM_FEATURES = [
-    "LIMIT_BAL",
-    "AGE",
-    "BILL_AMT1",
-    "BILL_AMT2",
-    "BILL_AMT3",
-    "BILL_AMT4",
-    "BILL_AMT5",
-    "BILL_AMT6",
-    "PAY_AMT1",
-    "PAY_AMT2",
-    "PAY_AMT3",
-    "PAY_AMT4",
-    "PAY_AMT5",
-    "PAY_AMT6",
-    "utilization1",
-    "payment_ratio1",
-    "max_delay",
-]
+# профиль train (границы бинов, базовые счётчики) — выход DVC-стадии features
+REFERENCE_PROFILE_LOCAL = "data/processed/reference_profile.json"
+# результаты дрейфа по ETag current.csv: повторный запуск на тех же данных не качает файл
+DRIFT_CACHE_PREFIX = "retraining/drift_cache"
+DRIFT_CACHE_VERSION = 2
+# строк в чанке _scan_csv: граница переиспользования счётчиков прошлого файла
+DRIFT_CHUNK_ROWS = 50_000
 
 
 def _safe_run_id(run_id: str) -> str:
@@ -64,76 +54,126 @@ def _s3_client():
     return boto3.client("s3", endpoint_url=endpoint, region_name=region)
 
 
-def _parse_s3_uri(uri: str) -> Tuple[str, str]:
-    if not uri.startswith("s3://"):
-        raise ValueError(f"Invalid S3 URI: {uri}")
-    rest = uri.removeprefix("s3://")
-    if "/" not in rest:
-        raise ValueError(f"Invalid S3 URI: {uri}")
-    bucket, key = rest.split("/", 1)
-    return bucket, key
+def _download_s3_to_file(bucket: str, key: str) -> str:
+    # ETag-кэш (S3_CACHE_DIR): неизменённый файл не качается повторно, старые версии вытесняются
+    return str(S3Cache.from_env(_s3_client()).fetch(bucket, key))
 
 
-def _download_s3_to_file(bucket: str, key: str) -> str:
-    s3 = _s3_client()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(key).suffix or ".bin") as f:
-        s3.download_fileobj(bucket, key, f)
-        return f.name
-
-
-def _load_numeric_columns(csv_path: str, columns: List[str], max_rows: int = 50_000) -> Dict[str, List[float]]:
-    values: Dict[str, List[float]] = {c: [] for c in columns}
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
-            return values
-        present = set(reader.fieldnames)
-        cols = [c for c in columns if c in present]
-        for i, row in enumerate(reader):
-            if i >= max_rows:
+def _load_profile() -> Tuple[Optional[dict], str]:
+    local = Path(REFERENCE_PROFILE_LOCAL)
+    if local.exists():
+        return json.loads(local.read_text(encoding="utf-8")), str(local)
+    profile_uri = os.getenv("REFERENCE_PROFILE_S3_URI") or Variable.get(
+        "REFERENCE_PROFILE_S3_URI", default_var=""
+    )
+    if not profile_uri:
+        return None, ""
+    bucket, key = parse_s3_uri(profile_uri)
+    obj = _s3_client().get_object(Bucket=bucket, Key=key)
+    return json.loads(obj["Body"].read().decode("utf-8")), profile_uri
+
+
+def _bin_counts(values: List[str], edges: List[float]) -> List[int]:
+    """
+    Счётчики по бинам профиля для значений колонки (строки CSV). Бины [e_i, e_i+1), последний
+    закрыт; крайние открыты — значения вне границ train попадают в первый/последний бин, чтобы
+    сдвиг за диапазон давал PSI. Пустые/нечисловые значения не считаются.
+    """
+    n_bins = len(edges) - 1
+    counts = [0] * n_bins
+    for raw in values:
+        try:
+            v = float(raw)
+        except ValueError:
+            continue
+        if math.isnan(v):
+            continue
+        counts[min(max(bisect_right(edges, v) - 1, 0), n_bins - 1)] += 1
+    return counts
+
+
+def _scan_csv(
+    csv_path: str,
+    profile: dict,
+    features: List[str],
+    prev_chunks: Optional[Dict[str, list]] = None,
+    chunk_rows: Optional[int] = None,
+) -> Tuple[Dict[str, list], int, int]:
+    """
+    Один потоковый проход чанками по chunk_rows строк: для каждой колонки профиля и чанка —
+    blake2b значений и счётчики по бинам. Если дайджест совпал с тем же чанком прошлого файла
+    (prev_chunks из кэша дрейфа), счётчики берутся оттуда без разбора чисел — при дозаписи
+    current.csv считается только новый хвост.
+    Возвращает {feature: [[digest, counts], ...]} по колонкам, которые есть в файле, число строк
+    и число пересчитанных чанков.
+    """
+    prev_chunks = prev_chunks or {}
+    chunk_rows = chunk_rows or DRIFT_CHUNK_ROWS
+    rows = recounted = 0
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        pos = {name: i for i, name in enumerate(header)}
+        chunks: Dict[str, list] = {feat: [] for feat in features if feat in pos}
+        while True:
+            chunk = [row for _, row in zip(range(chunk_rows), reader)]
+            if not chunk:
                 break
-            for c in cols:
-                raw = row.get(c)
-                if raw is None or raw == "":
-                    continue
-                try:
-                    values[c].append(float(raw))
-                except ValueError:
-                    continue
-    return values
-
-
-def _psi(base: List[float], current: List[float], bins: int = 10, eps: float = 1e-8) -> float:
-    if len(base) < bins + 1 or len(current) == 0:
-        return 0.0
-    try:
-        cuts = statistics.quantiles(base, n=bins, method="exclusive")
-    except statistics.StatisticsError:
-        return 0.0
+            rows += len(chunk)
+            for feat, parts in chunks.items():
+                i = pos[feat]
+                values = [row[i] if i < len(row) else "" for row in chunk]
+                digest = hashlib.blake2b(
+                    "\x1f".join(values).encode("utf-8"), digest_size=16
+                ).hexdigest()
+                prev = prev_chunks.get(feat, [])
+                if len(parts) < len(prev) and prev[len(parts)][0] == digest:
+                    counts = prev[len(parts)][1]
+                else:
+                    counts = _bin_counts(values, profile["numeric"][feat]["edges"])
+                    recounted += 1
+                parts.append([digest, counts])
+    return chunks, rows, recounted
+
 
-    bounds = [-math.inf, *cuts, math.inf]
-    base_counts = [0] * bins
-    cur_counts = [0] * bins
+def _profile_sha(profile: dict) -> str:
+    return hashlib.sha256(json.dumps(profile, sort_keys=True).encode("utf-8")).hexdigest()
 
-    for v in base:
-        idx = bisect_right(bounds, v) - 1
-        idx = min(max(idx, 0), bins - 1)
-        base_counts[idx] += 1
 
-    for v in current:
-        idx = bisect_right(bounds, v) - 1
-        idx = min(max(idx, 0), bins - 1)
-        cur_counts[idx] += 1
+def _drift_cache_key(etag: str) -> str:
+    return f"{DRIFT_CACHE_PREFIX}/{re.sub(r'[^0-9A-Za-z_-]+', '_', etag)}.json"
+
+
+def _load_drift_cache(bucket: str, etag: Optional[str], profile_sha: str) -> Optional[dict]:
+    """Кэш дрейфа для ETag; None — нет, другой формат или посчитан по другому профилю."""
+    if not etag:
+        return None
+    from botocore.exceptions import ClientError
+
+    try:
+        obj = _s3_client().get_object(Bucket=bucket, Key=_drift_cache_key(etag))
+    except ClientError as e:
+        if (e.response or {}).get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+            return None
+        raise
+    cached = json.loads(obj["Body"].read().decode("utf-8"))
+    if (
+        cached.get("version") != DRIFT_CACHE_VERSION
+        or cached.get("profile_sha") != profile_sha
+        or cached.get("chunk_rows") != DRIFT_CHUNK_ROWS
+    ):
+        return None
+    return cached
 
+
+def _psi_from_counts(base_counts: List[int], cur_counts: List[int], eps: float = 1e-8) -> float:
     base_total = float(sum(base_counts)) or 1.0
     cur_total = float(sum(cur_counts)) or 1.0
-    base_pct = [(c / base_total) for c in base_counts]
-    cur_pct = [(c / cur_total) for c in cur_counts]
 
     psi_val = 0.0
-    for b, c in zip(base_pct, cur_pct):
-        b = max(b, eps)
-        c = max(c, eps)
+    for b, c in zip(base_counts, cur_counts):
+        b = max(b / base_total, eps)
+        c = max(c / cur_total, eps)
         psi_val += (b - c) * math.log(b / c)
     return float(psi_val)
 
@@ -183,6 +223,8 @@ def check_new_data(**_context):
         "exists": True,
         "has_new_data": has_new_data,
         "etag": etag,
+        # compute_drift берёт из кэша прошлого файла PSI колонок, которые не изменились
+        "prev_etag": prev_etag or None,
         "s3_uri": uri,
         "last_modified": last_modified_iso,
     }
@@ -203,6 +245,7 @@ def compute_drift(**context):
     ti = context["ti"]
     new_data = ti.xcom_pull(task_ids="check_new_data") or {}
     current_uri = str(new_data.get("s3_uri") or f"s3://{bucket}/retraining/current.csv")
+    etag = new_data.get("etag")
 
     drift_score = 0.0
     drift_exceeded = False
@@ -213,38 +256,63 @@ def compute_drift(**context):
         note = f"No current dataset found at {current_uri}. Drift check skipped."
         logging.info(note)
     else:
-        reference_local = Path("data/processed/train_base.csv")
-        reference_s3_uri = os.getenv("REFERENCE_S3_URI") or Variable.get(
-            "REFERENCE_S3_URI", default_var=""
-        )
-
-        if reference_local.exists():
-            ref_path = str(reference_local)
-            logging.info("Using local reference dataset: %s", ref_path)
-        elif reference_s3_uri:
-            ref_bucket, ref_key = _parse_s3_uri(reference_s3_uri)
-            ref_path = _download_s3_to_file(ref_bucket, ref_key)
-            logging.info("Downloaded reference dataset from %s", reference_s3_uri)
-        else:
-            ref_path = ""
+        # база — только профиль, обучающую выборку не скачиваем
+        profile, profile_src = _load_profile()
+        if profile is None:
             note = (
-                "Reference dataset is missing. "
-                "Provide REFERENCE_S3_URI (e.g. s3://<bucket>/retraining/reference.csv)."
+                "Reference profile is missing. Provide REFERENCE_PROFILE_S3_URI "
+                "(e.g. s3://<bucket>/retraining/reference_profile.json)."
             )
             logging.warning(note)
+        else:
+            logging.info("Using reference profile: %s", profile_src)
+            features = list(profile["numeric"])
+            profile_sha = _profile_sha(profile)
+            cur_bucket, cur_key = parse_s3_uri(current_uri)
+
+            t0 = time.perf_counter()
+            cached = _load_drift_cache(cur_bucket, etag, profile_sha)
+            if cached is not None:
+                # тот же файл и тот же профиль — ответ из кэша, current.csv не качаем
+                per_feature = dict(cached["per_feature"])
+                logging.info("Drift cache hit for etag=%s (%.3fs)", etag, time.perf_counter() - t0)
+            else:
+                cur_path = _download_s3_to_file(cur_bucket, cur_key)
+                logging.info("Downloaded current dataset from %s", current_uri)
 
-        cur_bucket, cur_key = _parse_s3_uri(current_uri)
-        cur_path = _download_s3_to_file(cur_bucket, cur_key)
-        logging.info("Downloaded current dataset from %s", current_uri)
-
-        if ref_path:
-            ref_vals = _load_numeric_columns(ref_path, NUM_FEATURES)
-            cur_vals = _load_numeric_columns(cur_path, NUM_FEATURES)
-            for feat in NUM_FEATURES:
-                base = ref_vals.get(feat, [])
-                cur = cur_vals.get(feat, [])
-                if base and cur:
-                    per_feature[feat] = _psi(base, cur)
+                # чанки колонок, совпавшие с прошлым файлом, не пересчитываем
+                prev = _load_drift_cache(cur_bucket, new_data.get("prev_etag"), profile_sha)
+                chunks, n_rows, recounted = _scan_csv(
+                    cur_path, profile, features, (prev or {}).get("chunks")
+                )
+                for feat, parts in chunks.items():
+                    counts = [sum(c) for c in zip(*(p[1] for p in parts))]
+                    if counts:
+                        base = profile["numeric"][feat]["counts"]
+                        per_feature[feat] = _psi_from_counts(base, counts)
+                logging.info(
+                    "Scanned %d rows of current dataset: %d of %d column chunks recounted (%.3fs)",
+                    n_rows,
+                    recounted,
+                    sum(len(parts) for parts in chunks.values()),
+                    time.perf_counter() - t0,
+                )
+                if etag:
+                    cache = {
+                        "version": DRIFT_CACHE_VERSION,
+                        "etag": etag,
+                        "profile_sha": profile_sha,
+                        "chunk_rows": DRIFT_CHUNK_ROWS,
+                        "n_rows": n_rows,
+                        "chunks": chunks,
+                        "per_feature": per_feature,
+                    }
+                    _s3_client().put_object(
+                        Bucket=cur_bucket,
+                        Key=_drift_cache_key(etag),
+                        Body=json.dumps(cache).encode("utf-8"),
+                        ContentType="application/json",
+                    )
 
             if per_feature:
                 drift_score = float(sum(per_feature.values()) / len(per_feature))
@@ -258,9 +326,6 @@ def compute_drift(**context):
             else:
                 note = "No common numeric features found for drift calculation."
                 logging.warning(note)
-        else:
-            drift_score = 0.0
-            drift_exceeded = False
 
     html_rows = "\n".join(
         f"<tr><td>{k}</td><td>{v:.6f}</td></tr>"
@@ -348,11 +413,15 @@ def validate_model(**context):
 
     auc = metrics.get("test_auc")
     if auc is not None:
-        threshold_str = os.getenv("AUC_THRESHOLD") or Variable.get("AUC_THRESHOLD", default_var="0.6")
+        threshold_str = os.getenv("AUC_THRESHOLD") or Variable.get(
+            "AUC_THRESHOLD", default_var="0.6"
+        )
         threshold = float(threshold_str)
         if float(auc) < threshold:
             raise RuntimeError(f"Model validation failed: test_auc={auc} < {threshold}")
 
+    # база для TRAIN_MODE=incremental следующего переобучения — только провалидированная модель
+    Variable.set("LAST_MODEL_RUN_ID", run_id)
     logging.info("Validation OK: s3://%s/%s", bucket, model_key)
     logging.info("Metrics: s3://%s/%s -> %s", bucket, metrics_key, metrics)
 
@@ -402,6 +471,12 @@ with DAG(
         cmds=["python", "-u", "scripts/model_training/train_model.py"],
         env_vars={
             "RUN_ID": "{{ run_id }}",
+            # gbdt | hgb (scripts/model_training/train_model.py), N_THREADS=0 — все ядра пода
+            "ESTIMATOR": "{{ var.value.get('TRAINER_ESTIMATOR', 'gbdt') }}",
+            "N_THREADS": "{{ var.value.get('TRAINER_N_THREADS', '0') }}",
+            # full | incremental: дообучение модели прошлого прогона (warm_start) на новых строках
+            "TRAIN_MODE": "{{ var.value.get('TRAINER_MODE', 'full') }}",
+            "PREV_RUN_ID": "{{ var.value.get('LAST_MODEL_RUN_ID', '') }}",
         },
         secrets=s3_secrets,
         get_logs=True,
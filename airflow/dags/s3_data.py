@@ -0,0 +1,173 @@
+"""
+Общий слой доступа к данным в S3 для пода переобучения (scripts/model_training/train_model.py)
+и задач в этой папке.
+
+- ETag-кэш на диске: объект лежит как <cache_dir>/<etag><suffix>, неизменённый файл повторно не
+  скачивается (даже под другим ключом); объект без ETag качается каждый раз в свой файл
+  noetag-<hash(bucket/key)><suffix>;
+- большие объекты — параллельно диапазонами (Range + IfMatch) в пуле потоков, части пишутся
+  сразу на свои смещения во временный файл, затем атомарный rename;
+- шардированные входы: fetch_prefix("retraining/current/", ".parquet").
+
+Только stdlib; клиент boto3 передаётся снаружи (клиенты boto3 потокобезопасны).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = "/tmp/credit-scoring-s3-cache"
+PART_SIZE = 8 * 1024 * 1024
+MAX_WORKERS = 8
+MAX_CACHE_BYTES = 2 * 1024**3
+
+
+def parse_s3_uri(uri: str) -> Tuple[str, str]:
+    if not uri.startswith("s3://"):
+        raise ValueError(f"Invalid S3 URI: {uri}")
+    rest = uri.removeprefix("s3://")
+    if "/" not in rest:
+        raise ValueError(f"Invalid S3 URI: {uri}")
+    bucket, key = rest.split("/", 1)
+    return bucket, key
+
+
+def _etag(head: dict) -> str:
+    return str(head.get("ETag", "")).strip('"')
+
+
+class S3Cache:
+    """Скачивание объектов S3 в локальный кэш по ETag."""
+
+    def __init__(
+        self,
+        s3,
+        cache_dir: str | os.PathLike = DEFAULT_CACHE_DIR,
+        max_workers: int = MAX_WORKERS,
+        part_size: int = PART_SIZE,
+        max_bytes: Optional[int] = MAX_CACHE_BYTES,
+    ):
+        self.s3 = s3
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max(1, int(max_workers))
+        self.part_size = max(1, int(part_size))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # вытесняются только файлы, не тронутые с момента создания кэша (см. _evict)
+        self.started = time.time()
+
+    @classmethod
+    def from_env(cls, s3) -> "S3Cache":
+        return cls(
+            s3,
+            cache_dir=os.getenv("S3_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_workers=int(os.getenv("S3_MAX_WORKERS", str(MAX_WORKERS))),
+            part_size=int(os.getenv("S3_PART_SIZE", str(PART_SIZE))),
+        )
+
+    def path_for(self, bucket: str, key: str, etag: str) -> Path:
+        # ETag multipart-загрузки — «md5-N», других символов в имени не оставляем
+        name = re.sub(r"[^0-9A-Za-z_-]+", "_", etag)
+        if not name:
+            # без ETag содержимое не сравнить: свой файл на ключ, из кэша не отдаётся
+            name = "noetag-" + hashlib.sha256(f"{bucket}/{key}".encode()).hexdigest()[:32]
+        return self.cache_dir / f"{name}{Path(key).suffix}"
+
+    def fetch(self, bucket: str, key: str) -> Path:
+        return self.fetch_many(bucket, [key])[0]
+
+    def fetch_prefix(self, bucket: str, prefix: str, suffix: str = "") -> List[Path]:
+        """Все объекты под prefix (шарды) в порядке ключей."""
+        return self.fetch_many(bucket, self.list_keys(bucket, prefix, suffix))
+
+    def list_keys(self, bucket: str, prefix: str, suffix: str = "") -> List[str]:
+        keys: List[str] = []
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+            keys += [o["Key"] for o in page.get("Contents", []) if o["Key"].endswith(suffix)]
+        return sorted(keys)
+
+    def fetch_many(self, bucket: str, keys: Iterable[str]) -> List[Path]:
+        """
+        Пути к локальным копиям keys (в том же порядке). HEAD всех объектов и диапазоны всех
+        промахов идут через один пул: мелкие файлы качаются параллельно, крупные — по частям.
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            heads = list(pool.map(lambda k: self.s3.head_object(Bucket=bucket, Key=k), keys))
+
+            paths: List[Path] = []
+            todo: Dict[Path, Tuple[str, str, int]] = {}
+            for key, head in zip(keys, heads):
+                etag = _etag(head)
+                path = self.path_for(bucket, key, etag)
+                paths.append(path)
+                if path in todo:
+                    continue
+                if etag and path.exists() and path.stat().st_size == head["ContentLength"]:
+                    self.hits += 1
+                    os.utime(path)  # для вытеснения по давности
+                    continue
+                self.misses += 1
+                todo[path] = (key, etag, int(head["ContentLength"]))
+
+            tmp = {path: path.with_name(f".{path.name}.{uuid.uuid4().hex}.part") for path in todo}
+            parts = []
+            for path, (key, etag, size) in todo.items():
+                with open(tmp[path], "wb") as f:
+                    f.truncate(size)
+                parts += [
+                    (bucket, key, etag, tmp[path], start, min(start + self.part_size, size) - 1)
+                    for start in range(0, size, self.part_size)
+                ]
+            try:
+                # list() — чтобы исключение из любой части всплыло здесь
+                list(pool.map(lambda p: self._download_range(*p), parts))
+            except BaseException:
+                for t in tmp.values():
+                    t.unlink(missing_ok=True)
+                raise
+        for path, t in tmp.items():
+            os.replace(t, path)
+        self._evict(keep=set(paths))
+        return paths
+
+    def _download_range(
+        self, bucket: str, key: str, etag: str, dest: Path, start: int, end: int
+    ) -> None:
+        kwargs = {"IfMatch": f'"{etag}"'} if etag else {}
+        # IfMatch: если объект перезаписали во время скачивания — ошибка, а не смесь версий
+        rng = f"bytes={start}-{end}"
+        body = self.s3.get_object(Bucket=bucket, Key=key, Range=rng, **kwargs)["Body"]
+        with open(dest, "r+b") as f:
+            f.seek(start)
+            for chunk in iter(lambda: body.read(1024 * 1024), b""):
+                f.write(chunk)
+
+    def _evict(self, keep: set) -> None:
+        """
+        Старые версии — по давности использования, пока кэш больше max_bytes. Кэш может быть общим
+        для нескольких процессов: файл, скачанный или отданный из кэша после self.started, может
+        сейчас читать другой прогон, поэтому удаляются только файлы с mtime раньше старта.
+        """
+        if self.max_bytes is None:
+            return
+        files = [p for p in self.cache_dir.iterdir() if p.is_file() and not p.name.startswith(".")]
+        stats = {p: p.stat() for p in files}
+        total = sum(st.st_size for st in stats.values())
+        for p in sorted(files, key=lambda p: stats[p].st_mtime):
+            if total <= self.max_bytes or stats[p].st_mtime >= self.started:
+                break
+            if p not in keep:
+                total -= stats[p].st_size
+                p.unlink(missing_ok=True)
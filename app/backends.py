@@ -0,0 +1,136 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.compiled import CompiledGBDT
+from src.features.derived import fill_missing_derived, fill_missing_derived_matrix
+
+Row = Dict[str, Any]
+
+
+def rows_to_matrix(rows: List[Row], columns: Sequence[str], dtype=np.float64) -> np.ndarray:
+    # None → NaN; непереданные производные фичи считаем здесь же, как в build_features.py
+    x = np.array([[r.get(k) for k in columns] for r in rows], dtype=dtype)
+    return fill_missing_derived_matrix(x, columns)
+
+
+class ModelBackend:
+    """Общий интерфейс: строки Payload → вероятность дефолта."""
+
+    name = "base"
+
+    def predict_proba(self, rows: List[Row]) -> np.ndarray:
+        raise NotImplementedError
+
+    @property
+    def info(self) -> str:
+        return self.name
+
+
+class SklearnBackend(ModelBackend):
+    name = "sklearn"
+
+    def __init__(self, pipe, columns: Sequence[str]):
+        self.pipe = pipe
+        self.columns = list(columns)
+
+    def predict_proba(self, rows: List[Row]) -> np.ndarray:
+        frame = pd.DataFrame(rows, columns=self.columns)
+        for name, values in fill_missing_derived(frame).items():
+            frame[name] = values
+        return self.pipe.predict_proba(frame)[:, 1]
+
+    @property
+    def info(self) -> str:
+        return f"{self.name}:{type(self.pipe).__name__}"
+
+
+class CompiledBackend(ModelBackend):
+    name = "compiled"
+
+    def __init__(self, pipe, columns: Sequence[str]):
+        self.compiled = CompiledGBDT.from_pipeline(pipe, columns=columns)
+        self.columns = list(columns)
+
+    def predict_proba(self, rows: List[Row]) -> np.ndarray:
+        return self.compiled.predict_proba(rows_to_matrix(rows, self.columns))[:, 1]
+
+    @property
+    def info(self) -> str:
+        return f"{self.name}:{type(self.compiled).__name__}"
+
+
+class OnnxBackend(ModelBackend):
+    """
+    CreditMLP из src/onnx (FP32 или INT8 граф). Скейлер из nn_meta.json применяется в NumPy,
+    если он не вшит в граф (export_onnx.py --fold_scaler). Одна InferenceSession на процесс.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: Path,
+        meta_path: Path,
+        intra_op_threads: int = 1,
+        inter_op_threads: int = 1,
+    ):
+        try:
+            import onnxruntime as ort
+        except Exception as e:  # noqa: BLE001
+            raise RuntimeError("Missing python dependency: onnxruntime") from e
+
+        meta = json.loads(Path(meta_path).read_text(encoding="utf-8"))
+        self.columns = list(meta["feature_list"])
+        self.mean = np.asarray(meta["scaler_mean"], dtype=np.float32)
+        self.scale = np.asarray(meta["scaler_scale"], dtype=np.float32)
+        self.model_path = Path(model_path)
+
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.intra_op_num_threads = intra_op_threads
+        so.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(
+            str(self.model_path), sess_options=so, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        meta_props = self.session.get_modelmeta().custom_metadata_map
+        self.scaler_folded = meta_props.get("scaler_folded") == "1"
+
+    def predict_proba(self, rows: List[Row]) -> np.ndarray:
+        x = rows_to_matrix(rows, self.columns, dtype=np.float32)
+        # пропуск → среднее обучающей выборки
+        miss = np.isnan(x)
+        if miss.any():
+            x[miss] = np.broadcast_to(self.mean, x.shape)[miss]
+        if not self.scaler_folded:
+            x -= self.mean
+            x /= self.scale
+        logits = self.session.run(None, {self.input_name: x})[0]
+        logits = np.asarray(logits, dtype=np.float64).reshape(-1)
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    @property
+    def info(self) -> str:
+        return f"{self.name}:{self.model_path.name}"
+
+
+def load_backend(kind: str, model_path: Path, columns: Sequence[str]) -> ModelBackend:
+    if kind == "onnx":
+        return OnnxBackend(
+            model_path,
+            Path(os.getenv("NN_META_PATH", "models/nn_meta.json")),
+            intra_op_threads=int(os.getenv("ONNX_INTRA_OP_THREADS", "1")),
+            inter_op_threads=int(os.getenv("ONNX_INTER_OP_THREADS", "1")),
+        )
+    if kind == "sklearn":
+        return SklearnBackend(joblib.load(model_path), columns)
+    if kind == "compiled":
+        return CompiledBackend(joblib.load(model_path), columns)
+    raise RuntimeError(f"Unknown MODEL_BACKEND: {kind}")
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from contextlib import suppress
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from prometheus_client import Histogram
+from starlette.concurrency import run_in_threadpool
+
+# Метрики батчера
+PREDICT_BATCH_SIZE = Histogram(
+    "predict_batch_size",
+    "Number of rows scored in one micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+PREDICT_QUEUE_WAIT_SECONDS = Histogram(
+    "predict_queue_wait_seconds",
+    "Time a request waits in the micro-batch queue before scoring",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+Row = Dict[str, Any]
+# score_fn(rows, backend): backend — модель, захваченная запросом при submit
+ScoreFn = Callable[[List[Row], Any], Sequence[float]]
+Item = Tuple[Row, asyncio.Future, float, Any]
+
+
+class MicroBatcher:
+    """
+    Собирает конкурентные запросы /predict в один вызов predict_proba.
+    Батч закрывается по max_batch_size строк или через max_wait_ms после первого запроса.
+    Строки с разными backend (запросы по обе стороны hot reload) скорятся раздельно.
+    """
+
+    def __init__(self, score_fn: ScoreFn, max_batch_size: int, max_wait_ms: float):
+        self._score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: Optional["asyncio.Queue[Item]"] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def submit(self, row: Row, backend: Any = None) -> float:
+        if not self.running:
+            raise RuntimeError("MicroBatcher is not running")
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, fut, time.perf_counter(), backend))
+        return await fut
+
+    async def _collect(self) -> List[Item]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # сначала забираем всё, что уже в очереди
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # клиент мог отвалиться, пока ждал
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            for _, _, enqueued, _ in batch:
+                PREDICT_QUEUE_WAIT_SECONDS.observe(now - enqueued)
+            PREDICT_BATCH_SIZE.observe(len(batch))
+
+            groups: Dict[int, List[Item]] = {}
+            for item in batch:
+                groups.setdefault(id(item[3]), []).append(item)
+            for group in groups.values():
+                await self._score(group)
+
+    async def _score(self, batch: List[Item]) -> None:
+        rows = [row for row, _, _, _ in batch]
+        try:
+            proba = await run_in_threadpool(self._score_fn, rows, batch[0][3])
+        except Exception as e:  # noqa: BLE001
+            for _, fut, _, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut, _, _), p in zip(batch, proba):
+            if not fut.done():
+                fut.set_result(float(p))
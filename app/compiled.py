@@ -0,0 +1,181 @@
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+from scipy.special import expit
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.pipeline import Pipeline
+
+
+class CompiledGBDT:
+    """
+    Плоское NumPy-представление пайплайна из src/models/estimators.py:build_pipeline
+    (ColumnTransformer → SimpleImputer/StandardScaler/OneHotEncoder → GradientBoostingClassifier).
+    Вход — float-матрица сырых фич в порядке `columns` (NaN = пропуск), без pandas.
+    Вероятности побитово совпадают с pipe.predict_proba.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        num_idx: np.ndarray,
+        num_fill: np.ndarray,
+        num_mean: np.ndarray,
+        num_scale: np.ndarray,
+        cat_idx: np.ndarray,
+        cat_fill: np.ndarray,
+        categories: List[np.ndarray],
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        init_raw: float,
+    ):
+        self.columns = list(columns)
+        self.num_idx = num_idx
+        self.num_fill = num_fill
+        self.num_mean = num_mean
+        self.num_scale = num_scale
+        self.cat_idx = cat_idx
+        self.cat_fill = cat_fill
+        self.categories = categories
+        # смещения one-hot блоков в выходной матрице
+        sizes = [len(c) for c in categories]
+        self.cat_offsets = len(num_idx) + np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
+        self.n_outputs = len(num_idx) + int(sum(sizes))
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.init_raw = init_raw
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(
+        cls, pipe: Pipeline, columns: Optional[Sequence[str]] = None
+    ) -> "CompiledGBDT":
+        pre = pipe.named_steps["pre"]
+        clf = pipe.named_steps["clf"]
+        if not isinstance(clf, GradientBoostingClassifier) or clf.n_trees_per_iteration_ != 1:
+            raise ValueError("Only binary GradientBoostingClassifier pipelines can be compiled")
+
+        blocks = {name: (tf, list(cols)) for name, tf, cols in pre.transformers_}
+        if "num" not in blocks or "cat" not in blocks:
+            raise ValueError("Expected ColumnTransformer with 'num' and 'cat' blocks")
+        num_tf, num_cols = blocks["num"]
+        cat_tf, cat_cols = blocks["cat"]
+        oh = cat_tf.named_steps["oh"]
+        if oh.drop_idx_ is not None or oh.handle_unknown != "ignore":
+            raise ValueError("OneHotEncoder must use drop=None and handle_unknown='ignore'")
+
+        if columns is None:
+            columns = num_cols + cat_cols
+        pos = {c: i for i, c in enumerate(columns)}
+
+        # деревья склеиваем в общие массивы, листья ссылаются сами на себя
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        for est in clf.estimators_[:, 0]:
+            t = est.tree_
+            is_leaf = t.children_left == -1
+            nodes = np.arange(t.node_count)
+            feature.append(np.where(is_leaf, 0, t.feature))
+            threshold.append(np.where(is_leaf, 0.0, t.threshold))
+            left.append(np.where(is_leaf, nodes, t.children_left) + offset)
+            right.append(np.where(is_leaf, nodes, t.children_right) + offset)
+            # как в predict_stages: scale * value в float64
+            value.append(clf.learning_rate * t.value[:, 0, 0])
+            roots.append(offset)
+            offset += t.node_count
+
+        n_outputs = len(num_cols) + sum(len(c) for c in oh.categories_)
+        init_raw = clf._raw_predict_init(np.zeros((1, n_outputs), dtype=np.float32))[0, 0]
+
+        return cls(
+            columns=columns,
+            num_idx=np.array([pos[c] for c in num_cols]),
+            num_fill=num_tf.named_steps["imp"].statistics_.astype(np.float64),
+            num_mean=num_tf.named_steps["sc"].mean_.astype(np.float64),
+            num_scale=num_tf.named_steps["sc"].scale_.astype(np.float64),
+            cat_idx=np.array([pos[c] for c in cat_cols]),
+            cat_fill=cat_tf.named_steps["imp"].statistics_.astype(np.float64),
+            categories=[np.asarray(c, dtype=np.float64) for c in oh.categories_],
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left).astype(np.intp),
+            right=np.concatenate(right).astype(np.intp),
+            value=np.concatenate(value),
+            roots=np.array(roots, dtype=np.intp),
+            max_depth=max(est.tree_.max_depth for est in clf.estimators_[:, 0]),
+            init_raw=float(init_raw),
+        )
+
+    def _buffer(self, n: int) -> np.ndarray:
+        # переиспользуемая матрица на поток (хендлеры идут в threadpool)
+        buf = getattr(self._local, "buf", None)
+        if buf is None or buf.shape[0] < n:
+            buf = np.empty((max(n, 64), self.n_outputs), dtype=np.float32)
+            self._local.buf = buf
+        return buf[:n]
+
+    def transform(self, X: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Препроцессинг в float32-матрицу (n, n_outputs), как у ColumnTransformer."""
+        X = np.asarray(X, dtype=np.float64)
+        n = X.shape[0]
+        if out is None:
+            out = np.empty((n, self.n_outputs), dtype=np.float32)
+        n_num = len(self.num_idx)
+
+        num = X[:, self.num_idx]
+        miss = np.isnan(num)
+        if miss.any():
+            num[miss] = np.broadcast_to(self.num_fill, num.shape)[miss]
+        num -= self.num_mean
+        num /= self.num_scale
+        out[:, :n_num] = num
+
+        cat = X[:, self.cat_idx]
+        miss = np.isnan(cat)
+        if miss.any():
+            cat[miss] = np.broadcast_to(self.cat_fill, cat.shape)[miss]
+        out[:, n_num:] = 0.0
+        rows = np.arange(n)
+        for j, cats in enumerate(self.categories):
+            p = np.minimum(np.searchsorted(cats, cat[:, j]), len(cats) - 1)
+            # неизвестная категория → все нули (handle_unknown="ignore")
+            hit = cats[p] == cat[:, j]
+            out[rows[hit], self.cat_offsets[j] + p[hit]] = 1.0
+        return out
+
+    def decision_function(self, Xt: np.ndarray) -> np.ndarray:
+        """Сумма деревьев по уже преобразованной float32-матрице."""
+        Xt = np.ascontiguousarray(Xt)
+        n = Xt.shape[0]
+        flat = Xt.reshape(-1)
+        base = (np.arange(n, dtype=np.intp) * Xt.shape[1])[:, None]
+        # все деревья сразу: node имеет форму (n, n_trees)
+        node = np.repeat(self.roots[None, :], n, axis=0)
+        for _ in range(self.max_depth):
+            x = flat.take(base + self.feature.take(node))
+            node = np.where(
+                x <= self.threshold.take(node), self.left.take(node), self.right.take(node)
+            )
+        # последовательное накопление по деревьям, как в predict_stages
+        stages = np.empty((n, len(self.roots) + 1), dtype=np.float64)
+        stages[:, 0] = self.init_raw
+        stages[:, 1:] = self.value.take(node)
+        return np.add.accumulate(stages, axis=1)[:, -1]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        p = expit(self.decision_function(self.transform(X, out=self._buffer(X.shape[0]))))
+        proba = np.empty((p.shape[0], 2), dtype=np.float64)
+        proba[:, 1] = p
+        proba[:, 0] = 1 - p
+        return proba
@@ -0,0 +1,175 @@
+"""
+Онлайн-дрейф: гистограммы входящих фич и proba_default по бинам профиля train
+(data/processed/reference_profile.json, стадия features) в скользящих окнах.
+
+Окно — кольцо временных слотов по slot_s секунд. Запрос увеличивает по одному счётчику на
+фичу в текущем слоте (bisect по границам, без numpy и без новых списков); PSI по окнам
+считается только при смене слота и на /metrics.
+"""
+
+import json
+import logging
+import math
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from prometheus_client import Gauge
+
+logger = logging.getLogger(__name__)
+
+PREDICTION = "proba_default"
+
+# воркеры считают окна независимо; max — дрейф увидел хотя бы один воркер
+FEATURE_DRIFT_PSI = Gauge(
+    "feature_drift_psi",
+    "PSI of live traffic against the training reference profile",
+    ["feature", "window"],
+    multiprocess_mode="max",
+)
+DRIFT_WINDOW_ROWS = Gauge(
+    "drift_window_rows",
+    "Requests counted in the drift window",
+    ["window"],
+    multiprocess_mode="livesum",
+)
+
+
+def _psi(base: np.ndarray, curr: np.ndarray, offsets: np.ndarray, eps: float = 1e-8):
+    # та же формула, что в src/monitor/psi.py (_psi_segments)
+    starts, sizes = offsets[:-1], np.diff(offsets)
+    base_p = base / np.repeat(np.maximum(np.add.reduceat(base, starts), eps), sizes)
+    curr_p = curr / np.repeat(np.maximum(np.add.reduceat(curr, starts), eps), sizes)
+    base_p, curr_p = np.maximum(base_p, eps), np.maximum(curr_p, eps)
+    return np.add.reduceat((curr_p - base_p) * np.log(curr_p / base_p), starts)
+
+
+class OnlineDrift:
+    """Счётчики бинов всех фич в кольце слотов; окна — суммы последних слотов."""
+
+    def __init__(
+        self,
+        profile: dict,
+        features: Sequence[str],
+        windows_s: Sequence[float] = (900, 3600),
+        slot_s: float = 60,
+        min_rows: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.slot_s = float(slot_s)
+        self.min_rows = int(min_rows)
+        self.clock = clock
+
+        # числовые: (имя, границы, offset); категории: (имя, значение → бин, offset)
+        self._num: List[Tuple[str, List[float], int]] = []
+        self._cat: List[Tuple[str, Dict[Any, int], int]] = []
+        self.features: List[str] = []
+        base: List[int] = []
+        starts: List[int] = []
+        for name in features:
+            start = len(base)
+            if name in profile["numeric"]:
+                ref = profile["numeric"][name]
+                self._num.append((name, [float(e) for e in ref["edges"]], start))
+                base += ref["counts"]
+            elif name in profile["categorical"]:
+                ref = profile["categorical"][name]
+                index = {v: i for i, v in enumerate(ref["values"])}
+                self._cat.append((name, index, start))
+                # последний бин — категории, которых не было в train
+                base += [*ref["counts"], 0]
+            else:
+                continue
+            self.features.append(name)
+            starts.append(start)
+        self.base = np.asarray(base, dtype=np.float64)
+        self.offsets = np.asarray(starts + [len(base)], dtype=np.int64)
+
+        self.windows = {f"{int(w)}s": max(1, math.ceil(w / self.slot_s)) for w in windows_s}
+        self.n_slots = max(self.windows.values())
+        self._slots = [[0] * len(base) for _ in range(self.n_slots)]
+        self._rows = [0] * self.n_slots
+        self._slot_id = int(self.clock() // self.slot_s)
+
+    def observe(self, row: Mapping[str, Any], proba: Optional[float] = None) -> None:
+        """O(1) на запрос: по одному инкременту на фичу в текущем слоте."""
+        self._advance()
+        i = self._slot_id % self.n_slots
+        counts = self._slots[i]
+        self._rows[i] += 1
+        for name, edges, off in self._num:
+            v = proba if name == PREDICTION else row.get(name)
+            if v is None or v != v:
+                continue
+            # бины [e_i, e_i+1), последний закрыт; вне границ — в крайний бин, как в
+            # src/monitor/psi.py: иначе сдвиг за диапазон train онлайн-PSI не видит
+            last = len(edges) - 2
+            counts[off + min(max(bisect_right(edges, v) - 1, 0), last)] += 1
+        for name, index, off in self._cat:
+            v = row.get(name)
+            if v is not None:
+                counts[off + index.get(v, len(index))] += 1
+
+    def _advance(self) -> None:
+        slot_id = int(self.clock() // self.slot_s)
+        if slot_id == self._slot_id:
+            return
+        # обнуляем слоты, через которые прошло время (не больше всего кольца)
+        for k in range(1, min(slot_id - self._slot_id, self.n_slots) + 1):
+            i = (self._slot_id + k) % self.n_slots
+            self._slots[i] = [0] * len(self.base)
+            self._rows[i] = 0
+        self._slot_id = slot_id
+        self.publish()
+
+    def window_counts(self, n_slots: int) -> Tuple[np.ndarray, int]:
+        idx = [(self._slot_id - k) % self.n_slots for k in range(n_slots)]
+        counts = np.asarray([self._slots[i] for i in idx], dtype=np.float64).sum(axis=0)
+        return counts, sum(self._rows[i] for i in idx)
+
+    def psi(self) -> Dict[str, Tuple[int, Dict[str, float]]]:
+        """окно → (число запросов, PSI по фичам)."""
+        out = {}
+        for label, n_slots in self.windows.items():
+            counts, rows = self.window_counts(n_slots)
+            values = _psi(self.base, counts, self.offsets)
+            out[label] = (rows, dict(zip(self.features, values.tolist())))
+        return out
+
+    def publish(self) -> None:
+        for label, (rows, per_feature) in self.psi().items():
+            DRIFT_WINDOW_ROWS.labels(label).set(rows)
+            for name, value in per_feature.items():
+                # на малом окне PSI шумный — до min_rows не сигналим
+                FEATURE_DRIFT_PSI.labels(name, label).set(value if rows >= self.min_rows else 0.0)
+
+
+def load_profile(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_drift(
+    profile_path: Path,
+    prediction_profile_path: Path,
+    features: Sequence[str],
+    windows_s: Sequence[float],
+    slot_s: float,
+    min_rows: int,
+) -> Optional[OnlineDrift]:
+    """None, если профиля train нет (мониторинг дрейфа выключен)."""
+    profile = load_profile(profile_path)
+    if profile is None:
+        logger.info("Drift profile %s not found, online drift disabled", profile_path)
+        return None
+    features = list(features)
+    prediction = load_profile(prediction_profile_path)
+    if prediction is not None:
+        profile = {**profile, "numeric": {**profile["numeric"], **prediction["numeric"]}}
+        features.append(PREDICTION)
+    drift = OnlineDrift(profile, features, windows_s, slot_s, min_rows)
+    logger.info("Online drift: %d features, windows %s", len(drift.features), list(drift.windows))
+    return drift
@@ -0,0 +1,53 @@
+"""
+Gunicorn для API: N uvicorn-воркеров с общей моделью.
+
+Модель грузится один раз в мастере (preload_app + when_ready), воркеры получают её через fork
+и делят страницы с массивами деревьев (copy-on-write). Метрики воркеров собираются через
+multiprocess-режим prometheus_client (PROMETHEUS_MULTIPROC_DIR).
+
+/admin/reload обрабатывает один воркер; остальные догружают ту же модель по файлу состояния
+в PROMETHEUS_MULTIPROC_DIR (app/main.py, sync_reloads). Без него при workers > 1 эндпоинт
+отвечает 409.
+
+    gunicorn -c app/gunicorn_conf.py app.main:app
+"""
+
+import gc
+import os
+import shutil
+from pathlib import Path
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# загрузка модели в мастере может занять время — не убиваем воркеры по таймауту
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# файлы метрик прошлого запуска мешают агрегации; чистим до импорта app.main (preload_app)
+_mp_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if _mp_dir:
+    shutil.rmtree(_mp_dir, ignore_errors=True)
+    Path(_mp_dir).mkdir(parents=True, exist_ok=True)
+
+
+def when_ready(server):
+    # app.main уже импортирован (preload_app): грузим модель до fork
+    import app.main as api
+    from app.reload import clear_version_metric
+
+    api.load_model()
+    # версию модели публикуют воркеры, мастер /metrics не обслуживает
+    clear_version_metric()
+    # объекты модели не трогает сборщик мусора в воркерах → меньше copy-on-write
+    gc.freeze()
+    server.log.info("Model %s (%s) preloaded before fork", api.model_path, api.model_version)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,17 +1,83 @@
+import asyncio
+import hmac
+import logging
 import os
 import time
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
-from typing import Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-import joblib
-import pandas as pd
-from fastapi import FastAPI, HTTPException, Request
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
-from pydantic import BaseModel, Field
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pydantic import BaseModel, Field, ValidationError
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import Response
 
+from app.backends import ModelBackend, load_backend
+from app.batching import MicroBatcher
+from app.drift import OnlineDrift, load_drift
+from app.reload import (
+    MODEL_LOAD_DURATION_SECONDS,
+    MODEL_RELOADS_TOTAL,
+    fetch_model,
+    file_stamp,
+    file_version,
+    read_reload_state,
+    set_version_metric,
+    warm_up,
+    write_reload_state,
+)
+from src.features.derived import DERIVED_FEATS
+
+logger = logging.getLogger(__name__)
+
 # Модель из ENV
 MODEL_PATH = Path(os.getenv("MODEL_PATH", "models/credit_default_model.pkl"))
+# sklearn — исходный Pipeline, compiled — NumPy-версия без pandas (app/compiled.py),
+# onnx — CreditMLP через onnxruntime (MODEL_PATH=models/model.onnx или model.int8.onnx)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "sklearn")
+# Микробатчинг /predict: включается при BATCH_MAX_SIZE > 1
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+# Лимит строк для /predict/batch
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "10000"))
+# Горячая подмена модели: опрос MODEL_PATH (0 = выключен) и токен для /admin/reload.
+# Без ADMIN_TOKEN /admin/reload всегда отвечает 403; грузить можно только MODEL_PATH или
+# объекты под MODEL_RELOAD_S3_PREFIX (s3://bucket/retraining/models/), пусто — только MODEL_PATH
+MODEL_WATCH_INTERVAL_S = float(os.getenv("MODEL_WATCH_INTERVAL_S", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+MODEL_RELOAD_S3_PREFIX = os.getenv("MODEL_RELOAD_S3_PREFIX", "")
+# Под gunicorn (WEB_CONCURRENCY > 1) /admin/reload попадает в один воркер. Он записывает
+# источник и версию в файл состояния, остальные воркеры (и перезапущенные после падения)
+# опрашивают его раз в MODEL_RELOAD_SYNC_S и догружают ту же модель. Файл по умолчанию лежит в
+# PROMETHEUS_MULTIPROC_DIR — его чистит мастер при старте, старая подмена не применится.
+# Без общего файла при нескольких воркерах /admin/reload отвечает 409.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+MODEL_RELOAD_SYNC_S = float(os.getenv("MODEL_RELOAD_SYNC_S", "2"))
+_state = os.getenv("MODEL_RELOAD_STATE") or (
+    str(Path(os.environ["PROMETHEUS_MULTIPROC_DIR"]) / "model_reload.json")
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    else ""
+)
+MODEL_RELOAD_STATE: Optional[Path] = Path(_state) if _state else None
+# Онлайн-дрейф: профиль train (стадия features) и бины proba_default (стадия train);
+# без профиля мониторинг выключен
+DRIFT_PROFILE_PATH = Path(os.getenv("DRIFT_PROFILE_PATH", "data/processed/reference_profile.json"))
+DRIFT_PREDICTION_PROFILE_PATH = Path(
+    os.getenv("DRIFT_PREDICTION_PROFILE_PATH", "models/prediction_profile.json")
+)
+DRIFT_WINDOWS_S = [float(w) for w in os.getenv("DRIFT_WINDOWS_S", "900,3600").split(",") if w]
+DRIFT_SLOT_S = float(os.getenv("DRIFT_SLOT_S", "60"))
+DRIFT_MIN_ROWS = int(os.getenv("DRIFT_MIN_ROWS", "200"))
 
 # Метрики Prometheus
 HTTP_REQUESTS_TOTAL = Counter(
@@ -29,6 +95,7 @@ MODEL_FILE_PRESENT = Gauge(
     "model_file_present",
     "1 if the model file exists, else 0",
     ["path"],
+    multiprocess_mode="max",
 )
 
 # Фичи как в обучении
@@ -53,6 +120,20 @@ NUM = [
 ]
 CAT = ["SEX", "EDUCATION", "MARRIAGE", "PAY_0", "PAY_2", "PAY_3", "PAY_4", "PAY_5", "PAY_6"]
 ALL_FEATS = NUM + CAT
+# дрейф считаем по полям запроса; производные могут не передаваться
+DRIFT_FEATS = [f for f in ALL_FEATS if f not in DERIVED_FEATS]
+
+# Валидная строка для прогрева новой модели
+WARMUP_ROWS: List[Dict[str, Any]] = [
+    {
+        **{k: 0.0 for k in NUM},
+        "AGE": 35,
+        "LIMIT_BAL": 100000.0 * (i + 1),
+        **{k: 1 for k in ["SEX", "EDUCATION", "MARRIAGE"]},
+        **{k: 0 for k in CAT[3:]},
+    }
+    for i in range(8)
+]
 
 
 class Payload(BaseModel):
@@ -71,9 +152,10 @@ class Payload(BaseModel):
     PAY_AMT4: float
     PAY_AMT5: float
     PAY_AMT6: float
+    # производные: если не переданы, считаются на сервере (src/features/derived.py)
     utilization1: Optional[float] = None
     payment_ratio1: Optional[float] = None
-    max_delay: int
+    max_delay: Optional[int] = None
     # Категории как в UCI
     SEX: Literal[1, 2]
     EDUCATION: Literal[1, 2, 3, 4]
@@ -92,7 +174,44 @@ class Prediction(BaseModel):
     model_info: str
 
 
-app = FastAPI(title="Credit Default API", version="1.0")
+class BatchPayload(BaseModel):
+    # строки как в /predict или колонки одинаковой длины
+    rows: Optional[List[Dict[str, Any]]] = None
+    columns: Optional[Dict[str, List[Any]]] = None
+
+
+class RowError(BaseModel):
+    index: int
+    errors: List[Dict[str, Any]]
+
+
+class ReloadRequest(BaseModel):
+    # MODEL_PATH или s3://bucket/key под MODEL_RELOAD_S3_PREFIX; по умолчанию MODEL_PATH
+    path: Optional[str] = None
+
+
+class BatchPrediction(BaseModel):
+    # None на месте строк, не прошедших валидацию
+    proba_default: List[Optional[float]]
+    predicted_class: List[Optional[int]]
+    errors: List[RowError]
+    model_info: str
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # под gunicorn модель уже загружена в мастере до fork (app/gunicorn_conf.py)
+    if model is None:
+        load_model()
+    else:
+        set_version_metric(model_version, MODEL_BACKEND, model_path)
+    start_drift()
+    await start_background()
+    yield
+    await stop_background()
+
+
+app = FastAPI(title="Credit Default API", version="1.0", lifespan=lifespan)
 
 
 @app.middleware("http")
@@ -115,32 +234,271 @@ async def prometheus_metrics_middleware(request: Request, call_next):
 def metrics():
     # Проверяем наличие модели
     MODEL_FILE_PRESENT.labels(str(MODEL_PATH)).set(1.0 if MODEL_PATH.exists() else 0.0)
+    if drift is not None:
+        drift.publish()
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # несколько воркеров: собираем метрики всех процессов
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 # Загружаем модель при старте
-model = None
+model: Optional[ModelBackend] = None
+model_version: Optional[str] = None
+model_path: Path = MODEL_PATH
+batcher: Optional[MicroBatcher] = None
+watcher: Optional[asyncio.Task] = None
+reload_sync: Optional[asyncio.Task] = None
+drift: Optional[OnlineDrift] = None
+reload_lock = asyncio.Lock()
+
+
+def prepare_model(path: Path) -> Tuple[ModelBackend, str]:
+    # загрузка + прогрев целиком до подмены ссылки
+    backend = load_backend(MODEL_BACKEND, path, ALL_FEATS)
+    warm_up(backend, WARMUP_ROWS)
+    return backend, file_version(path)
+
+
+def swap_model(backend: ModelBackend, version: str, path: Path) -> None:
+    global model, model_version, model_path
+    # одно присваивание: запросы видят либо старую, либо новую модель целиком
+    model, model_version, model_path = backend, version, path
+    set_version_metric(version, MODEL_BACKEND, path)
 
 
-@app.on_event("startup")
 def load_model():
-    global model
     if not MODEL_PATH.exists():
         raise RuntimeError(f"Model not found: {MODEL_PATH}")
-    model = joblib.load(MODEL_PATH)
+    start = time.perf_counter()
+    backend, version = prepare_model(MODEL_PATH)
+    MODEL_LOAD_DURATION_SECONDS.observe(time.perf_counter() - start)
+    MODEL_RELOADS_TOTAL.labels("ok").inc()
+    swap_model(backend, version, MODEL_PATH)
+
+
+async def reload_model(source: str) -> Dict[str, Any]:
+    async with reload_lock:
+        start = time.perf_counter()
+        try:
+            path = await run_in_threadpool(fetch_model, source)
+            backend, version = await run_in_threadpool(prepare_model, path)
+        except Exception:
+            MODEL_RELOADS_TOTAL.labels("error").inc()
+            raise
+        duration = time.perf_counter() - start
+        MODEL_LOAD_DURATION_SECONDS.observe(duration)
+        MODEL_RELOADS_TOTAL.labels("ok").inc()
+        previous = model_version
+        swap_model(backend, version, path)
+    logger.info("Model reloaded: %s -> %s from %s in %.2fs", previous, version, path, duration)
+    return {"version": version, "previous": previous, "path": str(path), "load_seconds": duration}
+
+
+async def watch_model_file(interval: float) -> None:
+    # подхватываем новый файл по MODEL_PATH (dvc pull / sync-сайдкар)
+    seen = file_stamp(MODEL_PATH)
+    while True:
+        await asyncio.sleep(interval)
+        stamp = file_stamp(MODEL_PATH)
+        if stamp is None or stamp == seen:
+            continue
+        seen = stamp
+        try:
+            await reload_model(str(MODEL_PATH))
+        except Exception:  # noqa: BLE001
+            logger.exception("Model reload from %s failed, keeping current model", MODEL_PATH)
+
+
+async def apply_reload_state(path: Path) -> bool:
+    """Догружаем модель, подменённую через /admin/reload в другом воркере."""
+    state = read_reload_state(path)
+    if state is None or state.get("version") == model_version:
+        return False
+    await reload_model(state["source"])
+    return True
+
+
+async def sync_reloads(path: Path, interval: float) -> None:
+    # seen=None: перезапущенный воркер (модель из мастера) сразу сверяется с файлом
+    seen = None
+    while True:
+        stamp = file_stamp(path)
+        if stamp is not None and stamp != seen:
+            try:
+                await apply_reload_state(path)
+                # только после успеха: неудачная загрузка повторяется на следующем тике
+                seen = stamp
+            except Exception:  # noqa: BLE001
+                logger.exception("Model reload from %s failed, will retry", path)
+        await asyncio.sleep(interval)
+
+
+def start_drift() -> None:
+    # в каждом воркере свои окна (после fork)
+    global drift
+    if drift is None:
+        drift = load_drift(
+            DRIFT_PROFILE_PATH,
+            DRIFT_PREDICTION_PROFILE_PATH,
+            DRIFT_FEATS,
+            DRIFT_WINDOWS_S,
+            DRIFT_SLOT_S,
+            DRIFT_MIN_ROWS,
+        )
+
+
+async def start_background():
+    global batcher, watcher, reload_sync
+    if BATCH_MAX_SIZE > 1:
+        batcher = MicroBatcher(score_rows, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+        await batcher.start()
+    if MODEL_WATCH_INTERVAL_S > 0:
+        watcher = asyncio.create_task(watch_model_file(MODEL_WATCH_INTERVAL_S))
+    if WEB_CONCURRENCY > 1 and MODEL_RELOAD_STATE is not None:
+        reload_sync = asyncio.create_task(sync_reloads(MODEL_RELOAD_STATE, MODEL_RELOAD_SYNC_S))
+
+
+async def stop_background():
+    global batcher, watcher, reload_sync
+    for task in (watcher, reload_sync):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    watcher = reload_sync = None
+    if batcher is not None:
+        await batcher.stop()
+        batcher = None
+
+
+def score_rows(rows: List[Dict[str, Any]], backend: Optional[ModelBackend] = None) -> np.ndarray:
+    # один вызов predict_proba на все строки
+    return (backend or model).predict_proba(rows)
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "model": str(MODEL_PATH)}
+    return {
+        "status": "ok",
+        "model": str(model_path),
+        "backend": MODEL_BACKEND,
+        "version": model_version,
+    }
+
+
+def reload_source_allowed(source: str) -> bool:
+    # joblib.load исполняет pickle — произвольный путь от клиента не принимаем
+    if source == str(MODEL_PATH):
+        return True
+    prefix = MODEL_RELOAD_S3_PREFIX
+    return (
+        bool(prefix)
+        and prefix.startswith("s3://")
+        and source.startswith(prefix.rstrip("/") + "/")
+        and ".." not in source.split("/")
+    )
+
+
+@app.post("/admin/reload")
+async def admin_reload(
+    body: Optional[ReloadRequest] = None,
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    # fail closed: без настроенного токена эндпоинт выключен
+    if not ADMIN_TOKEN or not hmac.compare_digest(
+        (x_admin_token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    source = (body.path if body else None) or str(MODEL_PATH)
+    if not reload_source_allowed(source):
+        raise HTTPException(status_code=403, detail=f"Reload source not allowed: {source}")
+    if WEB_CONCURRENCY > 1 and MODEL_RELOAD_STATE is None:
+        # подменили бы модель только в этом воркере — остальные отвечали бы старой
+        raise HTTPException(
+            status_code=409,
+            detail="Reload with several workers needs PROMETHEUS_MULTIPROC_DIR "
+            "or MODEL_RELOAD_STATE",
+        )
+    try:
+        result = await reload_model(source)
+    except Exception as e:  # noqa: BLE001
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}") from e
+    if MODEL_RELOAD_STATE is not None:
+        write_reload_state(MODEL_RELOAD_STATE, source, result["version"])
+    return {"status": "ok", "workers": WEB_CONCURRENCY, **result}
 
 
 @app.post("/predict", response_model=Prediction)
-def predict(x: Payload):
-    if model is None:
+async def predict(x: Payload):
+    current = model
+    if current is None:
         raise HTTPException(status_code=500, detail="Model is not loaded")
-    # DataFrame по фичам
-    row = pd.DataFrame([{k: getattr(x, k) for k in ALL_FEATS}], columns=ALL_FEATS)
-    proba = float(model.predict_proba(row)[:, 1][0])
+    row = {k: getattr(x, k) for k in ALL_FEATS}
+    if batcher is not None:
+        proba = await batcher.submit(row, current)
+    else:
+        proba = float((await run_in_threadpool(score_rows, [row], current))[0])
+    if drift is not None:
+        drift.observe(row, proba)
     yhat = int(proba >= 0.5)
-    return Prediction(proba_default=proba, predicted_class=yhat, model_info=type(model).__name__)
+    return Prediction(proba_default=proba, predicted_class=yhat, model_info=current.info)
+
+
+def batch_records(body: BatchPayload) -> List[Dict[str, Any]]:
+    if (body.rows is None) == (body.columns is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of 'rows' or 'columns'")
+    if body.rows is not None:
+        return body.rows
+    lengths = {len(v) for v in body.columns.values()}
+    if len(lengths) > 1:
+        raise HTTPException(status_code=422, detail="All columns must have the same length")
+    names = list(body.columns)
+    return [dict(zip(names, values)) for values in zip(*body.columns.values())]
+
+
+@app.post("/predict/batch", response_model=BatchPrediction)
+async def predict_batch(body: BatchPayload):
+    current = model
+    if current is None:
+        raise HTTPException(status_code=500, detail="Model is not loaded")
+    records = batch_records(body)
+    if len(records) > PREDICT_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many rows: {len(records)} > {PREDICT_BATCH_MAX_ROWS}",
+        )
+
+    # валидируем построчно, битые строки не валят весь батч
+    valid_idx: List[int] = []
+    rows: List[Dict[str, Any]] = []
+    errors: List[RowError] = []
+    for i, rec in enumerate(records):
+        try:
+            x = Payload.model_validate(rec)
+        except ValidationError as e:
+            errs = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            errors.append(RowError(index=i, errors=errs))
+            continue
+        valid_idx.append(i)
+        rows.append({k: getattr(x, k) for k in ALL_FEATS})
+
+    proba_out: List[Optional[float]] = [None] * len(records)
+    class_out: List[Optional[int]] = [None] * len(records)
+    if rows:
+        proba = await run_in_threadpool(score_rows, rows, current)
+        for i, p in zip(valid_idx, proba.tolist()):
+            proba_out[i] = p
+            class_out[i] = int(p >= 0.5)
+        if drift is not None:
+            for row, p in zip(rows, proba.tolist()):
+                drift.observe(row, p)
+
+    return BatchPrediction(
+        proba_default=proba_out,
+        predicted_class=class_out,
+        errors=errors,
+        model_info=current.info,
+    )
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.backends import ModelBackend
+
+# Метрики загрузки модели
+MODEL_LOAD_DURATION_SECONDS = Histogram(
+    "model_load_duration_seconds",
+    "Time to fetch, load and warm up a model",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+MODEL_RELOADS_TOTAL = Counter(
+    "model_reloads_total",
+    "Model (re)load attempts",
+    ["result"],
+)
+MODEL_VERSION_INFO = Gauge(
+    "model_version_info",
+    "1 for the currently served model version",
+    ["version", "backend", "path"],
+    multiprocess_mode="liveall",
+)
+
+# Куда складываем модели, скачанные из S3
+MODEL_DOWNLOAD_DIR = Path(os.getenv("MODEL_DOWNLOAD_DIR", "/tmp/models"))
+
+
+def file_version(path: Path) -> str:
+    # версия = префикс sha256 содержимого
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def fetch_model(source: str) -> Path:
+    """Локальный путь как есть; s3://bucket/key скачиваем в MODEL_DOWNLOAD_DIR."""
+    if not source.startswith("s3://"):
+        path = Path(source)
+        if not path.exists():
+            raise FileNotFoundError(f"Model not found: {path}")
+        return path
+
+    try:
+        import boto3
+    except Exception as e:  # noqa: BLE001
+        raise RuntimeError("Missing python dependency: boto3") from e
+
+    bucket, _, key = source.removeprefix("s3://").partition("/")
+    if not bucket or not key:
+        raise ValueError(f"Invalid S3 URI: {source}")
+    s3 = boto3.client(
+        "s3",
+        endpoint_url=os.getenv("S3_ENDPOINT_URL", "https://storage.yandexcloud.net"),
+        region_name=os.getenv("AWS_DEFAULT_REGION", "ru-central1"),
+    )
+    # retraining/models/{run_id}/credit_default_model.pkl -> {run_id}_credit_default_model.pkl
+    local = MODEL_DOWNLOAD_DIR / key.replace("/", "_")
+    local.parent.mkdir(parents=True, exist_ok=True)
+    # у каждого воркера свой .part: общий файл они перезаписывали бы друг другу
+    tmp = local.with_name(f".{local.name}.{uuid.uuid4().hex}.part")
+    try:
+        s3.download_file(bucket, key, str(tmp))
+        os.replace(tmp, local)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return local
+
+
+def write_reload_state(path: Path, source: str, version: str) -> None:
+    """Что должны обслуживать все воркеры: источник и версия последнего /admin/reload."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    tmp.write_text(json.dumps({"source": source, "version": version}), encoding="utf-8")
+    tmp.replace(path)
+
+
+def read_reload_state(path: Path) -> Optional[Dict[str, str]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def warm_up(backend: ModelBackend, rows: List[Dict[str, Any]], rounds: int = 3) -> None:
+    # прогреваем и заодно проверяем, что модель отдаёт вменяемые вероятности
+    for _ in range(rounds):
+        for n in (1, len(rows)):
+            proba = np.asarray(backend.predict_proba(rows[:n]), dtype=np.float64)
+            if proba.shape != (n,) or not np.all((proba >= 0) & (proba <= 1)):
+                raise RuntimeError(f"Warm-up failed: unexpected output {proba!r}")
+
+
+_version_labels: Optional[Tuple[str, str, str]] = None
+
+
+def clear_version_metric() -> None:
+    global _version_labels
+    # в multiprocess-режиме clear() не стирает значение из файла процесса — сначала обнуляем
+    if _version_labels is not None:
+        MODEL_VERSION_INFO.labels(*_version_labels).set(0.0)
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        MODEL_VERSION_INFO.clear()
+    _version_labels = None
+
+
+def set_version_metric(version: str, backend: str, path: Path) -> None:
+    global _version_labels
+    clear_version_metric()
+    _version_labels = (version, backend, str(path))
+    MODEL_VERSION_INFO.labels(*_version_labels).set(1.0)
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+from prometheus_client.parser import text_string_to_metric_families
+
+# Поля Payload в том же порядке, что и app/main.py:ALL_FEATS
+PAYLOAD_FIELDS = [
+    "LIMIT_BAL",
+    "AGE",
+    "BILL_AMT1",
+    "BILL_AMT2",
+    "BILL_AMT3",
+    "BILL_AMT4",
+    "BILL_AMT5",
+    "BILL_AMT6",
+    "PAY_AMT1",
+    "PAY_AMT2",
+    "PAY_AMT3",
+    "PAY_AMT4",
+    "PAY_AMT5",
+    "PAY_AMT6",
+    "utilization1",
+    "payment_ratio1",
+    "max_delay",
+    "SEX",
+    "EDUCATION",
+    "MARRIAGE",
+    "PAY_0",
+    "PAY_2",
+    "PAY_3",
+    "PAY_4",
+    "PAY_5",
+    "PAY_6",
+]
+
+
+def load_payloads(payloads_path: Optional[str], data_path: str, n: int, seed: int) -> List[dict]:
+    """Записанные Payload (JSON lines) или синтетика из test.parquet/test.csv."""
+    if payloads_path:
+        out = []
+        with open(payloads_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    out.append(json.loads(line))
+        if not out:
+            raise RuntimeError(f"No payloads in {payloads_path}")
+        return out
+    if data_path.endswith(".parquet"):
+        df = pd.read_parquet(data_path, columns=PAYLOAD_FIELDS)
+    else:
+        df = pd.read_csv(data_path, usecols=PAYLOAD_FIELDS)
+    df = df.sample(n=min(n, len(df)), random_state=seed)[PAYLOAD_FIELDS]
+    # через to_json, чтобы получить питоновские int/float вместо numpy
+    return json.loads(df.to_json(orient="records"))
+
+
+def scrape_metrics(client: httpx.Client, url: str) -> Dict[Tuple, float]:
+    text = client.get(f"{url}/metrics").text
+    samples: Dict[Tuple, float] = {}
+    for fam in text_string_to_metric_families(text):
+        for s in fam.samples:
+            samples[(s.name, tuple(sorted(s.labels.items())))] = float(s.value)
+    return samples
+
+
+def metric_deltas(before: Dict[Tuple, float], after: Dict[Tuple, float]) -> Dict[str, float]:
+    out = {}
+    for key, v in after.items():
+        d = v - before.get(key, 0.0)
+        if d != 0.0:
+            name, labels = key
+            lbl = ",".join(f'{k}="{val}"' for k, val in labels)
+            out[f"{name}{{{lbl}}}" if lbl else name] = d
+    return dict(sorted(out.items()))
+
+
+async def run_load(
+    url: str,
+    endpoint: str,
+    payloads: List[dict],
+    total: int,
+    rps: Optional[float],
+    concurrency: int,
+    timeout: float,
+) -> Tuple[List[float], Counter, float]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+
+        async def send(i: int) -> None:
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(endpoint, json=payloads[i % len(payloads)])
+                statuses[str(r.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - t0)
+
+        start = time.perf_counter()
+        if rps:
+            # открытая модель: запросы уходят по расписанию, не дожидаясь ответов
+            tasks = []
+            for i in range(total):
+                delay = start + i / rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(send(i)))
+            await asyncio.gather(*tasks)
+        else:
+            # закрытая модель: concurrency воркеров шлют запросы подряд
+            counter = iter(range(total))
+
+            async def worker() -> None:
+                for i in counter:
+                    await send(i)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, statuses, elapsed
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> dict:
+    lat_ms = np.asarray(latencies) * 1000.0
+    total = int(sum(statuses.values()))
+    ok = int(sum(v for k, v in statuses.items() if k.startswith("2")))
+    p50, p90, p95, p99 = np.percentile(lat_ms, [50, 90, 95, 99]) if len(lat_ms) else [0.0] * 4
+    return {
+        "requests": total,
+        "duration_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed > 0 else 0.0,
+        "error_rate": (total - ok) / total if total else 0.0,
+        "statuses": dict(statuses),
+        "latency_ms": {
+            "mean": float(lat_ms.mean()) if len(lat_ms) else 0.0,
+            "p50": float(p50),
+            "p90": float(p90),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(lat_ms.max()) if len(lat_ms) else 0.0,
+        },
+    }
+
+
+def compare_with_baseline(report: dict, baseline_path: str) -> None:
+    base = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    print(f"[LOAD] vs baseline {baseline_path}:")
+    rows = [("throughput_rps", report["throughput_rps"], base["throughput_rps"])]
+    rows += [
+        (f"latency_{k}_ms", report["latency_ms"][k], base["latency_ms"][k])
+        for k in ("p50", "p95", "p99")
+    ]
+    rows.append(("error_rate", report["error_rate"], base["error_rate"]))
+    for name, cur, old in rows:
+        rel = f"{(cur / old - 1.0) * 100.0:+.1f}%" if old else "n/a"
+        print(f"  {name:<16} {old:>10.3f} -> {cur:>10.3f} ({rel})")
+
+
+def start_server(port: int, env_overrides: Dict[str, str]) -> subprocess.Popen:
+    env = {**os.environ, **env_overrides}
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1"]
+    return subprocess.Popen(cmd + ["--port", str(port)], env=env)
+
+
+def wait_healthy(url: str, timeout_s: float = 60.0) -> None:
+    t_end = time.monotonic() + timeout_s
+    while time.monotonic() < t_end:
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"API at {url} did not become healthy in {timeout_s}s")
+
+
+def main() -> None:
+    import argparse
+
+    p = argparse.ArgumentParser(description="Replay /predict payloads against a local API")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--endpoint", default="/predict")
+    p.add_argument("--payloads", default=None, help="JSON lines, один Payload на строку")
+    p.add_argument("--data", default="data/processed/test.parquet")
+    p.add_argument("--n_payloads", type=int, default=1000)
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--rps", type=float, default=None, help="целевой RPS (иначе --concurrency)")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--timeout", type=float, default=10.0)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--start_server", action="store_true", help="поднять локальный uvicorn")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument(
+        "--server_env", action="append", default=[], help="KEY=VALUE для поднятого uvicorn"
+    )
+    p.add_argument("--out", default="artifacts/loadtest.json")
+    p.add_argument("--baseline", default=None)
+    args = p.parse_args()
+
+    payloads = load_payloads(args.payloads, args.data, args.n_payloads, args.seed)
+
+    server = None
+    url = args.url
+    if args.start_server:
+        url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, dict(kv.split("=", 1) for kv in args.server_env))
+    try:
+        wait_healthy(url)
+        with httpx.Client(timeout=args.timeout) as sync_client:
+            before = scrape_metrics(sync_client, url)
+            latencies, statuses, elapsed = asyncio.run(
+                run_load(
+                    url,
+                    args.endpoint,
+                    payloads,
+                    args.requests,
+                    args.rps,
+                    args.concurrency,
+                    args.timeout,
+                )
+            )
+            after = scrape_metrics(sync_client, url)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = summarize(latencies, statuses, elapsed)
+    report.update(
+        {
+            "url": url,
+            "endpoint": args.endpoint,
+            "mode": f"rps={args.rps}" if args.rps else f"concurrency={args.concurrency}",
+            "payloads": args.payloads or args.data,
+            "metrics_delta": metric_deltas(before, after),
+        }
+    )
+
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    lat = report["latency_ms"]
+    print(
+        f"[LOAD] {report['requests']} req in {elapsed:.2f}s -> {report['throughput_rps']:.1f} rps; "
+        f"p50={lat['p50']:.2f}ms p95={lat['p95']:.2f}ms p99={lat['p99']:.2f}ms; "
+        f"errors={report['error_rate']:.2%}; report -> {args.out}"
+    )
+    if args.baseline:
+        compare_with_baseline(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,65 +2,128 @@ from __future__ import annotations
 
 import json
 import os
+import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
 import boto3
+import numpy as np
 import pandas as pd
 from joblib import dump
-from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.impute import SimpleImputer
+from sklearn.ensemble import HistGradientBoostingClassifier
 from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-
-TARGET = "default.payment.next.month"
-
-NUM = [
-    "LIMIT_BAL",
-    "AGE",
-    "BILL_AMT1",
-    "BILL_AMT2",
-    "BILL_AMT3",
-    "BILL_AMT4",
-    "BILL_AMT5",
-    "BILL_AMT6",
-    "PAY_AMT1",
-    "PAY_AMT2",
-    "PAY_AMT3",
-    "PAY_AMT4",
-    "PAY_AMT5",
-    "PAY_AMT6",
-    "utilization1",
-    "payment_ratio1",
-    "max_delay",
-]
-
-CAT = ["SEX", "EDUCATION", "MARRIAGE", "PAY_0", "PAY_2", "PAY_3", "PAY_4", "PAY_5", "PAY_6"]
-
-
-def build_pipeline() -> Pipeline:
-    num_tf = Pipeline([("imp", SimpleImputer(strategy="median")), ("sc", StandardScaler())])
-    cat_tf = Pipeline(
-        [("imp", SimpleImputer(strategy="most_frequent")), ("oh", OneHotEncoder(handle_unknown="ignore"))]
-    )
 
-    pre = ColumnTransformer([("num", num_tf, NUM), ("cat", cat_tf, CAT)])
-    return Pipeline(
-        [
-            ("pre", pre),
-            (
-                "clf",
-                GradientBoostingClassifier(
-                    n_estimators=230,
-                    learning_rate=0.06,
-                    max_depth=3,
-                ),
-            ),
-        ]
+try:
+    # в образе trainer s3_data.py и estimators.py копируются рядом (docker/trainer/Dockerfile)
+    from estimators import TARGET, build_pipeline, thread_limit
+    from s3_data import S3Cache
+except ImportError:  # запуск из репозитория
+    _root = Path(__file__).resolve().parents[2]
+    sys.path[:0] = [str(_root / "airflow" / "dags"), str(_root / "src" / "models")]
+    from estimators import TARGET, build_pipeline, thread_limit
+    from s3_data import S3Cache
+
+TRAIN_MODES = ("full", "incremental")
+
+
+def load_previous(cache: S3Cache, bucket: str, prev_run_id: str) -> tuple[Pipeline, dict] | None:
+    """Модель и метрики прошлого прогона из retraining/models|metrics/{run_id}/; None — их нет."""
+    from botocore.exceptions import ClientError
+
+    try:
+        model_path, metrics_path = cache.fetch_many(
+            bucket,
+            [
+                f"retraining/models/{prev_run_id}/credit_default_model.pkl",
+                f"retraining/metrics/{prev_run_id}/metrics.json",
+            ],
+        )
+    except ClientError as e:
+        print(f"[TRAIN] previous run {prev_run_id} not available: {e}")
+        return None
+    from joblib import load
+
+    return load(model_path), json.loads(metrics_path.read_text(encoding="utf-8"))
+
+
+def load_current(cache: S3Cache, bucket: str) -> tuple[pd.DataFrame, str]:
+    """
+    Шарды retraining/current/*.parquet (в порядке ключей), если есть, иначе retraining/current.csv.
+    Файлы качаются параллельно в ETag-кэш.
+    """
+    shards = cache.list_keys(bucket, "retraining/current/", ".parquet")
+    if shards:
+        paths = cache.fetch_many(bucket, shards)
+        df = pd.concat([pd.read_parquet(p) for p in paths], ignore_index=True)
+        return df, f"s3://{bucket}/retraining/current/ ({len(shards)} shards)"
+    path = cache.fetch(bucket, "retraining/current.csv")
+    return pd.read_csv(path), f"s3://{bucket}/retraining/current.csv"
+
+
+def holdout_mask(
+    y: pd.Series, test_size: float, seed: int, split_rows: int | None = None
+) -> np.ndarray:
+    """
+    Маска test-строк. Первые split_rows строк (данные последнего full-прогона) делятся
+    стратифицированным train_test_split, как в full; строки, дописанные после него, — по позиции
+    через default_rng(seed). При дозаписи current.csv маска прошлого прогона — префикс новой:
+    test-строки между incremental-прогонами не меняются, и дообученная модель их не видела.
+    """
+    n = len(y)
+    split_rows = n if split_rows is None else min(split_rows, n)
+    mask = np.random.default_rng(seed).random(n) < test_size
+    mask[:split_rows] = False
+    head = y.iloc[:split_rows]
+    _, test_idx = train_test_split(
+        np.arange(split_rows),
+        test_size=test_size,
+        random_state=seed,
+        stratify=head if head.nunique() > 1 else None,
     )
+    mask[test_idx] = True
+    return mask
+
+
+def incremental_rows(X: pd.DataFrame, prev_rows: int, old_frac: float, seed: int) -> pd.Index:
+    """
+    current.csv дописывается в конец: строки с индексом >= prev_rows новые. К ним — доля old_frac
+    старых, чтобы догоняющие деревья не переобучились на свежий кусок.
+    """
+    is_new = X.index >= prev_rows
+    if not is_new.any() or is_new.all():
+        # файл заменён целиком (или не рос) — нового «хвоста» нет, дообучаем на всём
+        return X.index
+    old = X.index[~is_new].to_series().sample(frac=old_frac, random_state=seed)
+    return X.index[is_new].append(pd.Index(old))
+
+
+def supports_warm_start(pipe: Pipeline) -> bool:
+    """
+    hgb — нет: fit с warm_start заново строит _BinMapper по новым строкам, и старые деревья
+    (сплиты по номерам бинов и категорий прошлого fit) начинают считать другое. Только full.
+    """
+    return not isinstance(pipe.named_steps["clf"], HistGradientBoostingClassifier)
+
+
+def continue_boosting(pipe: Pipeline, X: pd.DataFrame, y: pd.Series, n_more: int) -> Pipeline:
+    """
+    warm_start: к деревьям прошлой модели добавляем n_more новых. Препроцессинг не переобучаем —
+    иначе поменяются колонки one-hot/коды категорий, на которых построены старые деревья.
+    """
+    if not supports_warm_start(pipe):
+        raise ValueError("warm start is not supported for hgb, use a full retrain")
+    clf = pipe.named_steps["clf"]
+    clf.set_params(warm_start=True, n_estimators=clf.n_estimators_ + n_more)
+    clf.fit(pipe.named_steps["pre"].transform(X), y)
+    return pipe
+
+
+def n_trees(pipe: Pipeline) -> int:
+    clf = pipe.named_steps["clf"]
+    return int(getattr(clf, "n_iter_", None) or clf.n_estimators_)
 
 
 def safe_run_id(run_id: str) -> str:
@@ -86,7 +149,6 @@ def main() -> None:
     run_id_raw = require_env("RUN_ID")
     run_id = safe_run_id(run_id_raw)
     bucket = require_env("BUCKET")
-    key_current = "retraining/current.csv"
 
     model_key = f"retraining/models/{run_id}/credit_default_model.pkl"
     metrics_key = f"retraining/metrics/{run_id}/metrics.json"
@@ -94,29 +156,79 @@ def main() -> None:
     s3 = s3_client()
     tmp_dir = Path("/tmp/retraining")
     tmp_dir.mkdir(parents=True, exist_ok=True)
-    current_path = tmp_dir / "current.csv"
-    # скачиваем current.csv
-    s3.download_file(bucket, key_current, str(current_path))
-
-    df = pd.read_csv(current_path)
+    cache = S3Cache.from_env(s3)
+    t0 = time.perf_counter()
+    df, source = load_current(cache, bucket)
+    print(f"[TRAIN] loaded {len(df)} rows from {source} in {time.perf_counter() - t0:.1f}s")
     if TARGET not in df.columns:
-        raise RuntimeError(f"Dataset must contain target column '{TARGET}', got columns={list(df.columns)}")
+        raise RuntimeError(
+            f"Dataset must contain target column '{TARGET}', got columns={list(df.columns)}"
+        )
 
     X = df.drop(columns=[TARGET])
     y = df[TARGET]
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X,
-        y,
-        test_size=float(os.getenv("TEST_SIZE", "0.2")),
-        random_state=int(os.getenv("RANDOM_STATE", "42")),
-        stratify=y if y.nunique() > 1 else None,
-    )
+    seed = int(os.getenv("RANDOM_STATE", "42"))
+    estimator = os.getenv("ESTIMATOR", "gbdt")
+    n_threads = int(os.getenv("N_THREADS", "0")) or None
+    mode = os.getenv("TRAIN_MODE", "full")
+    if mode not in TRAIN_MODES:
+        raise RuntimeError(f"Unknown TRAIN_MODE: {mode} (expected one of {TRAIN_MODES})")
+    prev_run_id = safe_run_id(os.getenv("PREV_RUN_ID", "")) if os.getenv("PREV_RUN_ID") else ""
+
+    previous = None
+    if mode == "incremental":
+        previous = load_previous(cache, bucket, prev_run_id) if prev_run_id else None
+        if previous is None:
+            print("[TRAIN] no previous model, falling back to full retrain")
+            mode = "full"
+        elif not supports_warm_start(previous[0]):
+            print(f"[TRAIN] previous model {prev_run_id} is hgb, falling back to full retrain")
+            previous, mode = None, "full"
+
+    # full — стратифицированный сплит всех строк; incremental — тот же сплит строк прошлого
+    # full-прогона плюс позиционный для дописанных (holdout_mask)
+    split_rows = None
+    if mode == "incremental":
+        prev_metrics = previous[1]
+        split_rows = int(prev_metrics.get("split_rows", prev_metrics.get("rows", 0)))
+    is_test = holdout_mask(y, float(os.getenv("TEST_SIZE", "0.2")), seed, split_rows)
+    X_train, X_test, y_train, y_test = X[~is_test], X[is_test], y[~is_test], y[is_test]
 
-    pipe = build_pipeline()
-    pipe.fit(X_train, y_train)
+    extra: dict = {}
+    with thread_limit(n_threads):
+        if mode == "incremental":
+            pipe, prev_metrics = previous
+            estimator = prev_metrics.get("model", estimator)
+            idx = incremental_rows(
+                X_train,
+                int(prev_metrics.get("rows", 0)),
+                float(os.getenv("OLD_SAMPLE_FRAC", "0.2")),
+                seed,
+            )
+            t0 = time.perf_counter()
+            continue_boosting(
+                pipe, X_train.loc[idx], y_train.loc[idx], int(os.getenv("INCREMENT_TREES", "50"))
+            )
+            fit_s = time.perf_counter() - t0
+            extra = {"prev_run_id": prev_run_id, "incremental_rows": int(len(idx))}
+        else:
+            pipe = build_pipeline(estimator)
+            t0 = time.perf_counter()
+            pipe.fit(X_train, y_train)
+            fit_s = time.perf_counter() - t0
+        proba = pipe.predict_proba(X_test)[:, 1]
 
-    proba = pipe.predict_proba(X_test)[:, 1]
+        if mode == "incremental" and os.getenv("COMPARE_FULL", "0") == "1":
+            # контроль: полный retrain на тех же train/test
+            full = build_pipeline(estimator)
+            t0 = time.perf_counter()
+            full.fit(X_train, y_train)
+            extra["full_fit_s"] = time.perf_counter() - t0
+            full_proba = full.predict_proba(X_test)[:, 1]
+            extra["full_test_auc"] = (
+                float(roc_auc_score(y_test, full_proba)) if y_test.nunique() > 1 else None
+            )
     pred = (proba >= 0.5).astype(int)
 
     metrics = {
@@ -125,11 +237,16 @@ def main() -> None:
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "rows": int(df.shape[0]),
         "columns": int(df.shape[1]),
-        "model": "gbdt",
+        "model": estimator,
+        "train_mode": mode,
+        "split_rows": int(len(df) if split_rows is None else min(split_rows, len(df))),
+        "fit_s": fit_s,
+        "n_trees": n_trees(pipe),
         "test_auc": float(roc_auc_score(y_test, proba)) if y_test.nunique() > 1 else None,
         "test_f1": float(f1_score(y_test, pred)),
         "test_precision": float(precision_score(y_test, pred, zero_division=0)),
         "test_recall": float(recall_score(y_test, pred)),
+        **extra,
     }
 
     model_path = tmp_dir / "credit_default_model.pkl"
@@ -1,61 +1,221 @@
 import json
+from collections import Counter
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 
+from src.data.sketches import QuantileSketch, ValueCounts
+from src.data.storage import FORMATS, TableWriter, table_path, write_table
+
 TARGET = "default.payment.next.month"
 
+INT_COLS = [
+    "SEX",
+    "EDUCATION",
+    "MARRIAGE",
+    "AGE",
+    "PAY_0",
+    "PAY_2",
+    "PAY_3",
+    "PAY_4",
+    "PAY_5",
+    "PAY_6",
+    TARGET,
+]
+CLIP_Q = (0.01, 0.99)
 
-def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+
+def recode(df: pd.DataFrame) -> pd.DataFrame:
     if "ID" in df:
         df = df.drop(columns=["ID"])
     df["EDUCATION"] = df["EDUCATION"].replace({0: 4, 5: 4, 6: 4})
     df["MARRIAGE"] = df["MARRIAGE"].replace({0: 3})
-    money = [c for c in df if c.startswith(("BILL_AMT", "PAY_AMT"))]
-    lo = {c: df[c].quantile(0.01) for c in money}
-    hi = {c: df[c].quantile(0.99) for c in money}
-    for c in money:
+    return df
+
+
+def money_columns(df: pd.DataFrame) -> List[str]:
+    return [c for c in df if c.startswith(("BILL_AMT", "PAY_AMT"))]
+
+
+def apply_clean(
+    df: pd.DataFrame,
+    lo: Dict[str, float],
+    hi: Dict[str, float],
+    modes: Dict[str, float],
+) -> pd.DataFrame:
+    """Клиппинг сумм и импутация целых колонок по заранее посчитанным статистикам."""
+    for c in money_columns(df):
         df[c] = np.clip(df[c], lo[c], hi[c])
-    int_cols = [
-        "SEX",
-        "EDUCATION",
-        "MARRIAGE",
-        "AGE",
-        "PAY_0",
-        "PAY_2",
-        "PAY_3",
-        "PAY_4",
-        "PAY_5",
-        "PAY_6",
-        TARGET,
-    ]
-    for c in int_cols:
+    for c in INT_COLS:
         s = pd.to_numeric(df[c], errors="coerce")
-        mode_val = s.mode(dropna=True)[0] if not s.mode(dropna=True).empty else 0
-        df[c] = s.fillna(mode_val).round().astype(int)
+        df[c] = s.fillna(modes[c]).round().astype(int)
+    return df
+
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = recode(df.copy())
+    money = money_columns(df)
+    lo = {c: df[c].quantile(CLIP_Q[0]) for c in money}
+    hi = {c: df[c].quantile(CLIP_Q[1]) for c in money}
+    modes = {}
+    for c in INT_COLS:
+        mode = pd.to_numeric(df[c], errors="coerce").mode(dropna=True)
+        modes[c] = mode[0] if not mode.empty else 0
+    df = apply_clean(df, lo, hi, modes)
     df = df.drop_duplicates()
     return df
 
 
-def main(raw_csv: str, out_dir: str):
-    out = Path(out_dir)
-    out.mkdir(parents=True, exist_ok=True)
-    df = pd.read_csv(raw_csv)
-    df = clean_frame(df)
-    train_df, test_df = train_test_split(df, test_size=0.2, random_state=42, stratify=df[TARGET])
-    train_df.to_csv(out / "train_base.csv", index=False)
-    test_df.to_csv(out / "test_base.csv", index=False)
-    summary = {
-        "train_rows": int(len(train_df)),
-        "test_rows": int(len(test_df)),
-        "n_features_raw": int(train_df.shape[1] - 1),
-        "target_mean_train": float(train_df[TARGET].mean()),
-        "target_mean_test": float(test_df[TARGET].mean()),
+# ==== STREAMING (файлы больше RAM) ====
+
+
+def plan_chunksize(raw_csv: str, max_memory_mb: float) -> int:
+    """Размер чанка под лимит памяти: чанк и его копии при обработке (~4x) — половина лимита."""
+    sample = pd.read_csv(raw_csv, nrows=1000)
+    per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    return max(1000, int(max_memory_mb * 2**20 / 2 / (4 * per_row)))
+
+
+def scan_stats(raw_csv: str, chunksize: int, sketch_k: int = 4096):
+    """Проход 1: скетчи квантилей сумм и частоты целых колонок → (lo, hi, modes, rows)."""
+    sketches: Dict[str, QuantileSketch] = {}
+    counts = {c: ValueCounts() for c in INT_COLS}
+    rows = 0
+    for chunk in pd.read_csv(raw_csv, chunksize=chunksize):
+        chunk = recode(chunk)
+        rows += len(chunk)
+        for c in money_columns(chunk):
+            sketches.setdefault(c, QuantileSketch(k=sketch_k)).update(chunk[c].to_numpy())
+        for c in INT_COLS:
+            counts[c].update(pd.to_numeric(chunk[c], errors="coerce").to_numpy())
+    lo = {c: float(sk.quantile(CLIP_Q[0])) for c, sk in sketches.items()}
+    hi = {c: float(sk.quantile(CLIP_Q[1])) for c, sk in sketches.items()}
+    modes = {c: vc.mode(default=0) for c, vc in counts.items()}
+    return lo, hi, modes, rows
+
+
+class RowDeduper:
+    """
+    Дедупликация между чанками по 64-битным хэшам строк (отсортированный uint64-массив,
+    8 байт на уникальную строку). Оставляет первое вхождение, как drop_duplicates.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.seen = np.empty(0, dtype=np.uint64)
+        self.max_bytes = max_bytes
+
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        h = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        keep = np.zeros(len(h), dtype=bool)
+        keep[np.unique(h, return_index=True)[1]] = True
+        if len(self.seen):
+            pos = np.minimum(np.searchsorted(self.seen, h), len(self.seen) - 1)
+            keep &= self.seen[pos] != h
+        self.seen = np.sort(np.concatenate([self.seen, h[keep]]), kind="stable")
+        if self.max_bytes is not None and self.seen.nbytes > self.max_bytes:
+            raise MemoryError(
+                f"Dedup index {self.seen.nbytes / 2**20:.0f} MB exceeds the memory ceiling; "
+                "raise --max_memory_mb"
+            )
+        return df[keep]
+
+
+class StratifiedSplitter:
+    """
+    Инкрементальный стратифицированный сплит: строки класса внутри чанка перемешиваются,
+    в test уходит столько, чтобы накопленная доля test по классу была test_size.
+    """
+
+    def __init__(self, test_size: float = 0.2, seed: int = 42):
+        self.test_size = test_size
+        self.rng = np.random.default_rng(seed)
+        self.seen: Counter = Counter()
+        self.test: Counter = Counter()
+
+    def split(self, df: pd.DataFrame, y: np.ndarray) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        is_test = np.zeros(len(df), dtype=bool)
+        for cls in np.unique(y):
+            idx = np.flatnonzero(y == cls)
+            self.rng.shuffle(idx)
+            self.seen[cls] += len(idx)
+            need = int(np.ceil(self.seen[cls] * self.test_size)) - self.test[cls]
+            need = min(max(need, 0), len(idx))
+            is_test[idx[:need]] = True
+            self.test[cls] += need
+        return df[~is_test], df[is_test]
+
+
+def stream_clean(
+    raw_csv: str,
+    out: Path,
+    fmt: str,
+    chunksize: Optional[int] = None,
+    max_memory_mb: Optional[float] = None,
+) -> dict:
+    """Проход 2: клиппинг/импутация, дедупликация и запись train/test по чанкам."""
+    if chunksize is None:
+        chunksize = plan_chunksize(raw_csv, max_memory_mb)
+    lo, hi, modes, raw_rows = scan_stats(raw_csv, chunksize)
+    print(f"[stream] pass 1: {raw_rows} rows, chunksize={chunksize}")
+
+    max_bytes = int(max_memory_mb * 2**20 / 2) if max_memory_mb else None
+    deduper = RowDeduper(max_bytes=max_bytes)
+    splitter = StratifiedSplitter(test_size=0.2, seed=42)
+    target_sum = {"train": 0, "test": 0}
+    n_cols = 0
+    train_w = TableWriter(table_path(out, "train_base", fmt))
+    test_w = TableWriter(table_path(out, "test_base", fmt))
+    with train_w, test_w:
+        for chunk in pd.read_csv(raw_csv, chunksize=chunksize):
+            chunk = deduper.filter(apply_clean(recode(chunk), lo, hi, modes))
+            n_cols = chunk.shape[1]
+            train_df, test_df = splitter.split(chunk, chunk[TARGET].to_numpy())
+            train_w.write(train_df)
+            test_w.write(test_df)
+            target_sum["train"] += int(train_df[TARGET].sum())
+            target_sum["test"] += int(test_df[TARGET].sum())
+
+    print(f"[stream] pass 2: {train_w.rows + test_w.rows} rows after dedup")
+    return {
+        "train_rows": int(train_w.rows),
+        "test_rows": int(test_w.rows),
+        "n_features_raw": int(n_cols - 1),
+        "target_mean_train": target_sum["train"] / max(train_w.rows, 1),
+        "target_mean_test": target_sum["test"] / max(test_w.rows, 1),
         "utilization1_p95_test": None,
     }
+
+
+def main(
+    raw_csv: str,
+    out_dir: str,
+    fmt: str = "parquet",
+    chunksize: Optional[int] = None,
+    max_memory_mb: Optional[float] = None,
+):
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    if chunksize or max_memory_mb:
+        summary = stream_clean(raw_csv, out, fmt, chunksize, max_memory_mb)
+    else:
+        df = pd.read_csv(raw_csv)
+        df = clean_frame(df)
+        train_df, test_df = train_test_split(
+            df, test_size=0.2, random_state=42, stratify=df[TARGET]
+        )
+        write_table(train_df, table_path(out, "train_base", fmt))
+        write_table(test_df, table_path(out, "test_base", fmt))
+        summary = {
+            "train_rows": int(len(train_df)),
+            "test_rows": int(len(test_df)),
+            "n_features_raw": int(train_df.shape[1] - 1),
+            "target_mean_train": float(train_df[TARGET].mean()),
+            "target_mean_test": float(test_df[TARGET].mean()),
+            "utilization1_p95_test": None,
+        }
     (out / "summary_base.json").write_text(json.dumps(summary, indent=2, ensure_ascii=False))
     print("Saved train/test and summary.json")
 
@@ -66,5 +226,9 @@ if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("raw_csv")
     p.add_argument("out_dir")
+    p.add_argument("--format", choices=FORMATS, default="parquet")
+    # потоковый режим: два прохода по чанкам вместо загрузки файла целиком
+    p.add_argument("--chunksize", type=int, default=None)
+    p.add_argument("--max_memory_mb", type=float, default=None)
     args = p.parse_args()
-    main(args.raw_csv, args.out_dir)
+    main(args.raw_csv, args.out_dir, args.format, args.chunksize, args.max_memory_mb)
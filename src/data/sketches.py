@@ -0,0 +1,91 @@
+"""Мергируемые статистики для потоковой обработки больших таблиц (по чанкам, между файлами)."""
+
+from collections import Counter
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    KLL-подобный скетч квантилей. Уровень i хранит значения с весом 2**i; переполненный уровень
+    сортируется и прореживается вдвое на уровень выше. Память ~ k * число уровней,
+    ошибка по рангу ~ O(1/k). Пока данных меньше k — ответ точный (как np.quantile).
+    """
+
+    def __init__(self, k: int = 4096, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: Iterable[float]) -> "QuantileSketch":
+        v = np.asarray(values, dtype=np.float64).ravel()
+        v = v[~np.isnan(v)]
+        self.n += len(v)
+        self.levels[0] = np.concatenate([self.levels[0], v])
+        self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for i, lvl in enumerate(other.levels):
+            if i == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[i] = np.concatenate([self.levels[i], lvl])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        i = 0
+        while i < len(self.levels):
+            lvl = self.levels[i]
+            if len(lvl) > self.k:
+                lvl = np.sort(lvl)
+                # при нечётной длине последний элемент остаётся на уровне
+                cut = len(lvl) - len(lvl) % 2
+                if i + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                promoted = lvl[int(self._rng.integers(2)) : cut : 2]
+                self.levels[i + 1] = np.concatenate([self.levels[i + 1], promoted])
+                self.levels[i] = lvl[cut:]
+            i += 1
+
+    def quantile(self, q):
+        if self.n == 0:
+            raise ValueError("Empty sketch")
+        vals = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lvl), 2.0**i) for i, lvl in enumerate(self.levels)])
+        order = np.argsort(vals, kind="stable")
+        vals, weights = vals[order], weights[order]
+        # ранг элемента (0-based); при весах 1 совпадает с линейной интерполяцией np.quantile
+        ranks = np.cumsum(weights) - 1.0
+        total = ranks[-1]
+        return np.interp(np.asarray(q, dtype=np.float64) * total, ranks, vals)
+
+
+class ValueCounts:
+    """Мергируемые частоты значений (для моды категориальных колонок)."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def update(self, values: Iterable) -> "ValueCounts":
+        v = np.asarray(values, dtype=np.float64).ravel()
+        uniq, cnt = np.unique(v[~np.isnan(v)], return_counts=True)
+        self.counts.update(dict(zip(uniq.tolist(), cnt.tolist())))
+        return self
+
+    def merge(self, other: "ValueCounts") -> "ValueCounts":
+        self.counts.update(other.counts)
+        return self
+
+    def mode(self, default: float = 0) -> float:
+        # как Series.mode()[0]: самое частое, при равенстве — наименьшее
+        if not self.counts:
+            return default
+        best = max(self.counts.values())
+        return min(k for k, c in self.counts.items() if c == best)
+
+    def as_dict(self) -> Dict[float, int]:
+        return dict(self.counts)
@@ -0,0 +1,152 @@
+"""
+Чтение/запись обработанных таблиц: Parquet (по умолчанию) или CSV, формат — по расширению.
+
+В Parquet пишем компактные типы, читатели берут только нужные колонки.
+"""
+
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+TARGET = "default.payment.next.month"
+
+FORMATS = ("parquet", "csv")
+
+# Компактные типы колонок UCI
+INT8_COLS = [
+    "SEX",
+    "EDUCATION",
+    "MARRIAGE",
+    "PAY_0",
+    "PAY_2",
+    "PAY_3",
+    "PAY_4",
+    "PAY_5",
+    "PAY_6",
+    "max_delay",
+    TARGET,
+]
+INT16_COLS = ["AGE"]
+FLOAT32_COLS = [
+    "LIMIT_BAL",
+    *[f"BILL_AMT{i}" for i in range(1, 7)],
+    *[f"PAY_AMT{i}" for i in range(1, 7)],
+]
+
+PathLike = Union[str, Path]
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Приводит известные колонки к int8/int16/float32; остальные не трогает. Целые колонки с
+    пропусками — в nullable Int8/Int16 (astype(np.int8) на NaN падает).
+    """
+    ints = {**{c: "int8" for c in INT8_COLS}, **{c: "int16" for c in INT16_COLS}}
+    dtypes = {
+        c: t if df[c].notna().all() else t.capitalize() for c, t in ints.items() if c in df.columns
+    }
+    dtypes.update({c: np.float32 for c in FLOAT32_COLS if c in df.columns})
+    return df.astype(dtypes)
+
+
+def table_path(directory: PathLike, stem: str, fmt: str = "parquet") -> Path:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown table format: {fmt}")
+    return Path(directory) / f"{stem}.{fmt}"
+
+
+def find_table(directory: PathLike, stem: str) -> Path:
+    """train → train.parquet, если есть, иначе train.csv (старые выгрузки)."""
+    for fmt in FORMATS:
+        path = table_path(directory, stem, fmt)
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"No {stem}.parquet or {stem}.csv in {directory}")
+
+
+def write_table(df: pd.DataFrame, path: PathLike) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        compact_dtypes(df).to_parquet(path, index=False, engine="pyarrow")
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def table_columns(path: PathLike) -> list:
+    """Имена колонок без чтения данных."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_table(path: PathLike, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Parquet читает только columns; для CSV — usecols."""
+    path = Path(path)
+    cols = list(columns) if columns is not None else None
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path, columns=cols, engine="pyarrow")
+    else:
+        df = pd.read_csv(path, usecols=cols)
+    # порядок как в запросе
+    return df[cols] if cols is not None and list(df.columns) != cols else df
+
+
+def iter_table(
+    path: PathLike, columns: Optional[Sequence[str]] = None, chunksize: int = 500_000
+) -> Iterator[pd.DataFrame]:
+    """Чанки таблицы: Parquet — батчами pyarrow, CSV — read_csv(chunksize)."""
+    path = Path(path)
+    cols = list(columns) if columns is not None else None
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=cols):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=cols, chunksize=chunksize)
+
+
+class TableWriter:
+    """Дозапись таблицы по чанкам: один Parquet-файл (row group на чанк) или CSV."""
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.path.suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(compact_dtypes(df), preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            # схема первого чанка — для всех остальных
+            self._writer.write_table(table.cast(self._schema))
+        else:
+            df.to_csv(
+                self.path, index=False, mode="w" if self.rows == 0 else "a", header=self.rows == 0
+            )
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
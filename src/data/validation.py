@@ -1,9 +1,22 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
 import pandas as pd
 import pandera.pandas as pa
 from pandera import Check, Column, DataFrameSchema
+from pandera.errors import SchemaErrors
+
+from src.data.storage import iter_table, read_table, table_columns
 
 TARGET = "default.payment.next.month"
 
+# допустимая доля класса-1
+CLASS_BALANCE = (0.05, 0.5)
+CLASS_BALANCE_CHECK = Check(
+    lambda df: CLASS_BALANCE[0] <= df[TARGET].mean() <= CLASS_BALANCE[1],
+    error="Аномальная доля класса-1",
+)
+
 SCHEMA = DataFrameSchema(
     {
         "LIMIT_BAL": Column(pa.Float, Check.ge(0), coerce=True),
@@ -22,11 +35,187 @@ SCHEMA = DataFrameSchema(
         "max_delay": Column(pa.Int, Check.between(-2, 9), coerce=True),
         TARGET: Column(pa.Int, Check.isin([0, 1]), coerce=True),
     },
-    checks=[Check(lambda df: 0.05 <= df[TARGET].mean() <= 0.5, error="Аномальная доля класса-1")],
+    checks=[CLASS_BALANCE_CHECK],
 )
 
+# Колонки отчёта — как SchemaErrors.failure_cases у pandera
+REPORT_COLUMNS = ["schema_context", "column", "check", "check_number", "failure_case", "index"]
 
-def validate_csv(path: str):
-    df = pd.read_csv(path)
+
+def validate_table(path: str, engine: str = "pandera", **kwargs):
+    """
+    pandera — эталон (SCHEMA.validate, бросает SchemaErrors);
+    numpy — быстрый потоковый движок по тем же правилам (бросает ValueError с отчётом).
+    """
+    if engine == "numpy":
+        report = fast_failure_report(path, **kwargs)
+        if not report.empty:
+            raise ValueError(f"{len(report)} schema failures in {path}:\n{report.head(20)}")
+        return True
+    # только колонки схемы; Parquet или CSV по расширению
+    df = read_table(path, columns=list(SCHEMA.columns))
     SCHEMA.validate(df, lazy=True)
     return True
+
+
+validate_csv = validate_table
+
+
+def pandera_failure_report(df: pd.DataFrame) -> pd.DataFrame:
+    try:
+        SCHEMA.validate(df, lazy=True)
+    except SchemaErrors as e:
+        return e.failure_cases
+    return pd.DataFrame(columns=REPORT_COLUMNS)
+
+
+# ==== NUMPY ENGINE ====
+
+
+def _compile_check(check: Check):
+    """Check pandera → векторная функция values -> bool-маска «ок»."""
+    st = check.statistics
+    if check.name == "greater_than_or_equal_to":
+        return lambda v: v >= st["min_value"]
+    if check.name == "in_range":
+        lo_op = np.greater_equal if st.get("include_min", True) else np.greater
+        hi_op = np.less_equal if st.get("include_max", True) else np.less
+        return lambda v: lo_op(v, st["min_value"]) & hi_op(v, st["max_value"])
+    if check.name == "isin":
+        allowed = np.asarray(list(st["allowed_values"]))
+        return lambda v: np.isin(v, allowed)
+    raise NotImplementedError(f"numpy engine does not support check {check.name!r}")
+
+
+def compile_schema(schema: DataFrameSchema = SCHEMA) -> Dict[str, Dict[str, Any]]:
+    rules = {}
+    for name, col in schema.columns.items():
+        dtype = str(col.dtype)
+        rules[name] = {
+            "dtype": dtype,
+            "is_int": dtype.startswith("int"),
+            "nullable": col.nullable,
+            "checks": [(c.error, _compile_check(c)) for c in col.checks],
+        }
+    for check in schema.checks:
+        if check is not CLASS_BALANCE_CHECK:
+            raise NotImplementedError(f"numpy engine does not support dataframe check {check}")
+    return rules
+
+
+def _rows(column, check, check_number, cases, index) -> List[dict]:
+    return [
+        {
+            "schema_context": "Column",
+            "column": column,
+            "check": check,
+            "check_number": check_number,
+            "failure_case": case,
+            "index": int(i),
+        }
+        for case, i in zip(cases, index)
+    ]
+
+
+def check_chunk(chunk: pd.DataFrame, rules: Dict[str, Dict[str, Any]], offset: int = 0):
+    """Ошибки одного чанка (индексы строк — сквозные, с offset)."""
+    failures: List[dict] = []
+    for name, rule in rules.items():
+        raw = chunk[name]
+        if raw.dtype.kind in "iub" and not pd.api.types.is_extension_array_dtype(raw.dtype):
+            # уже целые (Parquet): ни пропусков, ни ошибок приведения
+            failures += _value_failures(name, rule, raw.to_numpy(), None, offset)
+            continue
+        if raw.dtype.kind in "iubf":
+            # nullable Int8/Float64/boolean: pd.NA → NaN, а не минимум int64
+            values = raw.to_numpy(dtype=np.float64, na_value=np.nan)
+            null = raw_null = raw.isna().to_numpy()
+        else:
+            values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+            null = np.isnan(values)
+            raw_null = raw.isna().to_numpy()
+
+        # не приводится к числу (строки) — и null в int-колонке, как coerce у pandera
+        bad_coerce = (null & ~raw_null) | (raw_null if rule["is_int"] else False)
+        if bad_coerce.any():
+            cases = [None if pd.isna(v) else v for v in raw.to_numpy()[bad_coerce]]
+            check = f"coerce_dtype('{rule['dtype']}')"
+            failures += _rows(name, check, None, cases, offset + np.flatnonzero(bad_coerce))
+        if not rule["nullable"] and raw_null.any():
+            idx = offset + np.flatnonzero(raw_null)
+            failures += _rows(name, "not_nullable", None, [None] * len(idx), idx)
+
+        if null.any():
+            keep = np.flatnonzero(~null)
+            failures += _value_failures(name, rule, values[keep], keep, offset)
+        else:
+            failures += _value_failures(name, rule, values, None, offset)
+    return failures
+
+
+def _value_failures(name, rule, values: np.ndarray, positions, offset: int) -> List[dict]:
+    if rule["is_int"] and values.dtype.kind == "f":
+        # coerce=True у pandera приводит float → int отбрасыванием дробной части
+        values = np.trunc(values)
+    failures: List[dict] = []
+    for number, (error, fn) in enumerate(rule["checks"]):
+        bad = np.flatnonzero(~fn(values))
+        if len(bad):
+            cases = values[bad].astype(np.int64) if rule["is_int"] else values[bad]
+            idx = offset + (bad if positions is None else positions[bad])
+            failures += _rows(name, error, number, cases.tolist(), idx)
+    return failures
+
+
+def fast_failure_report(
+    path: str,
+    chunksize: int = 500_000,
+    max_failures: Optional[int] = 1000,
+) -> pd.DataFrame:
+    """
+    Потоковая проверка файла по SCHEMA на NumPy. Останавливается, набрав max_failures ошибок
+    (тогда проверка баланса классов по всему файлу не выполняется).
+    """
+    rules = compile_schema(SCHEMA)
+    present = set(table_columns(path))
+    missing = [c for c in rules if c not in present]
+    failures: List[dict] = [
+        {
+            "schema_context": "DataFrameSchema",
+            "column": None,
+            "check": "column_in_dataframe",
+            "check_number": None,
+            "failure_case": c,
+            "index": None,
+        }
+        for c in missing
+    ]
+    rules = {c: r for c, r in rules.items() if c in present}
+
+    rows, target_sum, target_n, stopped = 0, 0.0, 0, False
+    for chunk in iter_table(path, columns=list(rules), chunksize=chunksize):
+        failures += check_chunk(chunk, rules, offset=rows)
+        rows += len(chunk)
+        if TARGET in chunk:
+            y = pd.to_numeric(chunk[TARGET], errors="coerce")
+            target_sum += float(y.sum())
+            target_n += int(y.count())
+        if max_failures is not None and len(failures) >= max_failures:
+            failures = failures[:max_failures]
+            stopped = True
+            break
+
+    if not stopped and target_n:
+        share = target_sum / target_n
+        if not CLASS_BALANCE[0] <= share <= CLASS_BALANCE[1]:
+            failures.append(
+                {
+                    "schema_context": "DataFrameSchema",
+                    "column": None,
+                    "check": CLASS_BALANCE_CHECK.error,
+                    "check_number": 0,
+                    "failure_case": False,
+                    "index": None,
+                }
+            )
+    return pd.DataFrame(failures, columns=REPORT_COLUMNS)
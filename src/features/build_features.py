@@ -3,28 +3,35 @@ from pathlib import Path
 
 import pandas as pd
 
+from src.data.storage import FORMATS, find_table, read_table, table_path, write_table
+from src.features.derived import derived_features
+from src.monitor.psi import build_reference_profile, load_feature_list, save_profile
+
 TARGET = "default.payment.next.month"
 
 
 def add_basic_features(df: pd.DataFrame) -> pd.DataFrame:
-    f = df.copy()
-    f["utilization1"] = (f["BILL_AMT1"] / f["LIMIT_BAL"].clip(lower=1)).fillna(0)
-    f["payment_ratio1"] = (f["PAY_AMT1"] / f["BILL_AMT1"].abs().clip(lower=1)).fillna(0)
-    pay_cols = ["PAY_0", "PAY_2", "PAY_3", "PAY_4", "PAY_5", "PAY_6"]
-    f["max_delay"] = f[pay_cols].max(axis=1)
-    return f
+    # колонки добавляются в сам df, без копии кадра
+    for name, values in derived_features(df).items():
+        df[name] = values
+    return df
 
 
-def main(proc_dir: str):
+def main(proc_dir: str, fmt: str = "parquet", features_path: str = "feature_list.json"):
     d = Path(proc_dir)
-    train = pd.read_csv(d / "train_base.csv")
-    test = pd.read_csv(d / "test_base.csv")
+    train = read_table(find_table(d, "train_base"))
+    test = read_table(find_table(d, "test_base"))
 
     train = add_basic_features(train)
     test = add_basic_features(test)
 
-    train.to_csv(d / "train.csv", index=False)
-    test.to_csv(d / "test.csv", index=False)
+    write_table(train, table_path(d, "train", fmt))
+    write_table(test, table_path(d, "test", fmt))
+
+    # профиль train для PSI: границы бинов, счётчики, частоты категорий
+    num_feats, cat_feats = load_feature_list(features_path)
+    profile = build_reference_profile(train, num_feats, cat_feats)
+    save_profile(profile, d / "reference_profile.json")
 
     summary = {
         "train_rows": int(len(train)),
@@ -43,5 +50,7 @@ if __name__ == "__main__":
 
     p = argparse.ArgumentParser()
     p.add_argument("proc_dir")
+    p.add_argument("--format", choices=FORMATS, default="parquet")
+    p.add_argument("--features", default="feature_list.json")
     args = p.parse_args()
-    main(args.proc_dir)
+    main(args.proc_dir, args.format, args.features)
@@ -0,0 +1,70 @@
+"""
+Производные фичи на NumPy-колонках — один код для обучения (build_features.py) и сервинга (app/).
+
+Колонки передаются как Mapping имя → массив (dict, DataFrame, срезы матрицы); кадр не копируется.
+"""
+
+from functools import reduce
+from typing import Any, Callable, Dict, Mapping, Sequence, Tuple
+
+import numpy as np
+
+PAY_COLS = ["PAY_0", "PAY_2", "PAY_3", "PAY_4", "PAY_5", "PAY_6"]
+
+
+def utilization(bill_amt1, limit_bal) -> np.ndarray:
+    bill = np.asarray(bill_amt1, dtype=np.float64)
+    out = bill / np.maximum(np.asarray(limit_bal, dtype=np.float64), 1.0)
+    out[np.isnan(out)] = 0.0
+    return out
+
+
+def payment_ratio(pay_amt1, bill_amt1) -> np.ndarray:
+    pay = np.asarray(pay_amt1, dtype=np.float64)
+    out = pay / np.maximum(np.abs(np.asarray(bill_amt1, dtype=np.float64)), 1.0)
+    out[np.isnan(out)] = 0.0
+    return out
+
+
+def max_delay(*pay) -> np.ndarray:
+    # fmax пропускает NaN, как DataFrame.max(axis=1); целые колонки остаются целыми
+    return reduce(np.fmax, (np.asarray(p) for p in pay))
+
+
+# имя → (исходные колонки, функция)
+DERIVED: Dict[str, Tuple[Sequence[str], Callable[..., np.ndarray]]] = {
+    "utilization1": (["BILL_AMT1", "LIMIT_BAL"], utilization),
+    "payment_ratio1": (["PAY_AMT1", "BILL_AMT1"], payment_ratio),
+    "max_delay": (PAY_COLS, max_delay),
+}
+DERIVED_FEATS = list(DERIVED)
+
+
+def derived_features(cols: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """Все производные фичи по сырым колонкам."""
+    return {name: fn(*(cols[s] for s in src)) for name, (src, fn) in DERIVED.items()}
+
+
+def fill_missing_derived(cols: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Производные фичи, где значение не передано (None/NaN), досчитываются из сырых колонок.
+    Возвращает только изменённые колонки — записать их обратно должен вызывающий.
+    """
+    out = {}
+    for name, (src, fn) in DERIVED.items():
+        if name not in cols or not all(s in cols for s in src):
+            continue
+        cur = np.asarray(cols[name], dtype=np.float64)
+        miss = np.isnan(cur)
+        if miss.any():
+            out[name] = np.where(miss, fn(*(cols[s] for s in src)), cur)
+    return out
+
+
+def fill_missing_derived_matrix(x: np.ndarray, columns: Sequence[str]) -> np.ndarray:
+    """То же для матрицы строк × columns (in-place)."""
+    index = {c: j for j, c in enumerate(columns)}
+    filled = fill_missing_derived({c: x[:, j] for c, j in index.items()})
+    for name, values in filled.items():
+        x[:, index[name]] = values
+    return x
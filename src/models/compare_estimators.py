@@ -0,0 +1,118 @@
+"""
+Сравнение GBDT-движков из src/models/estimators.py (gbdt vs hgb): время обучения, латентность
+predict_proba (одна строка DataFrame, как SklearnBackend в API, и весь test), AUC, размер модели.
+"""
+
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from joblib import dump
+from sklearn.metrics import roc_auc_score
+
+from src.data.storage import find_table, read_table
+from src.models.estimators import (
+    CAT,
+    ESTIMATORS,
+    NUM,
+    TARGET,
+    build_pipeline,
+    thread_limit,
+)
+
+
+def latency_ms(fn, iters: int, warmup: int = 5) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    lat = []
+    for _ in range(iters):
+        t0 = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t0)
+    lat_ms = np.asarray(lat) * 1000
+    return {"p50": float(np.percentile(lat_ms, 50)), "p95": float(np.percentile(lat_ms, 95))}
+
+
+def bench(estimator: str, train, test, n_threads: Optional[int], row_iters: int) -> dict:
+    X_train, y_train = train.drop(columns=[TARGET]), train[TARGET]
+    X_test, y_test = test.drop(columns=[TARGET]), test[TARGET]
+    pipe = build_pipeline(estimator)
+    with thread_limit(n_threads):
+        t0 = time.perf_counter()
+        pipe.fit(X_train, y_train)
+        fit_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        proba = pipe.predict_proba(X_test)[:, 1]
+        batch_ms = (time.perf_counter() - t0) * 1000
+        row = X_test.iloc[[0]]
+        row_ms = latency_ms(lambda: pipe.predict_proba(row), row_iters)
+
+    buf = io.BytesIO()
+    dump(pipe, buf)
+    clf = pipe.named_steps["clf"]
+    return {
+        "estimator": estimator,
+        "n_threads": n_threads or os.cpu_count(),
+        "n_trees": int(getattr(clf, "n_iter_", getattr(clf, "n_estimators", 0))),
+        "fit_s": fit_s,
+        "predict_test_ms": batch_ms,
+        "predict_row_p50_ms": row_ms["p50"],
+        "predict_row_p95_ms": row_ms["p95"],
+        "test_auc": float(roc_auc_score(y_test, proba)),
+        "model_kb": buf.tell() / 1024,
+    }
+
+
+def main(
+    proc_dir: str,
+    out_path: str,
+    estimators: List[str],
+    threads: List[int],
+    row_iters: int = 300,
+) -> List[dict]:
+    d = Path(proc_dir)
+    cols = NUM + CAT + [TARGET]
+    train = read_table(find_table(d, "train"), columns=cols)
+    test = read_table(find_table(d, "test"), columns=cols)
+
+    results = []
+    for estimator in estimators:
+        # gbdt однопоточный — потоки ему не важны
+        for n in threads if estimator == "hgb" else [1]:
+            res = bench(estimator, train, test, n or None, row_iters)
+            results.append(res)
+            print(
+                f"{estimator:5s} threads={res['n_threads']:<3d} trees={res['n_trees']:<4d} "
+                f"fit={res['fit_s']:.2f}s test={res['predict_test_ms']:.1f}ms "
+                f"row p50={res['predict_row_p50_ms']:.2f}ms p95={res['predict_row_p95_ms']:.2f}ms "
+                f"auc={res['test_auc']:.5f} size={res['model_kb']:.0f}KB"
+            )
+
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    report = {"train_rows": len(train), "test_rows": len(test), "results": results}
+    Path(out_path).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--proc_dir", default="data/processed")
+    p.add_argument("--out", default="artifacts/estimators.json")
+    p.add_argument("--estimators", default=",".join(ESTIMATORS))
+    p.add_argument("--threads", default="1,0", help="потоки hgb через запятую, 0 — все ядра")
+    p.add_argument("--row_iters", type=int, default=300)
+    args = p.parse_args()
+    main(
+        args.proc_dir,
+        args.out,
+        args.estimators.split(","),
+        [int(t) for t in args.threads.split(",")],
+        args.row_iters,
+    )
@@ -0,0 +1,116 @@
+"""
+Признаки и конструкторы моделей: общий код для src/models/train.py, search.py и пода переобучения
+(scripts/model_training/train_model.py; в образ trainer файл копируется рядом со скриптом).
+Зависит только от numpy/sklearn — без src.*, mlflow и matplotlib.
+"""
+
+from contextlib import nullcontext
+from typing import Optional
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+TARGET = "default.payment.next.month"
+
+NUM = [
+    "LIMIT_BAL",
+    "AGE",
+    "BILL_AMT1",
+    "BILL_AMT2",
+    "BILL_AMT3",
+    "BILL_AMT4",
+    "BILL_AMT5",
+    "BILL_AMT6",
+    "PAY_AMT1",
+    "PAY_AMT2",
+    "PAY_AMT3",
+    "PAY_AMT4",
+    "PAY_AMT5",
+    "PAY_AMT6",
+    "utilization1",
+    "payment_ratio1",
+    "max_delay",
+]
+
+CAT = ["SEX", "EDUCATION", "MARRIAGE", "PAY_0", "PAY_2", "PAY_3", "PAY_4", "PAY_5", "PAY_6"]
+
+
+# gbdt — GradientBoostingClassifier (точные сплиты, один поток, 230 деревьев);
+# hgb — HistGradientBoostingClassifier (гистограммы, OpenMP, категории без one-hot, early stopping)
+ESTIMATORS = ("gbdt", "hgb")
+
+
+def build_preprocess(estimator: str = "gbdt") -> ColumnTransformer:
+    if estimator == "hgb":
+        # деревьям на гистограммах не нужны ни импутация, ни масштабирование: NaN — нативно;
+        # категории — коды 0..k-1, неизвестные → NaN (ветка пропусков)
+        cat = OrdinalEncoder(
+            handle_unknown="use_encoded_value", unknown_value=np.nan, encoded_missing_value=np.nan
+        )
+        return ColumnTransformer([("num", "passthrough", NUM), ("cat", cat, CAT)])
+
+    num_tf = Pipeline(
+        [
+            ("imp", SimpleImputer(strategy="median")),
+            ("sc", StandardScaler()),
+        ]
+    )
+
+    cat_tf = Pipeline(
+        [
+            ("imp", SimpleImputer(strategy="most_frequent")),
+            ("oh", OneHotEncoder(handle_unknown="ignore")),
+        ]
+    )
+
+    return ColumnTransformer(
+        [
+            ("num", num_tf, NUM),
+            ("cat", cat_tf, CAT),
+        ]
+    )
+
+
+def build_estimator(estimator: str = "gbdt"):
+    if estimator == "gbdt":
+        return GradientBoostingClassifier(
+            n_estimators=230,
+            learning_rate=0.06,
+            max_depth=3,
+        )
+    if estimator == "hgb":
+        return HistGradientBoostingClassifier(
+            learning_rate=0.06,
+            max_iter=500,
+            max_leaf_nodes=15,
+            min_samples_leaf=50,
+            # CAT идут после NUM на выходе build_preprocess("hgb")
+            categorical_features=list(range(len(NUM), len(NUM) + len(CAT))),
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=20,
+            random_state=42,
+        )
+    raise ValueError(f"Unknown estimator: {estimator} (expected one of {ESTIMATORS})")
+
+
+def build_pipeline(estimator: str = "gbdt") -> Pipeline:
+    return Pipeline(
+        [
+            ("pre", build_preprocess(estimator)),
+            ("clf", build_estimator(estimator)),
+        ]
+    )
+
+
+def thread_limit(n_threads: Optional[int]):
+    """Лимит OpenMP-потоков (hgb) на время fit/predict; None — все ядра."""
+    if not n_threads:
+        return nullcontext()
+    from threadpoolctl import threadpool_limits
+
+    return threadpool_limits(limits=n_threads, user_api="openmp")
@@ -3,8 +3,12 @@ from __future__ import annotations
 from pathlib import Path
 from datetime import datetime
 import json
+import shutil
+import tempfile
+import time
 import numpy as np
 import pandas as pd
+from joblib import Memory
 
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
@@ -12,13 +16,17 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.model_selection import RandomizedSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV, RandomizedSearchCV
 from sklearn.metrics import roc_auc_score, f1_score, precision_score, recall_score
 
 import mlflow
 import mlflow.sklearn
 from mlflow.models.signature import infer_signature
 
+from src.data.storage import find_table, read_table
+from src.models.estimators import build_pipeline, thread_limit
+
 
 TARGET = "default.payment.next.month"
 
@@ -30,6 +38,16 @@ NUM = [
 ]
 CAT = ["SEX","EDUCATION","MARRIAGE","PAY_0","PAY_2","PAY_3","PAY_4","PAY_5","PAY_6"]
 
+STRATEGIES = ("random", "halving")
+
+# ресурс successive halving: деревья для gbdt (слабых отсекаем после 40/120), строки — остальным;
+# min_resources="exhaust" — последний раунд получает весь ресурс
+HALVING_RESOURCES = {
+    "logreg": {"resource": "n_samples", "min_resources": "exhaust"},
+    "gbdt":   {"resource": "clf__n_estimators", "min_resources": 40, "max_resources": 400},
+    "hgb":    {"resource": "n_samples", "min_resources": "exhaust"},
+}
+
 
 def build_preprocess() -> ColumnTransformer:
     num_tf = Pipeline([("imp", SimpleImputer(strategy="median")), ("sc", StandardScaler())])
@@ -38,14 +56,102 @@ def build_preprocess() -> ColumnTransformer:
     return ColumnTransformer([("num", num_tf, NUM), ("cat", cat_tf, CAT)])
 
 
+class CountingMemory(Memory):
+    """
+    joblib.Memory для Pipeline(memory=...): препроцессинг фолда обучается один раз, остальные
+    кандидаты берут его из кэша. Каждый вызов пишет «hit|miss секунды» в log_path — файл общий
+    для процессов joblib (n_jobs=-1), счётчики в памяти воркеров до нас бы не дошли.
+    """
+
+    def __init__(self, location: str, log_path: str, **kwargs):
+        super().__init__(location, verbose=0, **kwargs)
+        self.log_path = log_path
+
+    def cache(self, func=None, **kwargs):
+        cached = super().cache(func, **kwargs)
+        log_path = self.log_path
+
+        def call(*args, **kw):
+            hit = cached.check_call_in_cache(*args, **kw)
+            t0 = time.perf_counter()
+            out = cached(*args, **kw)
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(f"{'hit' if hit else 'miss'} {time.perf_counter() - t0:.6f}\n")
+            return out
+
+        return call
+
+
+def cache_stats(log_path: str) -> dict:
+    """hit/miss и сэкономленное время: каждый hit вместо среднего fit_transform промаха."""
+    hits, misses = [], []
+    if Path(log_path).exists():
+        for line in Path(log_path).read_text(encoding="utf-8").splitlines():
+            kind, sec = line.split()
+            (hits if kind == "hit" else misses).append(float(sec))
+    mean_miss = float(np.mean(misses)) if misses else 0.0
+    return {
+        "cache_hits": len(hits),
+        "cache_misses": len(misses),
+        "cache_fit_s": float(sum(misses)),
+        "cache_load_s": float(sum(hits)),
+        "cache_time_saved_s": max(0.0, len(hits) * mean_miss - float(sum(hits))),
+    }
+
+
+def build_search(name: str, pipe: Pipeline, space: dict, strategy: str, n_iter: int, seed: int,
+                 factor: int = 3, n_candidates: int | None = None):
+    """random — n_iter полных fit'ов; halving — n_candidates на малом ресурсе, в следующий раунд
+    проходит лучшая 1/factor. По умолчанию 2*n_iter кандидатов: при factor=3 раунды стоят
+    примерно одинаково, и весь поиск — около бюджета random с n_iter."""
+    if strategy == "random":
+        return RandomizedSearchCV(pipe, space, n_iter=n_iter, scoring="roc_auc",
+                                  random_state=seed, n_jobs=-1, cv=3, verbose=0)
+    if strategy != "halving":
+        raise ValueError(f"Unknown search strategy: {strategy}")
+    res = HALVING_RESOURCES[name]
+    # ресурс задаёт сам halving — из пространства поиска его убираем
+    space = {k: v for k, v in space.items() if k != res["resource"]}
+    return HalvingRandomSearchCV(
+        pipe, space, n_candidates=n_candidates or 2 * n_iter, factor=factor,
+        resource=res["resource"], min_resources=res["min_resources"],
+        max_resources=res.get("max_resources", "auto"), scoring="roc_auc",
+        random_state=seed, n_jobs=-1, cv=3, verbose=0,
+    )
+
+
+def halving_rungs(rs: HalvingRandomSearchCV) -> list[dict]:
+    """Сводка по раундам: ресурс, число кандидатов, лучший/средний CV AUC."""
+    cv = pd.DataFrame(rs.cv_results_)
+    rungs = []
+    for i, g in cv.groupby("iter"):
+        rungs.append({
+            "rung": int(i),
+            "n_resources": int(rs.n_resources_[i]),
+            "n_candidates": int(rs.n_candidates_[i]),
+            "best_score": float(g["mean_test_score"].max()),
+            "mean_score": float(g["mean_test_score"].mean()),
+            "fit_time_s": float((g["mean_fit_time"] * rs.n_splits_).sum()),
+        })
+    return rungs
+
+
 def main(proc_dir: str,
          n_iter: int = 20,
          seed: int = 42,
-         save_root: str | None = "models/best_search"):
+         save_root: str | None = "models/best_search",
+         model_names: tuple[str, ...] = ("logreg", "gbdt", "hgb"),
+         n_threads: int | None = None,
+         cache_dir: str | None = None,
+         use_cache: bool = True,
+         strategy: str = "random",
+         factor: int = 3,
+         n_candidates: int | None = None):
 
     d = Path(proc_dir)
-    train = pd.read_csv(d / "train.csv")
-    test  = pd.read_csv(d / "test.csv")
+    cols = NUM + CAT + [TARGET]
+    train = read_table(find_table(d, "train"), columns=cols)
+    test  = read_table(find_table(d, "test"), columns=cols)
     Xtr, ytr = train.drop(columns=[TARGET]), train[TARGET]
     Xte, yte = test.drop(columns=[TARGET]),  test[TARGET]
 
@@ -54,7 +160,21 @@ def main(proc_dir: str,
     models = {
         "logreg": Pipeline([("pre", pre), ("clf", LogisticRegression(max_iter=5000))]),
         "gbdt":   Pipeline([("pre", pre), ("clf", GradientBoostingClassifier())]),
+        # гистограммный бустинг: свой препроцессинг (без one-hot), early stopping по валидации
+        "hgb":    build_pipeline("hgb"),
     }
+    models = {k: v for k, v in models.items() if k in model_names}
+
+    # кэш обученного препроцессинга: меняются только clf__*, ColumnTransformer на фолде один
+    tmp_cache = None
+    if use_cache and cache_dir is None:
+        cache_dir = tmp_cache = tempfile.mkdtemp(prefix="search_cache_")
+    cache_logs = {}
+    if use_cache:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        for name, pipe in models.items():
+            cache_logs[name] = str(Path(cache_dir) / f"calls_{name}_{time.time_ns()}.log")
+            pipe.set_params(memory=CountingMemory(cache_dir, cache_logs[name]))
 
     search_spaces = {
         "logreg": {
@@ -67,6 +187,12 @@ def main(proc_dir: str,
             "clf__learning_rate": np.logspace(-3, -0.1, 20),
             "clf__max_depth": np.arange(2, 6),
         },
+        "hgb": {
+            "clf__learning_rate": np.logspace(-2, -0.5, 20),
+            "clf__max_leaf_nodes": [7, 15, 31, 63],
+            "clf__min_samples_leaf": [20, 50, 100, 200],
+            "clf__l2_regularization": [0.0, 0.1, 1.0, 10.0],
+        },
     }
 
     mlflow.set_tracking_uri("file:./mlruns")
@@ -76,11 +202,28 @@ def main(proc_dir: str,
 
     for name, pipe in models.items():
         with mlflow.start_run(run_name=f"search_{name}") as run:
-            rs = RandomizedSearchCV(
-                pipe, search_spaces[name], n_iter=n_iter, scoring="roc_auc",
-                random_state=seed, n_jobs=-1, cv=3, verbose=0
-            )
-            rs.fit(Xtr, ytr)
+            rs = build_search(name, pipe, search_spaces[name], strategy, n_iter, seed,
+                              factor, n_candidates)
+            # n_jobs=-1: потоки OpenMP внутри воркеров joblib ограничивает сам
+            t0 = time.perf_counter()
+            with thread_limit(n_threads):
+                rs.fit(Xtr, ytr)
+            search_s = time.perf_counter() - t0
+            mlflow.log_params({"search_strategy": strategy, "n_candidates": len(rs.cv_results_["params"])})
+            mlflow.log_metric("search_time_s", search_s)
+
+            if strategy == "halving":
+                rungs = halving_rungs(rs)
+                # каждый раунд — шаг метрик rung_*, полная таблица — артефактом
+                for r in rungs:
+                    mlflow.log_metrics({f"rung_{k}": v for k, v in r.items() if k != "rung"},
+                                       step=r["rung"])
+                    print(f"[{name}] rung {r['rung']}: {r['n_candidates']} candidates x "
+                          f"{r['n_resources']} {rs.resource}, best cv AUC={r['best_score']:.5f}")
+                mlflow.log_dict({"resource": rs.resource, "factor": factor, "rungs": rungs},
+                                "halving_rungs.json")
+            print(f"[{name}] {strategy} search: {len(rs.cv_results_['params'])} fits/fold "
+                  f"in {search_s:.1f}s")
 
             best = rs.best_estimator_
             proba = best.predict_proba(Xte)[:, 1]
@@ -103,6 +246,11 @@ def main(proc_dir: str,
             for k, v in metrics.items():
                 if k.startswith("test_") or k == "cv_best_score":
                     mlflow.log_metric(k, v)
+            if name in cache_logs:
+                stats = cache_stats(cache_logs[name])
+                mlflow.log_metrics(stats)
+                print(f"[{name}] preprocess cache: {stats['cache_hits']} hits, "
+                      f"{stats['cache_misses']} misses, ~{stats['cache_time_saved_s']:.1f}s saved")
 
             # логируем в MLflow с подписью
             mlflow.sklearn.log_model(
@@ -121,6 +269,9 @@ def main(proc_dir: str,
             if (best_global is None) or (metrics["test_auc"] > best_global[0]):
                 best_global = (metrics["test_auc"], name, best)
 
+    if tmp_cache:
+        shutil.rmtree(tmp_cache, ignore_errors=True)
+
     if best_global:
         print(f"Best by AUC: {best_global[1]} (AUC={best_global[0]:.5f})")
 
@@ -132,5 +283,14 @@ if __name__ == "__main__":
     p.add_argument("--n_iter", type=int, default=20)
     p.add_argument("--seed", type=int, default=42)
     p.add_argument("--save_root", default="models/best_search")
+    p.add_argument("--models", default="logreg,gbdt,hgb", help="через запятую: logreg,gbdt,hgb")
+    p.add_argument("--n_threads", type=int, default=None)
+    p.add_argument("--cache_dir", default=None, help="кэш препроцессинга (по умолчанию — временный)")
+    p.add_argument("--no_cache", action="store_true")
+    p.add_argument("--strategy", choices=STRATEGIES, default="random")
+    p.add_argument("--factor", type=int, default=3, help="halving: доля выживших 1/factor")
+    p.add_argument("--n_candidates", type=int, default=None, help="halving: по умолчанию 2*n_iter")
     args = p.parse_args()
-    main(args.proc_dir, args.n_iter, args.seed, args.save_root)
\ No newline at end of file
+    main(args.proc_dir, args.n_iter, args.seed, args.save_root,
+         tuple(args.models.split(",")), args.n_threads, args.cache_dir, not args.no_cache,
+         args.strategy, args.factor, args.n_candidates)
\ No newline at end of file
@@ -1,14 +1,12 @@
 from pathlib import Path
 import json
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import mlflow
 import mlflow.sklearn
 import pandas as pd
 from joblib import dump
-from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.impute import SimpleImputer
 from sklearn.metrics import (
     RocCurveDisplay,
     f1_score,
@@ -16,88 +14,38 @@ from sklearn.metrics import (
     recall_score,
     roc_auc_score,
 )
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-
-TARGET = "default.payment.next.month"
-
-NUM = [
-    "LIMIT_BAL",
-    "AGE",
-    "BILL_AMT1",
-    "BILL_AMT2",
-    "BILL_AMT3",
-    "BILL_AMT4",
-    "BILL_AMT5",
-    "BILL_AMT6",
-    "PAY_AMT1",
-    "PAY_AMT2",
-    "PAY_AMT3",
-    "PAY_AMT4",
-    "PAY_AMT5",
-    "PAY_AMT6",
-    "utilization1",
-    "payment_ratio1",
-    "max_delay",
-]
-
-CAT = ["SEX", "EDUCATION", "MARRIAGE", "PAY_0", "PAY_2", "PAY_3", "PAY_4", "PAY_5", "PAY_6"]
-
-
-def build_pipeline() -> Pipeline:
-    num_tf = Pipeline(
-        [
-            ("imp", SimpleImputer(strategy="median")),
-            ("sc", StandardScaler()),
-        ]
-    )
-
-    cat_tf = Pipeline(
-        [
-            ("imp", SimpleImputer(strategy="most_frequent")),
-            ("oh", OneHotEncoder(handle_unknown="ignore")),
-        ]
-    )
-
-    pre = ColumnTransformer(
-        [
-            ("num", num_tf, NUM),
-            ("cat", cat_tf, CAT),
-        ]
-    )
 
-    return Pipeline(
-        [
-            ("pre", pre),
-            (
-                "clf",
-                GradientBoostingClassifier(
-                    n_estimators=230,
-                    learning_rate=0.06,
-                    max_depth=3,
-                ),
-            ),
-        ]
-    )
+from src.data.storage import find_table, read_table
+from src.models.estimators import CAT, ESTIMATORS, NUM, TARGET, build_pipeline, thread_limit
+from src.monitor.psi import build_reference_profile, save_profile
 
 
-def main(proc_dir: str, model_path: str, metrics_path: str, roc_path: str) -> None:
+def main(
+    proc_dir: str,
+    model_path: str,
+    metrics_path: str,
+    roc_path: str,
+    prediction_profile_path: str = "models/prediction_profile.json",
+    estimator: str = "gbdt",
+    n_threads: Optional[int] = None,
+) -> None:
     d = Path(proc_dir)
 
-    train = pd.read_csv(d / "train.csv")
-    test = pd.read_csv(d / "test.csv")
+    cols = NUM + CAT + [TARGET]
+    train = read_table(find_table(d, "train"), columns=cols)
+    test = read_table(find_table(d, "test"), columns=cols)
 
     X_train, y_train = train.drop(columns=[TARGET]), train[TARGET]
     X_test, y_test = test.drop(columns=[TARGET]), test[TARGET]
 
-    pipe = build_pipeline()
-    pipe.fit(X_train, y_train)
-
-    proba = pipe.predict_proba(X_test)[:, 1]
+    pipe = build_pipeline(estimator)
+    with thread_limit(n_threads):
+        pipe.fit(X_train, y_train)
+        proba = pipe.predict_proba(X_test)[:, 1]
     pred = (proba >= 0.5).astype(int)
 
     metrics = {
-        "model": "gbdt",
+        "model": estimator,
         "test_auc": float(roc_auc_score(y_test, proba)),
         "test_f1": float(f1_score(y_test, pred)),
         "test_precision": float(precision_score(y_test, pred, zero_division=0)),
@@ -109,6 +57,12 @@ def main(proc_dir: str, model_path: str, metrics_path: str, roc_path: str) -> No
 
     Path(metrics_path).write_text(json.dumps(metrics, indent=2, ensure_ascii=False))
 
+    # бины proba_default на отложенной выборке — эталон для онлайн-дрейфа в API (app/drift.py)
+    pred_profile = build_reference_profile(
+        pd.DataFrame({"proba_default": proba}), ["proba_default"]
+    )
+    save_profile(pred_profile, prediction_profile_path)
+
     RocCurveDisplay.from_predictions(y_test, proba)
     Path(roc_path).parent.mkdir(parents=True, exist_ok=True)
     plt.tight_layout()
@@ -122,7 +76,11 @@ def main(proc_dir: str, model_path: str, metrics_path: str, roc_path: str) -> No
         for k, v in metrics.items():
             if k.startswith("test_"):
                 mlflow.log_metric(k, v)
-        mlflow.log_param("model", "gbdt")
+        mlflow.log_param("model", estimator)
+        mlflow.log_param("n_threads", n_threads or "all")
+        if estimator == "hgb":
+            # сколько итераций осталось после early stopping
+            mlflow.log_param("n_iter", pipe.named_steps["clf"].n_iter_)
         mlflow.log_artifact(roc_path)
         mlflow.sklearn.log_model(pipe, artifact_path="model")
 
@@ -137,6 +95,17 @@ if __name__ == "__main__":
     parser.add_argument("--model_path", default="models/credit_default_model.pkl")
     parser.add_argument("--metrics_path", default="metrics.json")
     parser.add_argument("--roc_path", default="artifacts/roc.png")
+    parser.add_argument("--prediction_profile_path", default="models/prediction_profile.json")
+    parser.add_argument("--estimator", choices=ESTIMATORS, default="gbdt")
+    parser.add_argument("--n_threads", type=int, default=None, help="OpenMP-потоки для hgb")
     args = parser.parse_args()
 
-    main(args.proc_dir, args.model_path, args.metrics_path, args.roc_path)
\ No newline at end of file
+    main(
+        args.proc_dir,
+        args.model_path,
+        args.metrics_path,
+        args.roc_path,
+        args.prediction_profile_path,
+        args.estimator,
+        args.n_threads,
+    )
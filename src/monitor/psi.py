@@ -1,12 +1,24 @@
 from __future__ import annotations
 
 import json
+from collections import Counter
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 
+from src.data.storage import iter_table, read_table, table_columns
+
+
+def load_feature_list(path: str) -> Tuple[List[str], List[str]]:
+    """feature_list.json → (num_feats, cat_feats); старый формат — просто список числовых."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return list(data.get("num_feats", [])), list(data.get("cat_feats", []))
+    return list(data), []
+
 
 def _bin_edges(series: pd.Series, bins: int = 10) -> np.ndarray:
     """Квантили как границы бинов (устойчивее к выбросам, чем равные интервалы)."""
@@ -29,18 +41,229 @@ def psi(base: pd.Series, current: pd.Series, bins: int = 10, eps: float = 1e-8)
     Чем выше PSI, тем сильнее сдвиг распределения (обычно пороги 0.1/0.25).
     """
     edges = _bin_edges(base, bins=bins)
-    # hist по одинаковым границам
-    base_cnt, _ = np.histogram(base.dropna().astype(float), bins=edges)
-    curr_cnt, _ = np.histogram(current.dropna().astype(float), bins=edges)
+    # hist по одинаковым границам; крайние бины открыты (clip), как в _counts_from_sorted
+    base_cnt, _ = np.histogram(np.clip(base.dropna().astype(float), edges[0], edges[-1]), edges)
+    curr_cnt, _ = np.histogram(np.clip(current.dropna().astype(float), edges[0], edges[-1]), edges)
+    return psi_from_counts(base_cnt, curr_cnt, eps=eps)
+
+
+def psi_from_counts(base_cnt: np.ndarray, curr_cnt: np.ndarray, eps: float = 1e-8) -> float:
+    """PSI по готовым гистограммам на одних и тех же бинах."""
+    offsets = np.array([0, len(base_cnt)])
+    return float(_psi_segments(base_cnt, curr_cnt, offsets, eps=eps)[0])
+
+
+# ==== MATRIX KERNELS ====
+# Все фичи разом: x — float-матрица (строки × фичи), NaN — пропуски. Колонки сортируются один
+# раз (np.sort(axis=0)), из сортировки берутся и квантили, и гистограммы: счётчики бинов —
+# searchsorted границ в отсортированную колонку. Бины фич разной длины лежат подряд в одном
+# плоском массиве, offsets[j]:offsets[j + 1] — бины фичи j.
+
+
+def _sort_columns(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Сортировка по колонкам (NaN — в конец) и число непустых значений в каждой."""
+    x = np.sort(np.asfortranarray(x, dtype=np.float64), axis=0)
+    return x, np.count_nonzero(~np.isnan(x), axis=0)
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    # та же формула, что в np.quantile(method="linear") — границы совпадают бит в бит
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def _edges_from_sorted(
+    xs: np.ndarray, n_valid: np.ndarray, bins: int
+) -> List[Optional[np.ndarray]]:
+    qs = np.linspace(0.0, 1.0, bins + 1)
+    virtual = qs[:, None] * (np.maximum(n_valid, 1) - 1)
+    lo = np.floor(virtual).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(n_valid - 1, 0))
+    q = _lerp(np.take_along_axis(xs, lo, axis=0), np.take_along_axis(xs, hi, axis=0), virtual - lo)
+    edges: List[Optional[np.ndarray]] = []
+    for j in range(xs.shape[1]):
+        if n_valid[j] == 0:
+            edges.append(None)
+            continue
+        e = np.unique(q[:, j])
+        # константная колонка — одна «коробка» [v, v]
+        edges.append(e if len(e) > 1 else np.repeat(e, 2))
+    return edges
+
+
+def _counts_from_sorted(
+    xs: np.ndarray, n_valid: np.ndarray, edges: Sequence[np.ndarray]
+) -> np.ndarray:
+    """
+    Бины [e_i, e_i+1), последний закрыт; крайние бины открыты: значения левее e_0 — в первый,
+    правее e_-1 — в последний (сдвиг за диапазон train должен давать PSI, а не пропадать).
+    """
+    out = []
+    for j, e in enumerate(edges):
+        col = xs[: n_valid[j], j]
+        pos = np.searchsorted(col, e, side="left")
+        pos[0], pos[-1] = 0, len(col)
+        out.append(np.diff(pos))
+    return np.concatenate(out) if out else np.zeros(0, dtype=np.int64)
 
-    base_p = base_cnt / max(base_cnt.sum(), eps)
-    curr_p = curr_cnt / max(curr_cnt.sum(), eps)
+
+def quantile_edges(x: np.ndarray, bins: int = 10) -> List[Optional[np.ndarray]]:
+    """Квантильные границы бинов всех колонок; None — колонка без значений."""
+    return _edges_from_sorted(*_sort_columns(x), bins=bins)
+
+
+def bin_counts(x: np.ndarray, edges: Sequence[np.ndarray]) -> np.ndarray:
+    """Плоские гистограммы всех колонок x по заданным границам."""
+    return _counts_from_sorted(*_sort_columns(x), edges=edges)
+
+
+def _offsets(edges: Sequence[np.ndarray]) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum([len(e) - 1 for e in edges])]).astype(np.int64)
+
+
+def _psi_segments(
+    base_cnt: np.ndarray, curr_cnt: np.ndarray, offsets: np.ndarray, eps: float = 1e-8
+) -> np.ndarray:
+    """PSI каждой фичи по плоским счётчикам."""
+    base_cnt = np.asarray(base_cnt, dtype=np.float64)
+    curr_cnt = np.asarray(curr_cnt, dtype=np.float64)
+    starts, sizes = offsets[:-1], np.diff(offsets)
+    base_tot = np.maximum(np.add.reduceat(base_cnt, starts), eps)
+    curr_tot = np.maximum(np.add.reduceat(curr_cnt, starts), eps)
 
     # Избегаем деления на ноль и log(0)
-    base_p = np.maximum(base_p, eps)
-    curr_p = np.maximum(curr_p, eps)
+    base_p = np.maximum(base_cnt / np.repeat(base_tot, sizes), eps)
+    curr_p = np.maximum(curr_cnt / np.repeat(curr_tot, sizes), eps)
+    return np.add.reduceat((curr_p - base_p) * np.log(curr_p / base_p), starts)
+
+
+def psi_matrix(base: np.ndarray, current: np.ndarray, bins: int = 10) -> np.ndarray:
+    """PSI всех колонок; NaN — колонка без значений в base."""
+    base_sorted, base_n = _sort_columns(base)
+    edges = _edges_from_sorted(base_sorted, base_n, bins=bins)
+    keep = [j for j, e in enumerate(edges) if e is not None]
+    out = np.full(base.shape[1], np.nan)
+    if not keep:
+        return out
+    kept = [edges[j] for j in keep]
+    base_cnt = _counts_from_sorted(base_sorted[:, keep], base_n[keep], kept)
+    curr_cnt = bin_counts(current[:, keep], kept)
+    out[keep] = _psi_segments(base_cnt, curr_cnt, _offsets(kept))
+    return out
+
+
+def category_frequencies(values) -> Tuple[np.ndarray, np.ndarray]:
+    """(категории, частоты) без пропусков."""
+    v = np.asarray(values)
+    return np.unique(v[pd.notna(v)], return_counts=True)
+
+
+def categorical_psi(base_values, base_counts, current, eps: float = 1e-8) -> float:
+    """PSI по частотам категорий; новые категории имеют базовую долю eps."""
+    return categorical_psi_from_counts(
+        base_values, base_counts, *category_frequencies(current), eps
+    )
+
+
+def categorical_psi_from_counts(
+    base_values, base_counts, cur_values, cur_counts, eps: float = 1e-8
+) -> float:
+    base_values, cur_values = np.asarray(base_values), np.asarray(cur_values)
+    cats = np.union1d(base_values, cur_values)
+    base_cnt = np.zeros(len(cats))
+    curr_cnt = np.zeros(len(cats))
+    base_cnt[np.searchsorted(cats, base_values)] = base_counts
+    curr_cnt[np.searchsorted(cats, cur_values)] = cur_counts
+    return psi_from_counts(base_cnt, curr_cnt, eps=eps)
+
+
+def _numeric_columns(df: pd.DataFrame, features: Iterable[str], *others: pd.DataFrame):
+    return [
+        c
+        for c in features
+        if c in df.columns
+        and pd.api.types.is_numeric_dtype(df[c])
+        and all(c in o.columns and pd.api.types.is_numeric_dtype(o[c]) for o in others)
+    ]
+
+
+def _as_matrix(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+    return df[cols].to_numpy(dtype=np.float64, na_value=np.nan)
 
-    return float(np.sum((curr_p - base_p) * np.log(curr_p / base_p)))
+
+# ==== REFERENCE PROFILE ====
+# Профиль обучающей выборки: границы бинов и базовые счётчики по числовым фичам,
+# частоты категорий. Дрейф-джобы читают только его, а не всю выборку.
+
+PROFILE_VERSION = 1
+
+
+def build_reference_profile(
+    df: pd.DataFrame,
+    num_feats: Iterable[str],
+    cat_feats: Iterable[str] = (),
+    bins: int = 10,
+) -> dict:
+    numeric = {}
+    cols = _numeric_columns(df, num_feats)
+    if cols:
+        xs, n_valid = _sort_columns(_as_matrix(df, cols))
+        edges = _edges_from_sorted(xs, n_valid, bins=bins)
+        keep = [j for j, e in enumerate(edges) if e is not None]
+        kept = [edges[j] for j in keep]
+        offsets = _offsets(kept)
+        counts = _counts_from_sorted(xs[:, keep], n_valid[keep], kept)
+        for i, j in enumerate(keep):
+            numeric[cols[j]] = {
+                "edges": kept[i].tolist(),
+                "counts": counts[offsets[i] : offsets[i + 1]].tolist(),
+            }
+    categorical = {}
+    for col in cat_feats:
+        if col not in df.columns:
+            continue
+        values, counts = category_frequencies(df[col])
+        categorical[col] = {"values": values.tolist(), "counts": counts.tolist()}
+    return {
+        "version": PROFILE_VERSION,
+        "bins": bins,
+        "n_rows": int(len(df)),
+        "numeric": numeric,
+        "categorical": categorical,
+    }
+
+
+def save_profile(profile: dict, path: str) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(profile, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def load_profile(path: str) -> dict:
+    profile = json.loads(Path(path).read_text(encoding="utf-8"))
+    if profile.get("version") != PROFILE_VERSION:
+        raise ValueError(f"Unsupported reference profile version in {path}")
+    return profile
+
+
+def _avg(per_feature: Dict[str, float]) -> float:
+    return float(np.mean(list(per_feature.values()))) if per_feature else 0.0
+
+
+def compute_psi_report_from_profile(
+    profile: dict,
+    stream: pd.DataFrame,
+    features: Iterable[str],
+) -> Tuple[float, Dict[str, float]]:
+    """Как compute_psi_report, но база — сохранённый профиль (границы и счётчики)."""
+    cols = [c for c in _numeric_columns(stream, features) if c in profile["numeric"]]
+    if not cols:
+        return 0.0, {}
+    edges = [np.asarray(profile["numeric"][c]["edges"], dtype=np.float64) for c in cols]
+    offsets = _offsets(edges)
+    base_cnt = np.concatenate([profile["numeric"][c]["counts"] for c in cols])
+    curr_cnt = bin_counts(_as_matrix(stream, cols), edges)
+    per_feature = dict(zip(cols, _psi_segments(base_cnt, curr_cnt, offsets).tolist()))
+    return _avg(per_feature), per_feature
 
 
 def compute_psi_report(
@@ -49,51 +272,185 @@ def compute_psi_report(
     features: Iterable[str],
     bins: int = 10,
 ) -> Tuple[float, Dict[str, float]]:
-    """Возвращает (avg_psi, per_feature_psi)."""
+    """Возвращает (avg_psi, per_feature_psi). Нечисловые колонки пропускаются."""
+    cols = _numeric_columns(train, features, stream)
+    if not cols:
+        return 0.0, {}
+    values = psi_matrix(_as_matrix(train, cols), _as_matrix(stream, cols), bins=bins)
+    per_feature = {c: float(v) for c, v in zip(cols, values) if not np.isnan(v)}
+    return _avg(per_feature), per_feature
+
+
+def compute_categorical_psi(
+    train: pd.DataFrame, stream: pd.DataFrame, cat_features: Iterable[str]
+) -> Dict[str, float]:
     per_feature: Dict[str, float] = {}
-    for col in features:
-        if col not in train.columns or col not in stream.columns:
-            continue
-        try:
-            per_feature[col] = psi(train[col], stream[col], bins=bins)
-        except Exception:
-            # На случай строковых/категориальных коллапсов — пропустим
-            continue
+    for col in cat_features:
+        if col in train.columns and col in stream.columns:
+            values, counts = category_frequencies(train[col])
+            per_feature[col] = categorical_psi(values, counts, stream[col])
+    return per_feature
+
+
+def compute_categorical_psi_from_profile(
+    profile: dict, stream: pd.DataFrame, cat_features: Iterable[str]
+) -> Dict[str, float]:
+    per_feature: Dict[str, float] = {}
+    for col in cat_features:
+        ref = profile["categorical"].get(col)
+        if ref is not None and col in stream.columns:
+            per_feature[col] = categorical_psi(ref["values"], ref["counts"], stream[col])
+    return per_feature
+
+
+# ==== STREAMING ====
+
+
+class DriftCounter:
+    """
+    Счётчики текущих данных по бинам профиля. Обновляется чанками (память не зависит
+    от размера данных), частичные результаты разных файлов/воркеров складываются merge().
+    """
+
+    def __init__(
+        self,
+        profile: dict,
+        features: Optional[Iterable[str]] = None,
+        cat_features: Optional[Iterable[str]] = None,
+    ):
+        self.profile = profile
+        features = profile["numeric"] if features is None else features
+        cat_features = profile["categorical"] if cat_features is None else cat_features
+        self.features = [c for c in features if c in profile["numeric"]]
+        self.cat_features = [c for c in cat_features if c in profile["categorical"]]
+        self.edges = [
+            np.asarray(profile["numeric"][c]["edges"], dtype=np.float64) for c in self.features
+        ]
+        self.offsets = _offsets(self.edges)
+        self.counts = np.zeros(int(self.offsets[-1]), dtype=np.int64)
+        self.cat_counts: Dict[str, Counter] = {c: Counter() for c in self.cat_features}
+        # фичи, которые встречались в данных (отсутствующие в отчёт не попадают)
+        self.seen: set = set()
+        self.rows = 0
+
+    def update(self, chunk: pd.DataFrame) -> "DriftCounter":
+        present = [j for j, c in enumerate(self.features) if c in chunk.columns]
+        if present:
+            cols = [self.features[j] for j in present]
+            cnt = bin_counts(_as_matrix(chunk, cols), [self.edges[j] for j in present])
+            if len(present) == len(self.features):
+                self.counts += cnt
+            else:
+                pos = np.concatenate(
+                    [np.arange(self.offsets[j], self.offsets[j + 1]) for j in present]
+                )
+                self.counts[pos] += cnt
+            self.seen.update(cols)
+        for col in self.cat_features:
+            if col in chunk.columns:
+                values, counts = category_frequencies(chunk[col])
+                self.cat_counts[col].update(dict(zip(values.tolist(), counts.tolist())))
+                self.seen.add(col)
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other: "DriftCounter") -> "DriftCounter":
+        if other.features != self.features or other.cat_features != self.cat_features:
+            raise ValueError("Cannot merge drift counters built for different features")
+        self.counts += other.counts
+        for col, counts in other.cat_counts.items():
+            self.cat_counts[col].update(counts)
+        self.seen |= other.seen
+        self.rows += other.rows
+        return self
 
-    avg = float(np.mean(list(per_feature.values()))) if per_feature else 0.0
-    return avg, per_feature
+    def report(self) -> Tuple[float, Dict[str, float], Dict[str, float]]:
+        """(avg_psi, per_feature, per_feature_categorical) по накопленным счётчикам."""
+        per_feature: Dict[str, float] = {}
+        if self.features:
+            base = np.concatenate([self.profile["numeric"][c]["counts"] for c in self.features])
+            values = _psi_segments(base, self.counts, self.offsets)
+            per_feature = {c: float(v) for c, v in zip(self.features, values) if c in self.seen}
+        per_category: Dict[str, float] = {}
+        for col in self.cat_features:
+            if col in self.seen:
+                ref, cur = self.profile["categorical"][col], self.cat_counts[col]
+                per_category[col] = categorical_psi_from_counts(
+                    ref["values"], ref["counts"], list(cur), list(cur.values())
+                )
+        return _avg(per_feature), per_feature, per_category
+
+
+def stream_drift(
+    profile: dict,
+    paths: Iterable[str],
+    features: Optional[Iterable[str]] = None,
+    cat_features: Optional[Iterable[str]] = None,
+    chunksize: int = 500_000,
+) -> DriftCounter:
+    """Счётчики по всем файлам (каждый читается чанками только нужных колонок)."""
+    total = DriftCounter(profile, features, cat_features)
+    for path in paths:
+        part = DriftCounter(profile, total.features, total.cat_features)
+        present = set(table_columns(path))
+        cols = [c for c in total.features + total.cat_features if c in present]
+        for chunk in iter_table(path, columns=cols, chunksize=chunksize):
+            part.update(chunk)
+        total.merge(part)
+    return total
 
 
 def main(
-    train_path: str = "data/processed/train.csv",
-    stream_path: str = "data/processed/test.csv",
+    train_path: str = "data/processed/train.parquet",
+    stream_path: str = "data/processed/test.parquet",
     features_path: str = "feature_list.json",
     out_path: str = "reports/psi.json",
     bins: int = 10,
+    profile_path: Optional[str] = None,
+    chunksize: int = 500_000,
 ) -> None:
     Path(out_path).parent.mkdir(parents=True, exist_ok=True)
 
-    train = pd.read_csv(train_path)
-    stream = pd.read_csv(stream_path)
-
     # Берём список фич из feature_list.json, если он есть
-    features: List[str]
+    num_feats: List[str]
+    cat_feats: List[str] = []
     if Path(features_path).exists():
-        with open(features_path, "r", encoding="utf-8") as f:
-            features = json.load(f)
+        num_feats, cat_feats = load_feature_list(features_path)
+    if profile_path:
+        # база — сохранённый профиль, обучающую выборку не читаем
+        profile = load_profile(profile_path)
+        bins = int(profile["bins"])
+        if not Path(features_path).exists():
+            num_feats, cat_feats = list(profile["numeric"]), list(profile["categorical"])
+        # текущие данные — потоково, чанками по chunksize строк
+        counter = stream_drift(profile, [stream_path], num_feats, cat_feats, chunksize=chunksize)
+        avg, per_feature, per_category = counter.report()
     else:
-        # иначе — все числовые столбцы пересечения
-        num_train = train.select_dtypes(include=["number"]).columns
-        num_stream = stream.select_dtypes(include=["number"]).columns
-        features = sorted(set(num_train).intersection(set(num_stream)))
-
-    avg, per_feature = compute_psi_report(train, stream, features, bins=bins)
+        if Path(features_path).exists():
+            # читаем только нужные колонки
+            train_cols = set(table_columns(train_path))
+            stream_cols = set(table_columns(stream_path))
+            cols = [c for c in num_feats + cat_feats if c in train_cols and c in stream_cols]
+            train = read_table(train_path, columns=cols)
+            stream = read_table(stream_path, columns=cols)
+        else:
+            train = read_table(train_path)
+            stream = read_table(stream_path)
+            # иначе — все числовые столбцы пересечения
+            num_train = train.select_dtypes(include=["number"]).columns
+            num_stream = stream.select_dtypes(include=["number"]).columns
+            num_feats = sorted(set(num_train).intersection(set(num_stream)))
+        avg, per_feature = compute_psi_report(train, stream, num_feats, bins=bins)
+        per_category = compute_categorical_psi(train, stream, cat_feats)
 
     report = {
         "avg_psi": avg,
         "bins": bins,
         "n_features": len(per_feature),
         "per_feature": per_feature,
+        # категориальные — отдельно, avg_psi остаётся по числовым (как порог в DAG)
+        "avg_psi_categorical": _avg(per_category),
+        "per_feature_categorical": per_category,
     }
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(report, f, indent=2, ensure_ascii=False)
@@ -105,11 +462,15 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Compute PSI drift report")
-    parser.add_argument("--train", default="data/processed/train.csv")
-    parser.add_argument("--stream", default="data/processed/test.csv")
+    parser.add_argument("--train", default="data/processed/train.parquet")
+    parser.add_argument("--stream", default="data/processed/test.parquet")
     parser.add_argument("--features", default="feature_list.json")
     parser.add_argument("--out", default="reports/psi.json")
     parser.add_argument("--bins", type=int, default=10)
+    parser.add_argument(
+        "--profile", default=None, help="reference_profile.json вместо --train (bins из профиля)"
+    )
+    parser.add_argument("--chunksize", type=int, default=500_000)
     args = parser.parse_args()
 
     main(
@@ -118,4 +479,6 @@ if __name__ == "__main__":
         features_path=args.features,
         out_path=args.out,
         bins=args.bins,
+        profile_path=args.profile,
+        chunksize=args.chunksize,
     )
@@ -1,4 +1,5 @@
 import argparse
+import csv
 import json
 import time
 from pathlib import Path
@@ -35,41 +36,209 @@ def bench_onnx(sess, x: np.ndarray, iters: int, warmup: int):
     return (time.perf_counter() - t0) / iters
 
 
-def make_session(model_path: str, provider: str):
+def make_session(model_path: str, provider: str, intra: int = 8, inter: int = 1):
     so = ort.SessionOptions()
     so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-    so.intra_op_num_threads = 8
-    so.inter_op_num_threads = 1
+    so.intra_op_num_threads = intra
+    so.inter_op_num_threads = inter
     return ort.InferenceSession(model_path, sess_options=so, providers=[provider])
 
 
+def parse_ints(s: str) -> list[int]:
+    return [int(v) for v in s.split(",") if v.strip()]
+
+
+# ==== SWEEP ====
+
+
+def measure(fn, iters: int, warmup: int, budget_s: float) -> np.ndarray:
+    """Латентности отдельных вызовов (сек); останавливаемся по iters или по бюджету времени."""
+    for _ in range(warmup):
+        fn()
+    lat = []
+    t_end = time.perf_counter() + budget_s
+    while len(lat) < iters and (len(lat) < 5 or time.perf_counter() < t_end):
+        t0 = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t0)
+    return np.asarray(lat)
+
+
+def summarize(engine: str, batch: int, intra, inter, lat: np.ndarray) -> dict:
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return {
+        "engine": engine,
+        "batch": batch,
+        "intra_threads": intra,
+        "inter_threads": inter,
+        "iters": int(len(lat)),
+        "mean_ms": float(lat.mean() * 1000.0),
+        "p50_ms": float(p50 * 1000.0),
+        "p95_ms": float(p95 * 1000.0),
+        "p99_ms": float(p99 * 1000.0),
+        "rows_per_s": float(batch / lat.mean()),
+    }
+
+
+def load_sklearn_inputs(model_path: str, data_path: str):
+    import joblib
+    import pandas as pd
+
+    pipe = joblib.load(model_path)
+    cols = list(pipe.named_steps["pre"].feature_names_in_)
+    if data_path.endswith(".parquet"):
+        df = pd.read_parquet(data_path, columns=cols)
+    else:
+        df = pd.read_csv(data_path, usecols=cols)[cols]
+    return pipe, df
+
+
+def run_sweep(args, model: CreditMLP, n_features: int) -> list[dict]:
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    batches = parse_ints(args.batches)
+    intra_grid = parse_ints(args.intra_grid)
+    inter_grid = parse_ints(args.inter_grid)
+    rng = np.random.default_rng(0)
+
+    sk_pipe, sk_df = None, None
+    if "sklearn" in engines:
+        sk_pipe, sk_df = load_sklearn_inputs(args.sklearn_model, args.sklearn_data)
+
+    sessions = {}
+    cells: list[dict] = []
+
+    def add(cell: dict) -> None:
+        cells.append(cell)
+        print(
+            f"batch={cell['batch']:<5} {cell['engine']:<8} intra={cell['intra_threads']} "
+            f"inter={cell['inter_threads']} p50={cell['p50_ms']:.3f}ms "
+            f"p99={cell['p99_ms']:.3f}ms rows/s={cell['rows_per_s']:.0f}"
+        )
+
+    for batch in batches:
+        x = rng.standard_normal((batch, n_features)).astype(np.float32)
+        for engine in engines:
+            if engine == "torch":
+                # inter-op у torch задаётся один раз на процесс, варьируем только intra
+                xb = torch.from_numpy(x)
+                for intra in intra_grid:
+                    torch.set_num_threads(intra)
+
+                    def fn():
+                        with torch.no_grad():
+                            model(xb)
+
+                    lat = measure(fn, args.iters, args.warmup, args.cell_budget_s)
+                    add(summarize(engine, batch, intra, None, lat))
+            elif engine in ("fp32", "int8"):
+                path = args.fp32_path if engine == "fp32" else args.int8_path
+                for intra in intra_grid:
+                    for inter in inter_grid:
+                        key = (engine, intra, inter)
+                        if key not in sessions:
+                            sessions[key] = make_session(path, args.provider, intra, inter)
+                        sess = sessions[key]
+                        lat = measure(
+                            lambda: sess.run(None, {"x": x}),
+                            args.iters,
+                            args.warmup,
+                            args.cell_budget_s,
+                        )
+                        add(summarize(engine, batch, intra, inter, lat))
+            elif engine == "sklearn":
+                # GradientBoostingClassifier.predict_proba однопоточный — сетка потоков не нужна
+                frame = sk_df.sample(n=batch, replace=True, random_state=0)
+                lat = measure(
+                    lambda: sk_pipe.predict_proba(frame),
+                    args.iters,
+                    args.warmup,
+                    args.cell_budget_s,
+                )
+                add(summarize(engine, batch, None, None, lat))
+            else:
+                raise ValueError(f"Unknown engine: {engine}")
+    return cells
+
+
+def best_per_batch(cells: list[dict]) -> dict:
+    best: dict = {}
+    for c in cells:
+        cur = best.get(c["batch"])
+        if cur is None or c["rows_per_s"] > cur["rows_per_s"]:
+            best[c["batch"]] = c
+    return {str(b): best[b] for b in sorted(best)}
+
+
+def write_sweep(cells: list[dict], out: Path, meta: dict) -> None:
+    out.parent.mkdir(parents=True, exist_ok=True)
+    report = {**meta, "cells": cells, "best_per_batch": best_per_batch(cells)}
+    json_path = out.with_suffix(".json")
+    json_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    csv_path = out.with_suffix(".csv")
+    with csv_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(cells[0]))
+        w.writeheader()
+        w.writerows(cells)
+    print(f"Saved: {json_path}, {csv_path}")
+
+    print("Best config per batch (by rows/s):")
+    for b, c in report["best_per_batch"].items():
+        print(
+            f"  batch={b:<5} {c['engine']:<8} intra={c['intra_threads']} "
+            f"inter={c['inter_threads']} p99={c['p99_ms']:.3f}ms rows/s={c['rows_per_s']:.0f}"
+        )
+
+
 def main():
-    torch.set_num_threads(4)
     ap = argparse.ArgumentParser()
     ap.add_argument("--batch", type=int, default=1024)
     ap.add_argument("--iters", type=int, default=300)
     ap.add_argument("--warmup", type=int, default=30)
     ap.add_argument("--provider", default="CPUExecutionProvider")  # or CUDAExecutionProvider
+    ap.add_argument("--intra_threads", type=int, default=8)
+    ap.add_argument("--inter_threads", type=int, default=1)
+    ap.add_argument("--torch_threads", type=int, default=4)
+    # режим сетки: batch × threads × engine
+    ap.add_argument("--sweep", action="store_true")
+    ap.add_argument("--batches", default="1,8,64,256,1024,4096")
+    ap.add_argument("--intra_grid", default="1,2,4,8")
+    ap.add_argument("--inter_grid", default="1,2")
+    ap.add_argument("--engines", default="torch,fp32,int8,sklearn")
+    ap.add_argument("--cell_budget_s", type=float, default=2.0)
+    ap.add_argument("--fp32_path", default="models/model.onnx")
+    ap.add_argument("--int8_path", default="models/model.int8.onnx")
+    ap.add_argument("--sklearn_model", default="models/credit_default_model.pkl")
+    ap.add_argument("--sklearn_data", default="data/processed/test.parquet")
+    ap.add_argument("--out", default="artifacts/bench_sweep")
     args = ap.parse_args()
 
     meta = json.loads(Path("models/nn_meta.json").read_text(encoding="utf-8"))
     n_features = int(meta["n_features"])
 
-    batch = args.batch
-    x = np.random.randn(batch, n_features).astype(np.float32)
-
     ckpt = torch.load("models/nn_model.pt", map_location="cpu")
     model = CreditMLP(n_features=n_features)
     model.load_state_dict(ckpt["state_dict"])
     model.eval()
 
-    t_torch = bench_torch(model, x, iters=args.iters, warmup=args.warmup)
+    if args.sweep:
+        cells = run_sweep(args, model, n_features)
+        write_sweep(
+            cells,
+            Path(args.out),
+            {"provider": args.provider, "iters": args.iters, "warmup": args.warmup},
+        )
+        return
+
+    torch.set_num_threads(args.torch_threads)
 
-    fp32_path = "models/model.onnx"
-    int8_path = "models/model.int8.onnx"
+    batch = args.batch
+    x = np.random.randn(batch, n_features).astype(np.float32)
+
+    t_torch = bench_torch(model, x, iters=args.iters, warmup=args.warmup)
 
-    sess_fp32 = make_session(fp32_path, args.provider)
-    sess_int8 = make_session(int8_path, args.provider)
+    sess_fp32 = make_session(args.fp32_path, args.provider, args.intra_threads, args.inter_threads)
+    sess_int8 = make_session(args.int8_path, args.provider, args.intra_threads, args.inter_threads)
 
     t_fp32 = bench_onnx(sess_fp32, x, iters=args.iters, warmup=args.warmup)
     t_int8 = bench_onnx(sess_int8, x, iters=args.iters, warmup=args.warmup)
@@ -1,3 +1,4 @@
+import argparse
 import json
 from pathlib import Path
 
@@ -7,7 +8,6 @@ import onnxruntime as ort
 import torch
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score
-from sklearn.preprocessing import StandardScaler
 
 from nn_model import CreditMLP
 
@@ -26,18 +26,9 @@ def sigmoid(x: np.ndarray) -> np.ndarray:
     return 1.0 / (1.0 + np.exp(-x))
 
 
-def onnx_predict_logits(model_path: str, x: np.ndarray) -> np.ndarray:
-    sess = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
-    out = sess.run(None, {"x": x})[0]
-    return np.asarray(out).reshape(-1)
-
-
-def main():
-    meta = json.loads(Path("models/nn_meta.json").read_text(encoding="utf-8"))
-    feature_list = meta["feature_list"]
-    seed = 42
-
-    df = pd.read_csv("UCI_Credit_Card.csv")
+def load_split(data_path: str, feature_list: list[str], seed: int = 42):
+    """Тот же train/val-сплит, что и в train_nn.py: сырые X_train, X_val, y_train, y_val."""
+    df = pd.read_csv(data_path)
 
     for c in ["ID", "id", "Id"]:
         if c in df.columns:
@@ -47,13 +38,46 @@ def main():
     X = df[feature_list].astype(np.float32).values
     y = df[target].astype(np.float32).values
 
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=0.2, random_state=seed, stratify=y
-    )
+    return train_test_split(X, y, test_size=0.2, random_state=seed, stratify=y)
+
+
+def load_val_split(data_path: str, feature_list: list[str], seed: int = 42):
+    """Сырые X_val и y_val из load_split."""
+    _, X_val, _, y_val = load_split(data_path, feature_list, seed)
+    return X_val, y_val
+
+
+def scale_features(x_raw: np.ndarray, meta: dict) -> np.ndarray:
+    mean = np.asarray(meta["scaler_mean"], dtype=np.float64)
+    scale = np.asarray(meta["scaler_scale"], dtype=np.float64)
+    return ((x_raw - mean) / scale).astype(np.float32)
+
+
+def onnx_predict_logits(model_path: str, x: np.ndarray) -> np.ndarray:
+    sess = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    out = sess.run(None, {"x": x})[0]
+    return np.asarray(out).reshape(-1)
+
+
+def onnx_auc(model_path: str, x_raw: np.ndarray, y: np.ndarray, meta: dict) -> float:
+    """AUC ONNX-графа; сырые фичи скейлятся, если скейлер не вшит в граф."""
+    sess = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    folded = sess.get_modelmeta().custom_metadata_map.get("scaler_folded") == "1"
+    x = x_raw.astype(np.float32) if folded else scale_features(x_raw, meta)
+    logits = np.asarray(sess.run(None, {"x": x})[0]).reshape(-1)
+    return float(roc_auc_score(y, sigmoid(logits)))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default="UCI_Credit_Card.csv")
+    args = ap.parse_args()
+
+    meta = json.loads(Path("models/nn_meta.json").read_text(encoding="utf-8"))
+    feature_list = meta["feature_list"]
 
-    scaler = StandardScaler()
-    X_train = scaler.fit_transform(X_train).astype(np.float32)
-    X_val = scaler.transform(X_val).astype(np.float32)
+    X_val_raw, y_val = load_val_split(args.data, feature_list)
+    X_val = scale_features(X_val_raw, meta)
 
     # Torch (FP32 baseline)
     ckpt = torch.load("models/nn_model.pt", map_location="cpu")
@@ -66,12 +90,10 @@ def main():
     torch_auc = roc_auc_score(y_val, sigmoid(torch_logits))
 
     # ONNX FP32 clean
-    fp32_logits = onnx_predict_logits("models/model.fp32.clean.onnx", X_val)
-    fp32_auc = roc_auc_score(y_val, sigmoid(fp32_logits))
+    fp32_auc = onnx_auc("models/model.fp32.clean.onnx", X_val_raw, y_val, meta)
 
     # ONNX INT8 clean
-    int8_logits = onnx_predict_logits("models/model.int8.clean.onnx", X_val)
-    int8_auc = roc_auc_score(y_val, sigmoid(int8_logits))
+    int8_auc = onnx_auc("models/model.int8.clean.onnx", X_val_raw, y_val, meta)
 
     print(f"Torch AUC: {torch_auc:.5f}")
     print(f"ONNX  AUC: {fp32_auc:.5f}")
@@ -1,11 +1,17 @@
+import argparse
 import json
 from pathlib import Path
 
+import numpy as np
+import onnx
 import torch
 import torch.nn as nn
 
 from nn_model import CreditMLP
 
+# флаг в metadata_props: граф ждёт сырые фичи, скейлер уже внутри
+SCALER_FOLDED_KEY = "scaler_folded"
+
 
 class ExportWrapper(nn.Module):
     def __init__(self, model: CreditMLP):
@@ -16,7 +22,102 @@ class ExportWrapper(nn.Module):
         return self.model.net(x)
 
 
+def fold_scaler(linear: nn.Linear, mean: np.ndarray, scale: np.ndarray) -> nn.Linear:
+    """W((x - m) / s) + b  ->  (W / s) x + (b - W (m / s))."""
+    m = torch.as_tensor(mean, dtype=torch.float64)
+    s = torch.as_tensor(scale, dtype=torch.float64)
+    w = linear.weight.detach().double()
+    b = linear.bias.detach().double()
+    out = nn.Linear(linear.in_features, linear.out_features)
+    with torch.no_grad():
+        out.weight.copy_((w / s).float())
+        out.bias.copy_((b - w @ (m / s)).float())
+    return out
+
+
+def _bn_affine(bn: nn.BatchNorm1d):
+    # eval-режим: BN(y) = y * a + c
+    a = bn.weight.detach().double() / torch.sqrt(bn.running_var.double() + bn.eps)
+    c = bn.bias.detach().double() - bn.running_mean.double() * a
+    return a, c
+
+
+def fold_bn_before(bn: nn.BatchNorm1d, linear: nn.Linear) -> nn.Linear:
+    """W BN(y) + b  ->  (W * a) y + (W c + b)."""
+    a, c = _bn_affine(bn)
+    w = linear.weight.detach().double()
+    b = linear.bias.detach().double()
+    out = nn.Linear(linear.in_features, linear.out_features)
+    with torch.no_grad():
+        out.weight.copy_((w * a).float())
+        out.bias.copy_((w @ c + b).float())
+    return out
+
+
+def fold_bn_after(linear: nn.Linear, bn: nn.BatchNorm1d) -> nn.Linear:
+    """BN(W x + b)  ->  (a * W) x + (a b + c)."""
+    a, c = _bn_affine(bn)
+    w = linear.weight.detach().double()
+    b = linear.bias.detach().double()
+    out = nn.Linear(linear.in_features, linear.out_features)
+    with torch.no_grad():
+        out.weight.copy_((a[:, None] * w).float())
+        out.bias.copy_((a * b + c).float())
+    return out
+
+
+def fuse_sequential(
+    net: nn.Sequential,
+    mean: np.ndarray | None = None,
+    scale: np.ndarray | None = None,
+    fold_bn: bool = True,
+) -> nn.Sequential:
+    """Eval-копия сети: Dropout убран, BN и (опционально) скейлер вшиты в Linear."""
+    layers = [m for m in net if not isinstance(m, nn.Dropout)]
+
+    if fold_bn:
+        fused: list[nn.Module] = []
+        pending_bn: nn.BatchNorm1d | None = None
+        for m in layers:
+            if isinstance(m, nn.BatchNorm1d):
+                if fused and isinstance(fused[-1], nn.Linear):
+                    fused[-1] = fold_bn_after(fused[-1], m)
+                else:
+                    pending_bn = m
+            elif isinstance(m, nn.Linear) and pending_bn is not None:
+                fused.append(fold_bn_before(pending_bn, m))
+                pending_bn = None
+            else:
+                if pending_bn is not None:
+                    fused.append(pending_bn)
+                    pending_bn = None
+                fused.append(m)
+        if pending_bn is not None:
+            fused.append(pending_bn)
+        layers = fused
+
+    if mean is not None and scale is not None:
+        if not isinstance(layers[0], nn.Linear):
+            raise ValueError("Scaler can only be folded into a leading Linear layer")
+        layers[0] = fold_scaler(layers[0], mean, scale)
+
+    return nn.Sequential(*layers).eval()
+
+
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", default="models/model.onnx")
+    ap.add_argument(
+        "--fold_scaler",
+        action="store_true",
+        help="вшить StandardScaler из nn_meta.json в первый Linear (граф ждёт сырые фичи)",
+    )
+    ap.add_argument(
+        "--fold_bn", action="store_true", help="вшить eval-BatchNorm1d в соседний Linear"
+    )
+    ap.add_argument("--tol", type=float, default=1e-4)
+    args = ap.parse_args()
+
     meta_path = Path("models/nn_meta.json")
     ckpt_path = Path("models/nn_model.pt")
 
@@ -28,11 +129,22 @@ def main():
     base.load_state_dict(ckpt["state_dict"])
     base.eval()
 
-    model = ExportWrapper(base).eval()
+    mean = np.asarray(meta["scaler_mean"], dtype=np.float64)
+    scale = np.asarray(meta["scaler_scale"], dtype=np.float64)
+
+    if args.fold_scaler or args.fold_bn:
+        model = fuse_sequential(
+            base.net,
+            mean=mean if args.fold_scaler else None,
+            scale=scale if args.fold_scaler else None,
+            fold_bn=args.fold_bn,
+        )
+    else:
+        model = ExportWrapper(base).eval()
 
     dummy = torch.randn(1, n_features, dtype=torch.float32)
 
-    out_path = Path("models/model.onnx")
+    out_path = Path(args.out)
     torch.onnx.export(
         model,
         dummy,
@@ -43,8 +155,23 @@ def main():
         opset_version=17,
         do_constant_folding=True,
     )
+
+    if args.fold_scaler:
+        m = onnx.load(out_path.as_posix())
+        onnx.helper.set_model_props(m, {SCALER_FOLDED_KEY: "1"})
+        onnx.save(m, out_path.as_posix())
+
     print(f"Saved: {out_path}")
 
+    if args.fold_scaler or args.fold_bn:
+        # проверяем против текущего двухшагового пути: скейлер в NumPy + torch
+        from validate_onnx import compare_with_torch
+
+        diff = compare_with_torch(out_path.as_posix(), base, mean, scale)
+        print("max_abs_diff_logits:", diff)
+        assert diff < args.tol, f"Fused ONNX mismatch: diff={diff} tol={args.tol}"
+        print(f"OK: fused graph matches two-stage path (<{args.tol})")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,162 @@
+"""
+Данные для train_nn.py без загрузки в память: CSV один раз конвертируется в X.npy/y.npy
+(float32, memory-mapped), батчи режутся из перемешанных блоков индексов, подготовка следующих
+батчей идёт в фоновом потоке.
+"""
+
+import json
+import queue
+import threading
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+
+
+def convert_csv(
+    csv_path: Path,
+    out_dir: Path,
+    feature_list: Sequence[str],
+    target_col: str,
+    chunksize: int = 200_000,
+) -> Tuple[np.memmap, np.memmap]:
+    """
+    CSV → out_dir/X.npy, y.npy по чанкам. Повторный вызов для того же файла (размер, mtime,
+    фичи) ничего не пересчитывает.
+    """
+    csv_path, out_dir = Path(csv_path), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stat = csv_path.stat()
+    meta = {
+        "source": str(csv_path.resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "features": list(feature_list),
+        "target": target_col,
+    }
+    meta_path = out_dir / "meta.json"
+    if meta_path.exists() and json.loads(meta_path.read_text(encoding="utf-8")) == meta:
+        return open_arrays(out_dir)
+
+    # число строк нужно заранее: open_memmap создаёт файл фиксированного размера. Считаем тем же
+    # парсером по одной колонке — строки файла ≠ записи (кавычки с переводом строки, пустые строки)
+    n_rows = sum(len(c) for c in pd.read_csv(csv_path, usecols=[target_col], chunksize=chunksize))
+    X = np.lib.format.open_memmap(
+        out_dir / "X.npy", mode="w+", dtype=np.float32, shape=(n_rows, len(feature_list))
+    )
+    y = np.lib.format.open_memmap(out_dir / "y.npy", mode="w+", dtype=np.float32, shape=(n_rows,))
+    pos = 0
+    for chunk in pd.read_csv(csv_path, usecols=[*feature_list, target_col], chunksize=chunksize):
+        n = len(chunk)
+        X[pos : pos + n] = chunk[list(feature_list)].to_numpy(dtype=np.float32)
+        y[pos : pos + n] = chunk[target_col].to_numpy(dtype=np.float32)
+        pos += n
+    if pos != n_rows:
+        raise RuntimeError(f"{csv_path}: {pos} rows parsed, expected {n_rows} (file changed?)")
+    X.flush()
+    y.flush()
+    del X, y
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return open_arrays(out_dir)
+
+
+def open_arrays(out_dir: Path) -> Tuple[np.memmap, np.memmap]:
+    out_dir = Path(out_dir)
+    return np.load(out_dir / "X.npy", mmap_mode="r"), np.load(out_dir / "y.npy", mmap_mode="r")
+
+
+def fit_scaler(
+    X: np.ndarray, indices: np.ndarray, block_rows: int = 65_536
+) -> Tuple[np.ndarray, np.ndarray]:
+    """mean/scale как у StandardScaler по строкам indices, блоками (Chan et al. для дисперсии)."""
+    indices = np.sort(indices)
+    n, mean, m2 = 0, np.zeros(X.shape[1]), np.zeros(X.shape[1])
+    for start in range(0, len(indices), block_rows):
+        block = X[indices[start : start + block_rows]].astype(np.float64)
+        b_n, b_mean = len(block), block.mean(axis=0)
+        b_m2 = ((block - b_mean) ** 2).sum(axis=0)
+        delta = b_mean - mean
+        total = n + b_n
+        mean = mean + delta * b_n / total
+        m2 = m2 + b_m2 + delta**2 * n * b_n / total
+        n = total
+    scale = np.sqrt(m2 / max(n, 1))
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def iter_batches(
+    X: np.ndarray,
+    y: np.ndarray,
+    indices: np.ndarray,
+    batch_size: int,
+    mean: np.ndarray,
+    scale: np.ndarray,
+    shuffle: bool = False,
+    seed: Optional[int] = None,
+    block_rows: int = 65_536,
+) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+    """
+    Блоки — соседние по файлу строки (sorted indices), порядок блоков и строк внутри блока
+    перемешивается. Блок читается из memmap одним обращением и нормализуется целиком; батч —
+    срез блока, без сборки по одному примеру.
+    """
+    rng = np.random.default_rng(seed)
+    indices = np.sort(indices)
+    starts = np.arange(0, len(indices), block_rows)
+    if shuffle:
+        rng.shuffle(starts)
+    mean32, scale32 = mean.astype(np.float32), scale.astype(np.float32)
+    for start in starts:
+        idx = indices[start : start + block_rows]
+        xb = (np.asarray(X[idx], dtype=np.float32) - mean32) / scale32
+        yb = np.asarray(y[idx], dtype=np.float32)
+        if shuffle:
+            perm = rng.permutation(len(idx))
+            xb, yb = xb[perm], yb[perm]
+        for b in range(0, len(idx), batch_size):
+            yield torch.from_numpy(xb[b : b + batch_size]), torch.from_numpy(yb[b : b + batch_size])
+
+
+class Prefetcher:
+    """Итератор, который заранее готовит до depth элементов в фоновом потоке."""
+
+    _END = object()
+
+    def __init__(self, iterable, depth: int = 4):
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(iterable,), daemon=True)
+        self._thread.start()
+
+    def _run(self, iterable) -> None:
+        try:
+            for item in iterable:
+                if self._stop.is_set():
+                    return
+                self._queue.put(item)
+        except BaseException as e:  # noqa: BLE001 — пробрасываем в основной поток
+            self._queue.put(e)
+        self._queue.put(self._END)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self._queue.get()
+        if item is self._END:
+            raise StopIteration
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def close(self) -> None:
+        self._stop.set()
+        # освобождаем место, если поток ждёт на put
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -1,7 +1,43 @@
+import argparse
+import json
 from pathlib import Path
 
+import numpy as np
 import onnx
-from onnxruntime.quantization import QuantType, quantize_dynamic
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+
+from compare_auc import load_split, onnx_auc, scale_features
+
+CALIBRATORS = {
+    "minmax": CalibrationMethod.MinMax,
+    "entropy": CalibrationMethod.Entropy,
+    "percentile": CalibrationMethod.Percentile,
+}
+
+
+class ArrayCalibrationReader(CalibrationDataReader):
+    """Отдаёт калибровочную выборку батчами во вход графа 'x'."""
+
+    def __init__(self, x: np.ndarray, batch: int = 256):
+        # гистограммные калибраторы (entropy/percentile) требуют батчи одного размера
+        batch = min(batch, len(x))
+        n = len(x) - len(x) % batch
+        self._batches = [x[i : i + batch] for i in range(0, n, batch)]
+        self._it = iter(self._batches)
+
+    def get_next(self):
+        b = next(self._it, None)
+        return None if b is None else {"x": b}
+
+    def rewind(self):
+        self._it = iter(self._batches)
 
 
 def prepare_model(inp: Path, out: Path) -> None:
@@ -14,27 +50,119 @@ def prepare_model(inp: Path, out: Path) -> None:
     onnx.save(model, str(out))
 
 
+def is_scaler_folded(path: Path) -> bool:
+    props = {p.key: p.value for p in onnx.load(str(path), load_external_data=False).metadata_props}
+    return props.get("scaler_folded") == "1"
+
+
+def calibration_sample(
+    x_train: np.ndarray, meta: dict, rows: int, seed: int, folded: bool
+) -> np.ndarray:
+    """Подвыборка train-части того же сплита, на котором считается AUC-гейт."""
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(x_train), size=min(rows, len(x_train)), replace=False)
+    x_raw = x_train[idx]
+    return x_raw.astype(np.float32) if folded else scale_features(x_raw, meta)
+
+
+def input_nodes(path: Path, input_name: str = "x") -> list[str]:
+    model = onnx.load(str(path), load_external_data=False)
+    return [n.name for n in model.graph.node if input_name in n.input]
+
+
+def run_static(
+    args, prepared: Path, candidate: Path, meta: dict, folded: bool, x_train: np.ndarray
+) -> None:
+    x_cal = calibration_sample(x_train, meta, args.calib_rows, args.seed, folded)
+    print(f"Calibration: {args.calibration} on {len(x_cal)} train rows from {args.data}")
+    # сырые фичи (вшитый скейлер) в int8 не влезают: первый слой оставляем во float
+    exclude = input_nodes(prepared) if folded else None
+    quantize_static(
+        model_input=str(prepared),
+        model_output=str(candidate),
+        calibration_data_reader=ArrayCalibrationReader(x_cal),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=args.per_channel,
+        calibrate_method=CALIBRATORS[args.calibration],
+        nodes_to_exclude=exclude,
+    )
+
+
 def main() -> None:
-    inp = Path("models/model.onnx")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--inp", default="models/model.onnx")
+    ap.add_argument("--out", default="models/model.int8.onnx")
+    ap.add_argument("--mode", choices=["dynamic", "static"], default="dynamic")
+    ap.add_argument("--calibration", choices=sorted(CALIBRATORS), default="minmax")
+    ap.add_argument("--calib_rows", type=int, default=2000)
+    ap.add_argument("--per_channel", action="store_true")
+    ap.add_argument(
+        "--data",
+        default="UCI_Credit_Card.csv",
+        help="static: калибровка на train-, AUC-гейт на val-части сплита из train_nn.py",
+    )
+    ap.add_argument(
+        "--max_auc_drop",
+        type=float,
+        default=0.005,
+        help="static: не сохранять INT8, если AUC падает сильнее (FP32 - INT8)",
+    )
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    inp = Path(args.inp)
     prepared = Path("models/model.prepared.onnx")
-    out = Path("models/model.int8.onnx")
+    out = Path(args.out)
 
     if not inp.exists():
-        raise FileNotFoundError("models/model.onnx not found (run export_onnx.py)")
+        raise FileNotFoundError(f"{inp} not found (run export_onnx.py)")
 
     prepare_model(inp, prepared)
     print(f"Prepared: {prepared}")
 
-    quantize_dynamic(
-        model_input=str(prepared),
-        model_output=str(out),
-        weight_type=QuantType.QInt8,
-        extra_options={
-            "MatMulConstBOnly": True,
-            "DefaultTensorType": onnx.TensorProto.FLOAT,
-        },
-    )
+    if args.mode == "dynamic":
+        quantize_dynamic(
+            model_input=str(prepared),
+            model_output=str(out),
+            weight_type=QuantType.QInt8,
+            extra_options={
+                "MatMulConstBOnly": True,
+                "DefaultTensorType": onnx.TensorProto.FLOAT,
+            },
+        )
+        print(f"Saved: {out}")
+        return
+
+    meta = json.loads(Path("models/nn_meta.json").read_text(encoding="utf-8"))
+    folded = is_scaler_folded(inp)
+    candidate = out.with_name(out.stem + ".candidate.onnx")
+    # калибровка и гейт — один загрузчик и одни фичи
+    x_train, x_val, _, y_val = load_split(args.data, meta["feature_list"], seed=args.seed)
+    run_static(args, prepared, candidate, meta, folded, x_train)
+
+    if folded:
+        # metadata_props не переживают квантизацию
+        m = onnx.load(str(candidate))
+        onnx.helper.set_model_props(m, {"scaler_folded": "1"})
+        onnx.save(m, str(candidate))
+
+    # AUC-гейт как в compare_auc.py
+    fp32_auc = onnx_auc(str(inp), x_val, y_val, meta)
+    int8_auc = onnx_auc(str(candidate), x_val, y_val, meta)
+    drop = fp32_auc - int8_auc
+    print(f"ONNX  AUC: {fp32_auc:.5f}")
+    print(f"INT8  AUC: {int8_auc:.5f}")
+    print(f"Drop INT8 vs ONNX: {drop:.5f} (budget {args.max_auc_drop:.5f})")
+
+    if drop > args.max_auc_drop:
+        candidate.unlink(missing_ok=True)
+        raise SystemExit(
+            f"INT8 rejected: AUC drop {drop:.5f} > {args.max_auc_drop:.5f}; {out} not written"
+        )
 
+    candidate.replace(out)
     print(f"Saved: {out}")
 
 
@@ -1,5 +1,6 @@
 import argparse
 import json
+import time
 from pathlib import Path
 
 import numpy as np
@@ -11,6 +12,7 @@ from sklearn.preprocessing import StandardScaler
 from torch.utils.data import DataLoader, TensorDataset
 from tqdm import tqdm
 
+from mmap_data import Prefetcher, convert_csv, fit_scaler, iter_batches
 from nn_model import CreditMLP
 
 
@@ -41,6 +43,10 @@ def main():
     ap.add_argument("--batch", type=int, default=512)
     ap.add_argument("--lr", type=float, default=1e-3)
     ap.add_argument("--seed", type=int, default=42)
+    # mmap: CSV один раз в .npy, батчи блоками, префетч в фоне; tensor — всё в памяти
+    ap.add_argument("--loader", choices=["mmap", "tensor"], default="mmap")
+    ap.add_argument("--cache_dir", default="data/nn_cache")
+    ap.add_argument("--prefetch", type=int, default=4)
     args = ap.parse_args()
 
     np.random.seed(args.seed)
@@ -50,7 +56,8 @@ def main():
     if not data_path.exists():
         raise FileNotFoundError(f"Не найден файл данных: {data_path.resolve()}")
 
-    df = pd.read_csv(data_path)
+    # в mmap-режиме читаем только заголовок
+    df = pd.read_csv(data_path, nrows=0 if args.loader == "mmap" else None)
 
     #  если лишняя колонка
     for c in ["ID", "id", "Id"]:
@@ -66,25 +73,54 @@ def main():
     # на всякий чистка
     feature_list = [c for c in feature_list if c in df.columns and c != target_col]
 
-    X = df[feature_list].astype(np.float32).values
-    y = df[target_col].astype(np.float32).values
-
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=0.2, random_state=args.seed, stratify=y if len(np.unique(y)) == 2 else None
+    if args.loader == "mmap":
+        X, y = convert_csv(data_path, Path(args.cache_dir), feature_list, target_col)
+        y_all = np.asarray(y)
+    else:
+        X = df[feature_list].astype(np.float32).values
+        y = y_all = df[target_col].astype(np.float32).values
+
+    # split по индексам — тот же, что по массивам
+    train_idx, val_idx = train_test_split(
+        np.arange(len(y_all)),
+        test_size=0.2,
+        random_state=args.seed,
+        stratify=y_all if len(np.unique(y_all)) == 2 else None,
     )
 
-    scaler = StandardScaler()
-    X_train = scaler.fit_transform(X_train).astype(np.float32)
-    X_val = scaler.transform(X_val).astype(np.float32)
+    if args.loader == "mmap":
+        mean, scale = fit_scaler(X, train_idx)
+        scaler = StandardScaler()
+        scaler.mean_, scaler.scale_ = mean, scale
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        def train_batches(epoch: int):
+            return Prefetcher(
+                iter_batches(X, y, train_idx, args.batch, mean, scale, True, args.seed + epoch),
+                args.prefetch,
+            )
+
+        def val_batches():
+            return Prefetcher(iter_batches(X, y, val_idx, args.batch, mean, scale), args.prefetch)
+
+    else:
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X[train_idx]).astype(np.float32)
+        X_val = scaler.transform(X[val_idx]).astype(np.float32)
+        train_ds = TensorDataset(torch.from_numpy(X_train), torch.from_numpy(y[train_idx]))
+        val_ds = TensorDataset(torch.from_numpy(X_val), torch.from_numpy(y[val_idx]))
+        train_dl = DataLoader(train_ds, batch_size=args.batch, shuffle=True, drop_last=False)
+        val_dl = DataLoader(val_ds, batch_size=args.batch, shuffle=False, drop_last=False)
 
-    train_ds = TensorDataset(torch.from_numpy(X_train), torch.from_numpy(y_train))
-    val_ds = TensorDataset(torch.from_numpy(X_val), torch.from_numpy(y_val))
-    train_dl = DataLoader(train_ds, batch_size=args.batch, shuffle=True, drop_last=False)
-    val_dl = DataLoader(val_ds, batch_size=args.batch, shuffle=False, drop_last=False)
+        def train_batches(epoch: int):
+            return train_dl
+
+        def val_batches():
+            return val_dl
+
+    n_features = len(feature_list)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-    model = CreditMLP(n_features=X_train.shape[1]).to(device)
+    model = CreditMLP(n_features=n_features).to(device)
     opt = torch.optim.Adam(model.parameters(), lr=args.lr)
     loss_fn = torch.nn.BCEWithLogitsLoss()
 
@@ -93,7 +129,8 @@ def main():
 
     for epoch in range(1, args.epochs + 1):
         model.train()
-        pbar = tqdm(train_dl, desc=f"epoch {epoch}/{args.epochs}")
+        t0 = time.perf_counter()
+        pbar = tqdm(train_batches(epoch), desc=f"epoch {epoch}/{args.epochs}")
         for xb, yb in pbar:
             xb = xb.to(device)
             yb = yb.to(device)
@@ -110,7 +147,7 @@ def main():
         preds = []
         ys = []
         with torch.no_grad():
-            for xb, yb in val_dl:
+            for xb, yb in val_batches():
                 xb = xb.to(device)
                 logits = model(xb)
                 prob = torch.sigmoid(logits).detach().cpu().numpy()
@@ -120,7 +157,7 @@ def main():
         ys = np.concatenate(ys)
 
         auc = roc_auc_score(ys, preds) if len(np.unique(ys)) == 2 else float("nan")
-        print(f"[val] roc_auc={auc:.5f}")
+        print(f"[val] roc_auc={auc:.5f} epoch_time={time.perf_counter() - t0:.2f}s")
 
         if auc > best_auc:
             best_auc = auc
@@ -131,13 +168,13 @@ def main():
     torch.save(
         {
             "state_dict": best_state,
-            "n_features": int(X_train.shape[1]),
+            "n_features": int(n_features),
         },
         "models/nn_model.pt",
     )
 
     meta = {
-        "n_features": int(X_train.shape[1]),
+        "n_features": int(n_features),
         "feature_list": feature_list,
         "scaler_mean": scaler.mean_.tolist(),
         "scaler_scale": scaler.scale_.tolist(),
@@ -13,6 +13,26 @@ def sigmoid(x: np.ndarray) -> np.ndarray:
     return 1.0 / (1.0 + np.exp(-x))
 
 
+def is_scaler_folded(sess: ort.InferenceSession) -> bool:
+    return sess.get_modelmeta().custom_metadata_map.get("scaler_folded") == "1"
+
+
+def compare_with_torch(
+    onnx_path: str, model: CreditMLP, mean: np.ndarray, scale: np.ndarray, n: int = 256
+) -> float:
+    """max |logits| разница между ONNX и torch на скейленных входах (скейлер в NumPy)."""
+    sess = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    rng = np.random.default_rng(0)
+    x_raw = (mean + scale * rng.standard_normal((n, len(mean)))).astype(np.float32)
+    x = ((x_raw - mean) / scale).astype(np.float32)
+
+    with torch.no_grad():
+        torch_logits = model(torch.from_numpy(x)).numpy()
+    feed = x_raw if is_scaler_folded(sess) else x
+    onnx_logits = np.asarray(sess.run(None, {"x": feed})[0]).reshape(-1)
+    return float(np.max(np.abs(torch_logits - onnx_logits)))
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--onnx", default="models/model.onnx")
@@ -28,6 +48,16 @@ def main():
     model.eval()
 
     sess = ort.InferenceSession(args.onnx, providers=["CPUExecutionProvider"])
+    if is_scaler_folded(sess):
+        # вшитый скейлер: сравниваем с путём «скейлер в NumPy + torch»
+        mean = np.asarray(meta["scaler_mean"], dtype=np.float64)
+        scale = np.asarray(meta["scaler_scale"], dtype=np.float64)
+        diff = compare_with_torch(args.onnx, model, mean, scale)
+        print("max_abs_diff_logits:", diff)
+        assert diff < args.tol, f"ONNX mismatch: diff={diff} tol={args.tol}"
+        print(f"OK: ONNX validated (<{args.tol})")
+        return
+
     x = np.random.randn(256, n_features).astype(np.float32)
 
     with torch.no_grad():
@@ -1,5 +1,38 @@
-# tests/conftest.py
 import pathlib
 import sys
 
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import pytest
+
+from src.data.storage import find_table, read_table
+
+TARGET = "default.payment.next.month"
+# бакет фикстуры s3 (moto)
+BUCKET = "credit-scoring-test"
+
+
+@pytest.fixture(scope="session")
+def fitted_pipeline():
+    # маленькая копия боевого пайплайна, чтобы тесты шли быстро
+    from src.models.estimators import build_pipeline
+
+    df = read_table(find_table("data/processed", "train")).head(3000)
+    pipe = build_pipeline().set_params(clf__n_estimators=30)
+    pipe.fit(df.drop(columns=[TARGET]), df[TARGET])
+    return pipe
+
+
+@pytest.fixture()
+def s3(monkeypatch):
+    """Клиент S3 на moto с пустым BUCKET; client.get_calls — параметры каждого GetObject."""
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        calls = []
+        client.meta.events.register("before-call.s3.GetObject", lambda **kw: calls.append(kw))
+        client.get_calls = calls
+        yield client
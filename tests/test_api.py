@@ -0,0 +1,163 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as api
+from app.backends import SklearnBackend
+
+
+@pytest.fixture
+def client(fitted_pipeline, monkeypatch):
+    monkeypatch.setattr(api, "model", SklearnBackend(fitted_pipeline, api.ALL_FEATS))
+    return TestClient(api.app)
+
+
+@pytest.fixture
+def row():
+    return json.loads(open("app/example.json", encoding="utf-8").read())["rows"][0]
+
+
+def test_predict_batch_matches_single_predict(client, row):
+    single = client.post("/predict", json=row).json()
+    r = client.post("/predict/batch", json={"rows": [row, row]})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["proba_default"] == pytest.approx([single["proba_default"]] * 2)
+    assert body["predicted_class"] == [single["predicted_class"]] * 2
+    assert body["errors"] == []
+
+
+def test_predict_batch_keeps_valid_rows_on_row_errors(client, row):
+    cols = {k: [v, v] for k, v in row.items()}
+    cols["SEX"] = [1, 7]
+    body = client.post("/predict/batch", json={"columns": cols}).json()
+    assert body["proba_default"][0] is not None
+    assert body["proba_default"][1] is None
+    assert [e["index"] for e in body["errors"]] == [1]
+
+
+def test_predict_batch_row_limit(client, row, monkeypatch):
+    monkeypatch.setattr(api, "PREDICT_BATCH_MAX_ROWS", 1)
+    r = client.post("/predict/batch", json={"rows": [row, row]})
+    assert r.status_code == 413
+
+
+def test_admin_reload_swaps_model(client, fitted_pipeline, row, tmp_path, monkeypatch):
+    import joblib
+
+    path = tmp_path / "model.pkl"
+    joblib.dump(fitted_pipeline, path)
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(api, "MODEL_PATH", path)
+    monkeypatch.setattr(api, "model_path", api.model_path)
+    monkeypatch.setattr(api, "model_version", None)
+
+    r = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert r.status_code == 200
+    assert client.get("/health").json()["version"] == r.json()["version"]
+    assert client.post("/predict", json=row).status_code == 200
+
+    path.unlink()
+    bad = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert bad.status_code == 500
+    assert api.model_path == path
+
+
+def test_admin_reload_rejects_missing_token_and_foreign_paths(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "MODEL_PATH", tmp_path / "model.pkl")
+    monkeypatch.setattr(api, "MODEL_RELOAD_S3_PREFIX", "s3://bucket/retraining/models/")
+
+    # токен не настроен — эндпоинт закрыт для всех
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "")
+    assert client.post("/admin/reload").status_code == 403
+    assert client.post("/admin/reload", headers={"X-Admin-Token": ""}).status_code == 403
+
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/reload").status_code == 403
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    ok = {"X-Admin-Token": "secret"}
+    for path in [
+        str(tmp_path / "other.pkl"),
+        "s3://bucket/elsewhere/model.pkl",
+        "s3://bucket/retraining/models/../x.pkl",
+        "s3://bucket/retraining/models_evil/x.pkl",
+    ]:
+        r = client.post("/admin/reload", json={"path": path}, headers=ok)
+        assert r.status_code == 403, path
+    assert api.reload_source_allowed("s3://bucket/retraining/models/run1/credit_default_model.pkl")
+
+
+def test_admin_reload_reaches_other_workers(client, fitted_pipeline, tmp_path, monkeypatch):
+    import asyncio
+
+    import joblib
+
+    path = tmp_path / "model.pkl"
+    joblib.dump(fitted_pipeline, path)
+    state = tmp_path / "model_reload.json"
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(api, "MODEL_PATH", path)
+    monkeypatch.setattr(api, "model_path", api.model_path)
+    monkeypatch.setattr(api, "model_version", None)
+    monkeypatch.setattr(api, "WEB_CONCURRENCY", 2)
+
+    # несколько воркеров без общего файла — отказ, а не подмена в одном воркере
+    monkeypatch.setattr(api, "MODEL_RELOAD_STATE", None)
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "secret"}).status_code == 409
+
+    monkeypatch.setattr(api, "MODEL_RELOAD_STATE", state)
+    version = client.post("/admin/reload", headers={"X-Admin-Token": "secret"}).json()["version"]
+
+    # «другой воркер» со старой моделью догружает версию из файла состояния
+    monkeypatch.setattr(api, "model_version", "old")
+    assert asyncio.run(api.apply_reload_state(state))
+    assert api.model_version == version
+    assert not asyncio.run(api.apply_reload_state(state))
+
+
+def test_sync_reloads_retries_failed_apply(tmp_path, monkeypatch):
+    import asyncio
+
+    state = tmp_path / "model_reload.json"
+    state.write_text("{}", encoding="utf-8")
+    calls = []
+
+    async def flaky_apply(path):
+        calls.append(path)
+        if len(calls) == 1:
+            raise RuntimeError("S3 недоступен")
+        return True
+
+    monkeypatch.setattr(api, "apply_reload_state", flaky_apply)
+
+    async def run():
+        task = asyncio.create_task(api.sync_reloads(state, 0.01))
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(run())
+    # первая попытка упала — повтор на следующем тике, после успеха файл больше не читается
+    assert len(calls) == 2
+
+
+def test_fetch_model_concurrent_downloads(s3, tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import app.reload as reload
+
+    from conftest import BUCKET
+
+    key = "retraining/models/run1/credit_default_model.pkl"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=b"x" * 100_000)
+    monkeypatch.setenv("S3_ENDPOINT_URL", "https://s3.amazonaws.com")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setattr(reload, "MODEL_DOWNLOAD_DIR", tmp_path)
+
+    # несколько воркеров качают одну модель одновременно: свои .part не мешают друг другу
+    with ThreadPoolExecutor(4) as pool:
+        paths = list(pool.map(reload.fetch_model, [f"s3://{BUCKET}/{key}"] * 4))
+    assert len(set(paths)) == 1
+    assert paths[0].read_bytes() == b"x" * 100_000
+    assert not list(tmp_path.glob("*.part"))
@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.backends import OnnxBackend
+
+
+def test_onnx_backend_applies_scaler_and_sigmoid(tmp_path):
+    pytest.importorskip("onnxruntime")
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    w = np.array([[0.5], [-2.0]], dtype=np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("MatMul", ["x", "w"], ["logits"])],
+        "tiny",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, ["batch", 2])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", 1])],
+        [numpy_helper.from_array(w, "w")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, tmp_path / "m.onnx")
+    meta = {
+        "feature_list": ["LIMIT_BAL", "AGE"],
+        "scaler_mean": [1000.0, 30.0],
+        "scaler_scale": [500.0, 10.0],
+    }
+    (tmp_path / "nn_meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    backend = OnnxBackend(tmp_path / "m.onnx", tmp_path / "nn_meta.json")
+    rows = [{"LIMIT_BAL": 2000.0, "AGE": 20}, {"LIMIT_BAL": 1000.0, "AGE": 30}]
+    z = ((np.array([[2000.0, 20.0], [1000.0, 30.0]]) - [1000.0, 30.0]) / [500.0, 10.0]) @ w
+    expected = 1.0 / (1.0 + np.exp(-z.ravel()))
+    assert backend.predict_proba(rows) == pytest.approx(expected, rel=1e-6)
+    assert backend.info == "onnx:m.onnx"
+
+
+def test_hgb_pipeline_serves_unknown_categories():
+    from app.backends import SklearnBackend
+    from app.main import ALL_FEATS
+    from src.data.storage import find_table, read_table
+    from src.models.estimators import TARGET, build_pipeline, thread_limit
+
+    df = read_table(find_table("data/processed", "train")).head(3000)
+    pipe = build_pipeline("hgb")
+    with thread_limit(1):
+        pipe.fit(df[ALL_FEATS], df[TARGET])
+    # нативные категории вместо one-hot: ширина входа = число фич
+    assert pipe.named_steps["pre"].transform(df[ALL_FEATS].head(1)).shape[1] == len(ALL_FEATS)
+
+    rows = df[ALL_FEATS].head(3).to_dict(orient="records")
+    rows[0]["PAY_0"] = 42  # категории не было в train → ветка пропусков
+    proba = SklearnBackend(pipe, ALL_FEATS).predict_proba(rows)
+    assert np.all((proba > 0) & (proba < 1))
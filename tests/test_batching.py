@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.batching import MicroBatcher
+
+
+def test_concurrent_requests_are_coalesced():
+    calls = []
+
+    def score(rows, backend=None):
+        calls.append(len(rows))
+        return [r["x"] / 10 for r in rows]
+
+    async def run():
+        b = MicroBatcher(score, max_batch_size=8, max_wait_ms=50)
+        await b.start()
+        try:
+            return await asyncio.gather(*(b.submit({"x": i}) for i in range(5)))
+        finally:
+            await b.stop()
+
+    out = asyncio.run(run())
+    assert out == [i / 10 for i in range(5)]
+    assert calls == [5]
+
+
+def test_batch_is_capped_and_errors_fan_out():
+    calls = []
+
+    def score(rows, backend=None):
+        calls.append(len(rows))
+        if any(r["x"] < 0 for r in rows):
+            raise ValueError("bad row")
+        return [0.0] * len(rows)
+
+    async def run():
+        b = MicroBatcher(score, max_batch_size=2, max_wait_ms=50)
+        await b.start()
+        try:
+            await asyncio.gather(*(b.submit({"x": i}) for i in range(4)))
+            with pytest.raises(ValueError):
+                await b.submit({"x": -1})
+        finally:
+            await b.stop()
+
+    asyncio.run(run())
+    assert calls == [2, 2, 1]
+
+
+def test_rows_are_scored_by_the_backend_captured_at_submit():
+    calls = []
+
+    def score(rows, backend):
+        calls.append((backend, len(rows)))
+        return [backend] * len(rows)
+
+    async def run():
+        b = MicroBatcher(score, max_batch_size=8, max_wait_ms=50)
+        await b.start()
+        try:
+            # reload посреди батча: старые запросы досчитывает старая модель
+            return await asyncio.gather(
+                *(b.submit({"x": i}, 1.0 if i < 2 else 2.0) for i in range(5))
+            )
+        finally:
+            await b.stop()
+
+    out = asyncio.run(run())
+    assert out == [1.0, 1.0, 2.0, 2.0, 2.0]
+    assert calls == [(1.0, 2), (2.0, 3)]
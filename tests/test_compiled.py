@@ -0,0 +1,24 @@
+import numpy as np
+
+from app.compiled import CompiledGBDT
+from app.main import ALL_FEATS
+from src.data.storage import find_table, read_table
+
+
+def test_compiled_matches_sklearn_bit_for_bit(fitted_pipeline):
+    X = read_table(find_table("data/processed", "test"))[ALL_FEATS]
+    # пропуски и неизвестные категории тоже должны совпадать
+    X.loc[:20, "utilization1"] = np.nan
+    X.loc[30:40, "EDUCATION"] = np.nan
+    X.loc[50:60, "PAY_0"] = 42
+
+    compiled = CompiledGBDT.from_pipeline(fitted_pipeline, columns=ALL_FEATS)
+    expected = fitted_pipeline.predict_proba(X)
+    got = compiled.predict_proba(X.to_numpy(dtype=np.float64))
+    assert np.array_equal(expected, got)
+
+
+def test_compiled_single_row(fitted_pipeline):
+    X = read_table(find_table("data/processed", "test"))[ALL_FEATS].head(1)
+    compiled = CompiledGBDT.from_pipeline(fitted_pipeline, columns=ALL_FEATS)
+    assert np.array_equal(fitted_pipeline.predict_proba(X), compiled.predict_proba(X.to_numpy()))
@@ -1,11 +1,11 @@
-import pandas as pd
 import pytest
 
+from src.data.storage import find_table, read_table
 from src.data.validation import SCHEMA
 
 
 def test_schema_fails_on_out_of_range():
-    df = pd.read_csv("data/processed/train.csv")
+    df = read_table(find_table("data/processed", "train"))
     bad = df.copy()
     bad.loc[0, "SEX"] = 3
     with pytest.raises(Exception):
@@ -13,7 +13,7 @@ def test_schema_fails_on_out_of_range():
 
 
 def test_schema_fails_on_nan_in_int():
-    df = pd.read_csv("data/processed/train.csv")
+    df = read_table(find_table("data/processed", "train"))
     bad = df.copy()
     bad.loc[0, "AGE"] = None
     with pytest.raises(Exception):
@@ -0,0 +1,68 @@
+import numpy as np
+
+from app.drift import OnlineDrift
+from src.data.storage import find_table, read_table
+from src.monitor.psi import (
+    build_reference_profile,
+    compute_categorical_psi_from_profile,
+    compute_psi_report_from_profile,
+    load_feature_list,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_window_psi_matches_offline_report():
+    num_feats, cat_feats = load_feature_list("feature_list.json")
+    train = read_table(find_table("data/processed", "train"))
+    test = read_table(find_table("data/processed", "test")).head(3000)
+    profile = build_reference_profile(train, num_feats, cat_feats)
+
+    clock = Clock()
+    drift = OnlineDrift(profile, num_feats + cat_feats, windows_s=[300], slot_s=60, clock=clock)
+    for i, row in enumerate(test.to_dict(orient="records")):
+        clock.now = i * 0.05  # 150 с трафика — окно в 300 с покрывает всё
+        drift.observe(row)
+
+    rows, online = drift.psi()["300s"]
+    _, numeric = compute_psi_report_from_profile(profile, test, num_feats)
+    categorical = compute_categorical_psi_from_profile(profile, test, cat_feats)
+    assert rows == len(test)
+    for name, value in {**numeric, **categorical}.items():
+        np.testing.assert_allclose(online[name], value, rtol=1e-9, atol=1e-12)
+
+
+def test_old_slots_leave_the_window():
+    profile = {"numeric": {"x": {"edges": [0.0, 1.0, 2.0], "counts": [5, 5]}}, "categorical": {}}
+    clock = Clock()
+    drift = OnlineDrift(profile, ["x"], windows_s=[60, 180], slot_s=60, clock=clock)
+    for v in [0.5, 1.5, 2.0, 7.0]:
+        drift.observe({"x": v})
+
+    clock.now = 130  # два слота спустя: в 60-секундном окне пусто, в 180-секундном — всё
+    drift.observe({"x": 0.5})
+    psi = drift.psi()
+    assert psi["60s"][0] == 1
+    assert psi["180s"][0] == 5
+    # 7.0 вне границ профиля — в последнем бине
+    np.testing.assert_array_equal(drift.window_counts(3)[0], [2, 3])
+
+    clock.now = 1000
+    drift.observe({"x": 1.5})
+    assert drift.psi()["180s"][0] == 1
+
+
+def test_range_shift_is_visible_online():
+    profile = {"numeric": {"x": {"edges": [0.0, 1.0, 2.0], "counts": [5, 5]}}, "categorical": {}}
+    drift = OnlineDrift(profile, ["x"], windows_s=[60], slot_s=60, clock=Clock())
+    for v in [-3.0, 9.0, 9.5, 12.0]:
+        drift.observe({"x": v})
+    np.testing.assert_array_equal(drift.window_counts(1)[0], [1, 3])
+    rows, per_feature = drift.psi()["60s"]
+    assert rows == 4 and per_feature["x"] > 0.2
@@ -0,0 +1,160 @@
+import csv
+import importlib
+import json
+import pathlib
+import sys
+import types
+
+import pytest
+
+from conftest import BUCKET
+
+DAGS = pathlib.Path(__file__).resolve().parents[1] / "airflow" / "dags"
+CURRENT = "retraining/current.csv"
+
+
+class _Noop:
+    """Заглушка DAG/операторов: модуль DAG импортируется без airflow."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __rshift__(self, other):
+        return other
+
+
+class _TI:
+    def __init__(self, xcom: dict):
+        self.xcom = xcom
+
+    def xcom_pull(self, task_ids):
+        return self.xcom.get(task_ids)
+
+
+@pytest.fixture()
+def dag(s3, monkeypatch, tmp_path):
+    variables: dict = {}
+    variable = types.SimpleNamespace(
+        get=lambda key, default_var=None: variables.get(key, default_var),
+        set=variables.__setitem__,
+    )
+    stubs = {
+        "airflow": {"DAG": _Noop},
+        "airflow.models": {"Variable": variable},
+        "airflow.operators": {},
+        "airflow.operators.empty": {"EmptyOperator": _Noop},
+        "airflow.operators.python": {"BranchPythonOperator": _Noop, "PythonOperator": _Noop},
+        "airflow.providers": {},
+        "airflow.providers.cncf": {},
+        "airflow.providers.cncf.kubernetes": {},
+        "airflow.providers.cncf.kubernetes.operators": {},
+        "airflow.providers.cncf.kubernetes.operators.pod": {"KubernetesPodOperator": _Noop},
+        "airflow.kubernetes": {},
+        "airflow.kubernetes.secret": {"Secret": _Noop},
+    }
+    for name, attrs in stubs.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.syspath_prepend(str(DAGS))
+    monkeypatch.delitem(sys.modules, "credit_scoring_retraining", raising=False)
+    module = importlib.import_module("credit_scoring_retraining")
+
+    monkeypatch.setenv("BUCKET", BUCKET)
+    monkeypatch.setenv("S3_CACHE_DIR", str(tmp_path / "s3cache"))
+    monkeypatch.setattr(module, "_s3_client", lambda: s3)
+    monkeypatch.setattr(module, "REFERENCE_PROFILE_LOCAL", str(tmp_path / "profile.json"))
+    monkeypatch.setattr(module, "DRIFT_CHUNK_ROWS", 10)
+    write_profile(tmp_path / "profile.json", [10, 10, 10])
+    return module
+
+
+def write_profile(path, counts):
+    edges = [0.0, 1.0, 2.0, 3.0]
+    profile = {"numeric": {f: {"edges": edges, "counts": counts} for f in ("A", "B")}}
+    path.write_text(json.dumps(profile), encoding="utf-8")
+
+
+def upload(s3, tmp_path, rows):
+    path = tmp_path / "current.csv"
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows([("A", "B"), *rows])
+    s3.upload_file(str(path), BUCKET, CURRENT)
+
+
+def run_drift(dag, monkeypatch):
+    """check_new_data + compute_drift; число перечитанных чанков — из _scan_csv."""
+    stats = {"recounted": None}
+    scan = dag._scan_csv
+
+    def counting_scan(*args, **kwargs):
+        chunks, rows, recounted = scan(*args, **kwargs)
+        stats["recounted"] = recounted
+        return chunks, rows, recounted
+
+    monkeypatch.setattr(dag, "_scan_csv", counting_scan)
+    ti = _TI({"check_new_data": dag.check_new_data()})
+    out = dag.compute_drift(run_id="test", ti=ti)
+    return out["drift_score"], stats["recounted"]
+
+
+def current_gets(s3):
+    return sum(1 for c in s3.get_calls if c["model"].name == "GetObject" and CURRENT in str(c))
+
+
+def test_same_etag_is_served_from_cache(dag, s3, tmp_path, monkeypatch):
+    upload(s3, tmp_path, [(i % 3 + 0.5, 1.5) for i in range(25)])
+    score, recounted = run_drift(dag, monkeypatch)
+    assert recounted == 6  # 3 чанка × 2 колонки
+    gets = current_gets(s3)
+    assert gets > 0
+
+    again, recounted = run_drift(dag, monkeypatch)
+    assert again == score and recounted is None
+    assert current_gets(s3) == gets  # current.csv не скачивался
+
+
+def test_profile_change_invalidates_cache(dag, s3, tmp_path, monkeypatch):
+    upload(s3, tmp_path, [(i % 3 + 0.5, 1.5) for i in range(25)])
+    score, _ = run_drift(dag, monkeypatch)
+
+    write_profile(tmp_path / "profile.json", [20, 5, 5])
+    changed, recounted = run_drift(dag, monkeypatch)
+    assert recounted == 6 and changed != score
+
+
+def test_unchanged_chunks_are_reused(dag, s3, tmp_path, monkeypatch):
+    rows = [(i % 3 + 0.5, 1.5) for i in range(25)]
+    upload(s3, tmp_path, rows)
+    run_drift(dag, monkeypatch)
+
+    # первые два чанка те же, хвост переписан и дописан
+    rows = rows[:20] + [(0.5, 2.5) for _ in range(15)]
+    upload(s3, tmp_path, rows)
+    score, recounted = run_drift(dag, monkeypatch)
+    # по каждой колонке пересчитаны только чанки 3 и 4
+    assert recounted == 4
+
+    # тот же результат без кэша прошлого файла
+    s3.delete_object(Bucket=BUCKET, Key=dag._drift_cache_key(dag.Variable.get("LAST_DATA_ETAG")))
+    dag.Variable.set("LAST_DATA_ETAG", "")
+    fresh, recounted = run_drift(dag, monkeypatch)
+    assert recounted == 8 and fresh == pytest.approx(score)
+
+
+def test_values_above_reference_range_are_counted(dag, s3, tmp_path, monkeypatch):
+    # A целиком правее edges[-1] = 3.0: PSI большой, фича в отчёте
+    upload(s3, tmp_path, [(7.5, 1.5) for _ in range(25)])
+    run_drift(dag, monkeypatch)
+    cache = s3.get_object(
+        Bucket=BUCKET, Key=dag._drift_cache_key(dag.Variable.get("LAST_DATA_ETAG"))
+    )
+    per_feature = json.loads(cache["Body"].read())["per_feature"]
+    assert per_feature["A"] > 5
+    assert dag._bin_counts(["7.5", "-1", "3.0", "", "nan"], [0.0, 1.0, 2.0, 3.0]) == [1, 0, 2]
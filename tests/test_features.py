@@ -0,0 +1,35 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+import app.main as api
+from app.backends import SklearnBackend
+from src.features.derived import PAY_COLS, derived_features
+from src.data.storage import find_table, read_table
+
+
+def test_derived_features_match_pandas_reference():
+    df = read_table(find_table("data/processed", "train_base")).head(2000)
+    # эталон pandas считаем в float64, как и ядро
+    df = df.astype({c: "float64" for c in ["LIMIT_BAL", "BILL_AMT1", "PAY_AMT1"]})
+    df.loc[:4, "BILL_AMT1"] = np.nan
+    df.loc[5, "LIMIT_BAL"] = 0
+
+    out = derived_features(df)
+
+    util = (df["BILL_AMT1"] / df["LIMIT_BAL"].clip(lower=1)).fillna(0)
+    ratio = (df["PAY_AMT1"] / df["BILL_AMT1"].abs().clip(lower=1)).fillna(0)
+    np.testing.assert_array_equal(out["utilization1"], util.to_numpy())
+    np.testing.assert_array_equal(out["payment_ratio1"], ratio.to_numpy())
+    np.testing.assert_array_equal(out["max_delay"], df[PAY_COLS].max(axis=1).to_numpy())
+
+
+def test_predict_computes_missing_derived_fields(fitted_pipeline, monkeypatch):
+    monkeypatch.setattr(api, "model", SklearnBackend(fitted_pipeline, api.ALL_FEATS))
+    client = TestClient(api.app)
+    row = read_table(find_table("data/processed", "test")).iloc[0][api.ALL_FEATS].to_dict()
+    row = {k: v.item() if hasattr(v, "item") else v for k, v in row.items()}
+    raw = {k: v for k, v in row.items() if k not in ("utilization1", "payment_ratio1", "max_delay")}
+
+    full = client.post("/predict", json=row).json()
+    partial = client.post("/predict", json=raw).json()
+    assert partial["proba_default"] == full["proba_default"]
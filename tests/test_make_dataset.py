@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.data.make_dataset import main
+from src.data.sketches import QuantileSketch
+from src.data.storage import compact_dtypes, read_table, write_table
+
+
+def test_quantile_sketch_merge_matches_numpy():
+    rng = np.random.default_rng(0)
+    parts = [rng.lognormal(8, 1, 20_000) for _ in range(5)]
+    merged = QuantileSketch(k=2048)
+    for p in parts:
+        merged.merge(QuantileSketch(k=2048).update(p))
+    data = np.concatenate(parts)
+    for q, v in zip([0.01, 0.5, 0.99], merged.quantile([0.01, 0.5, 0.99])):
+        assert abs((data <= v).mean() - q) < 0.005
+    # пока данных меньше k — ответ точный
+    small = rng.normal(size=500)
+    np.testing.assert_allclose(
+        QuantileSketch().update(small).quantile(0.01), np.quantile(small, 0.01)
+    )
+
+
+def test_streaming_mode_matches_in_memory(tmp_path):
+    raw = pd.read_csv("data/raw/UCI_Credit_Card.csv").head(3000).drop(columns=["ID"])
+    raw = pd.concat([raw, raw.sample(200, random_state=0)], ignore_index=True)
+    raw_csv = tmp_path / "raw.csv"
+    raw.to_csv(raw_csv, index=False)
+
+    main(str(raw_csv), str(tmp_path / "mem"))
+    main(str(raw_csv), str(tmp_path / "stream"), chunksize=700)
+
+    mem = json.loads((tmp_path / "mem" / "summary_base.json").read_text())
+    stream = json.loads((tmp_path / "stream" / "summary_base.json").read_text())
+    assert stream["train_rows"] + stream["test_rows"] == mem["train_rows"] + mem["test_rows"]
+    assert abs(stream["test_rows"] - mem["test_rows"]) <= 2
+    assert abs(stream["target_mean_test"] - mem["target_mean_test"]) < 0.01
+    train = pd.read_parquet(tmp_path / "stream" / "train_base.parquet")
+    test = pd.read_parquet(tmp_path / "stream" / "test_base.parquet")
+    assert not pd.concat([train, test]).duplicated().any()
+
+
+def test_compact_dtypes_keeps_missing_ints(tmp_path):
+    df = pd.DataFrame({"PAY_0": [1.0, np.nan, -2.0], "SEX": [1, 2, 1], "AGE": [30.0, np.nan, 41.0]})
+    out = compact_dtypes(df)
+    assert str(out["SEX"].dtype) == "int8"
+    assert str(out["PAY_0"].dtype) == "Int8" and str(out["AGE"].dtype) == "Int16"
+    assert out["PAY_0"].isna().tolist() == [False, True, False]
+
+    back = read_table(write_table(df, tmp_path / "t.parquet"))
+    assert back["PAY_0"].isna().sum() == 1 and back["PAY_0"].dropna().tolist() == [1, -2]
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+torch = pytest.importorskip("torch")
+
+from src.onnx.mmap_data import Prefetcher, convert_csv, fit_scaler, iter_batches  # noqa: E402
+
+
+def test_mmap_batches_cover_split_once(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.normal(5, 2, 1000), "b": rng.exponential(3, 1000)})
+    df["target"] = (rng.random(1000) < 0.2).astype(int)
+    df.to_csv(tmp_path / "d.csv", index=False)
+
+    X, y = convert_csv(tmp_path / "d.csv", tmp_path / "cache", ["a", "b"], "target", chunksize=300)
+    np.testing.assert_array_equal(y, df["target"].to_numpy(dtype=np.float32))
+
+    idx = rng.permutation(1000)[:700]
+    mean, scale = fit_scaler(X, idx, block_rows=128)
+    ref = StandardScaler().fit(np.asarray(X)[idx])
+    np.testing.assert_allclose(mean, ref.mean_, rtol=1e-6)
+    np.testing.assert_allclose(scale, ref.scale_, rtol=1e-6)
+
+    batches = list(Prefetcher(iter_batches(X, y, idx, 64, mean, scale, True, 1, block_rows=200)))
+    xs = torch.cat([xb for xb, _ in batches]).numpy()
+    # каждая строка split ровно один раз, нормализована как StandardScaler
+    order = np.lexsort(xs.T)
+    expected = ref.transform(np.asarray(X)[idx]).astype(np.float32)
+    np.testing.assert_allclose(xs[order], expected[np.lexsort(expected.T)], atol=1e-5)
+    assert max(len(xb) for xb, _ in batches) == 64
+
+
+def test_convert_csv_counts_records_not_lines(tmp_path):
+    # перевод строки внутри кавычек и пустые строки в конце — не записи
+    (tmp_path / "d.csv").write_text(
+        'a,note,target\n1.5,"two\nlines",1\n2.5,plain,0\n\n\n', encoding="utf-8"
+    )
+    X, y = convert_csv(tmp_path / "d.csv", tmp_path / "cache", ["a"], "target")
+    assert X.shape == (2, 1)
+    np.testing.assert_array_equal(X[:, 0], [1.5, 2.5])
+    np.testing.assert_array_equal(y, [1.0, 0.0])
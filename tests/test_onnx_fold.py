@@ -0,0 +1,59 @@
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnx")
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "onnx"))
+from export_onnx import fuse_sequential  # noqa: E402
+from nn_model import CreditMLP  # noqa: E402
+
+nn = torch.nn
+
+
+def _randomize_bn(net: nn.Sequential, gen: torch.Generator) -> None:
+    # у свежего BN mean=0, var=1, weight=1 — свёртка была бы тождественной
+    for m in net:
+        if isinstance(m, nn.BatchNorm1d):
+            n = m.num_features
+            m.running_mean.copy_(torch.randn(n, generator=gen))
+            m.running_var.copy_(torch.rand(n, generator=gen) + 0.5)
+            m.weight.data.copy_(torch.randn(n, generator=gen))
+            m.bias.data.copy_(torch.randn(n, generator=gen))
+
+
+@pytest.mark.parametrize("fold_bn", [True, False])
+def test_fused_credit_mlp_matches_scaler_plus_model(fold_bn):
+    gen = torch.Generator().manual_seed(0)
+    torch.manual_seed(0)
+    model = CreditMLP(n_features=7).eval()
+    _randomize_bn(model.net, gen)
+    rng = np.random.default_rng(0)
+    mean, scale = rng.normal(size=7) * 100, rng.uniform(0.5, 50, size=7)
+    x = rng.normal(size=(64, 7)) * scale + mean
+
+    with torch.no_grad():
+        ref = model.net(torch.as_tensor((x - mean) / scale, dtype=torch.float32))
+        fused = fuse_sequential(model.net, mean, scale, fold_bn=fold_bn)
+        out = fused(torch.as_tensor(x, dtype=torch.float32))
+    # у CreditMLP BN стоит перед Linear (fold_bn_before)
+    assert any(isinstance(m, nn.BatchNorm1d) for m in fused) != fold_bn
+    np.testing.assert_allclose(out.numpy(), ref.numpy(), rtol=1e-4, atol=1e-4)
+
+
+def test_fused_bn_after_linear_matches():
+    gen = torch.Generator().manual_seed(1)
+    torch.manual_seed(1)
+    net = nn.Sequential(
+        nn.Linear(5, 8), nn.BatchNorm1d(8), nn.ReLU(), nn.Dropout(0.3), nn.Linear(8, 1)
+    ).eval()
+    _randomize_bn(net, gen)
+    x = torch.randn(32, 5, generator=gen)
+
+    with torch.no_grad():
+        fused = fuse_sequential(net)
+        assert [type(m) for m in fused] == [nn.Linear, nn.ReLU, nn.Linear]
+        np.testing.assert_allclose(fused(x).numpy(), net(x).numpy(), rtol=1e-5, atol=1e-5)
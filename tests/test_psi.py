@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from src.data.storage import find_table, read_table
+from src.monitor.psi import (
+    DriftCounter,
+    build_reference_profile,
+    categorical_psi,
+    category_frequencies,
+    compute_categorical_psi_from_profile,
+    compute_psi_report,
+    compute_psi_report_from_profile,
+    load_feature_list,
+    load_profile,
+    psi,
+    save_profile,
+    stream_drift,
+)
+
+
+def test_profile_report_matches_full_reference(tmp_path):
+    num_feats, cat_feats = load_feature_list("feature_list.json")
+    train = read_table(find_table("data/processed", "train"))
+    test = read_table(find_table("data/processed", "test"))
+
+    save_profile(build_reference_profile(train, num_feats, cat_feats), tmp_path / "p.json")
+    profile = load_profile(tmp_path / "p.json")
+
+    avg, per_feature = compute_psi_report_from_profile(profile, test, num_feats)
+    ref_avg, ref_per_feature = compute_psi_report(train, test, num_feats)
+    assert per_feature == ref_per_feature
+    assert avg == ref_avg
+    assert sum(profile["categorical"]["SEX"]["counts"]) == len(train)
+
+
+def test_vectorized_psi_matches_per_feature_loop():
+    rng = np.random.default_rng(0)
+    base = pd.DataFrame(
+        {
+            "a": rng.lognormal(8, 1, 5000),
+            "b": rng.integers(-2, 9, 5000).astype(float),
+            "const": np.ones(5000),
+            "empty": np.full(5000, np.nan),
+        }
+    )
+    stream = base.sample(frac=0.5, random_state=0) * 1.1
+    base.loc[:99, "a"] = np.nan
+    stream.iloc[:50, 1] = np.nan
+
+    _, per_feature = compute_psi_report(base, stream, base.columns)
+    assert set(per_feature) == {"a", "b", "const"}
+    for col, value in per_feature.items():
+        np.testing.assert_allclose(value, psi(base[col], stream[col]), rtol=1e-12)
+
+
+def test_categorical_psi_counts_new_categories():
+    base = pd.Series([1, 1, 2, 2, 3, 3])
+    same = categorical_psi(*category_frequencies(base), pd.Series([3, 2, 1]))
+    shifted = categorical_psi(*category_frequencies(base), pd.Series([1, 2, 4, 4]))
+    assert same == 0.0
+    assert shifted > 1.0
+
+
+def test_streaming_counters_merge_across_files(tmp_path):
+    num_feats, cat_feats = load_feature_list("feature_list.json")
+    train = read_table(find_table("data/processed", "train"))
+    test = read_table(find_table("data/processed", "test"))
+    profile = build_reference_profile(train, num_feats, cat_feats)
+    test.iloc[:2500].to_parquet(tmp_path / "a.parquet")
+    test.iloc[2500:].to_parquet(tmp_path / "b.parquet")
+
+    counter = stream_drift(profile, [tmp_path / "a.parquet", tmp_path / "b.parquet"], chunksize=700)
+    avg, per_feature, per_category = counter.report()
+    assert counter.rows == len(test)
+    assert (avg, per_feature) == compute_psi_report_from_profile(profile, test, num_feats)
+    assert per_category == compute_categorical_psi_from_profile(profile, test, cat_feats)
+
+
+def test_shift_outside_reference_range_counts_in_edge_bins():
+    rng = np.random.default_rng(0)
+    base = pd.DataFrame({"a": rng.normal(0, 1, 2000)})
+    profile = build_reference_profile(base, ["a"], [])
+    above = pd.DataFrame({"a": base["a"].max() + 1 + rng.random(500)})
+
+    _, per_feature = compute_psi_report_from_profile(profile, above, ["a"])
+    # весь поток правее последней границы — в последнем бине, а не выброшен
+    assert per_feature["a"] > 5
+    np.testing.assert_allclose(per_feature["a"], psi(base["a"], above["a"]), rtol=1e-12)
+    assert DriftCounter(profile, ["a"], []).update(above).counts[-1] == 500
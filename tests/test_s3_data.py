@@ -0,0 +1,70 @@
+import os
+import pathlib
+import sys
+import time
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "airflow" / "dags"))
+from s3_data import S3Cache  # noqa: E402
+
+from conftest import BUCKET  # noqa: E402
+
+
+def test_ranged_download_and_etag_cache(s3, tmp_path):
+    data = bytes(range(256)) * 1000
+    s3.put_object(Bucket=BUCKET, Key="retraining/current.csv", Body=data)
+    cache = S3Cache(s3, tmp_path, max_workers=4, part_size=10_000)
+
+    path = cache.fetch(BUCKET, "retraining/current.csv")
+    assert path.read_bytes() == data
+    assert len(s3.get_calls) == 26  # 256000 байт частями по 10000
+
+    # тот же ETag — ни одного GET
+    assert cache.fetch(BUCKET, "retraining/current.csv") == path
+    assert len(s3.get_calls) == 26 and cache.hits == 1
+
+    s3.put_object(Bucket=BUCKET, Key="retraining/current.csv", Body=b"new")
+    assert cache.fetch(BUCKET, "retraining/current.csv").read_bytes() == b"new"
+
+
+def test_fetch_prefix_keeps_shard_order(s3, tmp_path):
+    for i in (2, 0, 1):
+        s3.put_object(
+            Bucket=BUCKET, Key=f"retraining/current/part-{i}.parquet", Body=f"shard{i}".encode()
+        )
+    s3.put_object(Bucket=BUCKET, Key="retraining/current/_SUCCESS", Body=b"")
+
+    paths = S3Cache(s3, tmp_path).fetch_prefix(BUCKET, "retraining/current/", ".parquet")
+    assert [p.read_bytes() for p in paths] == [b"shard0", b"shard1", b"shard2"]
+
+
+def test_objects_without_etag_get_own_files(s3, tmp_path):
+    s3.put_object(Bucket=BUCKET, Key="a/data.csv", Body=b"first")
+    s3.put_object(Bucket=BUCKET, Key="b/data.csv", Body=b"second!")
+    head = s3.head_object
+    s3.head_object = lambda **kw: {k: v for k, v in head(**kw).items() if k != "ETag"}
+
+    cache = S3Cache(s3, tmp_path)
+    paths = cache.fetch_many(BUCKET, ["a/data.csv", "b/data.csv"])
+    assert [p.read_bytes() for p in paths] == [b"first", b"second!"]
+    # без ETag из кэша не отдаём
+    cache.fetch(BUCKET, "a/data.csv")
+    assert cache.hits == 0 and cache.misses == 3
+
+
+def test_evict_keeps_files_touched_during_run(s3, tmp_path):
+    old = tmp_path / "old.csv"
+    old.write_bytes(b"x" * 100)
+    os.utime(old, (time.time() - 3600, time.time() - 3600))
+    s3.put_object(Bucket=BUCKET, Key="k1.csv", Body=b"1" * 100)
+    s3.put_object(Bucket=BUCKET, Key="k2.csv", Body=b"2" * 100)
+
+    cache = S3Cache(s3, tmp_path, max_bytes=150)
+    first = cache.fetch(BUCKET, "k1.csv")
+    # k1 скачан в этом прогоне (его может читать другой процесс) — удаляется только old
+    cache.fetch(BUCKET, "k2.csv")
+    assert not old.exists() and first.exists()
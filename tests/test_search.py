@@ -0,0 +1,36 @@
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import GridSearchCV
+from sklearn.pipeline import Pipeline
+
+from src.data.storage import find_table, read_table
+from src.models.search import CountingMemory, build_search, cache_stats, halving_rungs
+from src.models.estimators import CAT, NUM, TARGET, build_preprocess
+
+
+def test_preprocess_cache_hits_across_candidates(tmp_path):
+    df = read_table(find_table("data/processed", "train")).head(2000)
+    log = tmp_path / "calls.log"
+    pipe = Pipeline(
+        [("pre", build_preprocess()), ("clf", LogisticRegression(max_iter=2000))],
+        memory=CountingMemory(str(tmp_path / "cache"), str(log)),
+    )
+    gs = GridSearchCV(pipe, {"clf__C": [0.1, 1.0, 10.0]}, cv=2, scoring="roc_auc")
+    gs.fit(df[NUM + CAT], df[TARGET])
+
+    stats = cache_stats(str(log))
+    # препроцессинг обучается раз на фолд и раз на refit; остальные кандидаты — из кэша
+    assert stats["cache_misses"] == 3
+    assert stats["cache_hits"] == 4
+
+
+def test_halving_search_prunes_candidates():
+    df = read_table(find_table("data/processed", "train")).head(3000)
+    pipe = Pipeline([("pre", build_preprocess()), ("clf", LogisticRegression(max_iter=2000))])
+    rs = build_search("logreg", pipe, {"clf__C": np.logspace(-3, 2, 30)}, "halving", 4, 0)
+    rs.fit(df[NUM + CAT], df[TARGET])
+
+    rungs = halving_rungs(rs)
+    assert [r["n_candidates"] for r in rungs] == [8, 3]
+    # последний раунд — на всех строках
+    assert rungs[-1]["n_resources"] == len(df)
@@ -0,0 +1,63 @@
+import pathlib
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.model_selection import train_test_split
+
+pytest.importorskip("boto3")
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "scripts" / "model_training"))
+from train_model import (  # noqa: E402
+    build_pipeline,
+    continue_boosting,
+    holdout_mask,
+    n_trees,
+    supports_warm_start,
+)
+
+from src.data.storage import find_table, read_table  # noqa: E402
+
+TARGET = "default.payment.next.month"
+
+
+def test_continue_boosting_adds_trees_and_keeps_old_ones():
+    df = read_table(find_table("data/processed", "train")).head(3000)
+    X, y = df.drop(columns=[TARGET]), df[TARGET]
+    pipe = build_pipeline("gbdt").set_params(clf__n_estimators=20)
+    pipe.fit(X.iloc[:2000], y.iloc[:2000])
+    Xt = pipe.named_steps["pre"].transform(X)
+    before = pipe.named_steps["clf"].decision_function(Xt)
+
+    continue_boosting(pipe, X.iloc[2000:], y.iloc[2000:], n_more=7)
+    assert n_trees(pipe) == 27
+    # старые 20 деревьев считают то же, что до дообучения
+    stages = list(pipe.named_steps["clf"].staged_decision_function(Xt))
+    np.testing.assert_array_equal(stages[19].ravel(), before)
+
+
+def test_hgb_refuses_warm_start():
+    df = read_table(find_table("data/processed", "train")).head(1000)
+    X, y = df.drop(columns=[TARGET]), df[TARGET]
+    pipe = build_pipeline("hgb").set_params(clf__max_iter=5).fit(X, y)
+    assert not supports_warm_start(pipe)
+    with pytest.raises(ValueError, match="hgb"):
+        continue_boosting(pipe, X, y, n_more=3)
+
+
+def test_holdout_mask_full_is_stratified_split():
+    y = pd.Series(np.random.default_rng(0).random(1000) < 0.2).astype(int)
+    _, test_idx = train_test_split(np.arange(1000), test_size=0.2, random_state=42, stratify=y)
+    mask = holdout_mask(y, 0.2, 42)
+    assert set(np.flatnonzero(mask)) == set(test_idx)
+
+
+def test_holdout_mask_rows_stable_across_incremental_runs():
+    y = pd.Series(np.random.default_rng(1).random(3000) < 0.2).astype(int)
+    full = holdout_mask(y.iloc[:1000], 0.2, 42)
+    run1 = holdout_mask(y.iloc[:2000], 0.2, 42, split_rows=1000)
+    run2 = holdout_mask(y, 0.2, 42, split_rows=1000)
+    # holdout full-прогона не трогаем, дописанные строки не переезжают между прогонами
+    np.testing.assert_array_equal(run1[:1000], full)
+    np.testing.assert_array_equal(run2[:2000], run1)
+    assert 0.15 < run2[1000:].mean() < 0.25
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from src.data.storage import find_table, read_table
+from src.data.validation import SCHEMA, fast_failure_report, pandera_failure_report
+
+
+def _norm(v):
+    if v is None or v is pd.NA or (isinstance(v, float) and np.isnan(v)):
+        return None
+    return float(v) if isinstance(v, (int, float, np.number)) else v
+
+
+def _cells(report: pd.DataFrame) -> set:
+    # производные dtype(...)-строки pandera быстрый движок не дублирует
+    report = report[~report["check"].astype(str).str.startswith("dtype(")]
+    return {
+        (_norm(r.column), r.check, _norm(r.index), _norm(r.failure_case))
+        for r in report.astype(object).itertuples()
+    }
+
+
+def test_numpy_engine_agrees_with_pandera(tmp_path):
+    df = read_table(find_table("data/processed", "train"), columns=list(SCHEMA.columns))
+    df = df.head(5000).astype({"AGE": "float64", "LIMIT_BAL": "float64", "SEX": "float64"})
+    df.loc[3, "SEX"] = 3
+    df.loc[10, "AGE"] = np.nan
+    df.loc[11, "AGE"] = 101
+    df.loc[20, "PAY_AMT2"] = -1.0
+    df.loc[30, "LIMIT_BAL"] = np.nan
+    df.loc[40, "utilization1"] = np.nan
+    df["default.payment.next.month"] = 0
+    path = tmp_path / "bad.parquet"
+    df.to_parquet(path, index=False)
+
+    fast = fast_failure_report(str(path), chunksize=700, max_failures=None)
+    slow = pandera_failure_report(df)
+    assert set(fast.columns) == set(slow.columns)
+    assert _cells(fast) == _cells(slow)
+    assert fast_failure_report(find_table("data/processed", "train")).empty
+
+
+def test_numpy_engine_stops_after_max_failures(tmp_path):
+    df = read_table(find_table("data/processed", "train"), columns=list(SCHEMA.columns)).head(3000)
+    df["SEX"] = 7
+    path = tmp_path / "bad.csv"
+    df.to_csv(path, index=False)
+    report = fast_failure_report(str(path), chunksize=500, max_failures=50)
+    assert len(report) == 50
+    assert set(report["check"]) == {"isin([1, 2])"}
+
+
+def test_numpy_engine_nullable_int_column_agrees_with_pandera(tmp_path):
+    df = read_table(find_table("data/processed", "train"), columns=list(SCHEMA.columns)).head(1000)
+    df["SEX"] = df["SEX"].astype("Int8")
+    df.loc[5, "SEX"] = pd.NA
+    df.loc[6, "SEX"] = 3
+    path = tmp_path / "nullable.parquet"
+    df.to_parquet(path, index=False)
+
+    fast = fast_failure_report(str(path), chunksize=300, max_failures=None)
+    slow = pandera_failure_report(df)
+    assert _cells(fast) == _cells(slow)
+    assert set(slow.loc[slow["index"] == 5, "check"]) == {
+        "coerce_dtype('int64')",
+        "not_nullable",
+        "dtype('int64')",
+    }